@@ -0,0 +1,91 @@
+"""Shared artifact cache: a warm hit, and several processes (separate
+workspaces, like dev and prod pipelines on one host) refreshing the same
+S3 object at once — single-flight means exactly one of them downloads it."""
+
+import os
+import sys
+import shutil
+import hashlib
+import multiprocessing as mp
+
+import pytest
+
+import artifact_cache
+import model_refresh
+import s3_download
+import synthetic
+from fake_s3 import FakeS3Client
+
+PROCESSES = 4
+
+
+@pytest.fixture
+def s3_root(tmp_path_factory, download_mb):
+    root = tmp_path_factory.mktemp("s3-shared")
+    synthetic.populate_bucket(FakeS3Client(root), 10, latest_mb=download_mb)
+    return root
+
+
+def _refresh(workspace, s3_root, cache_dir, barrier, results):
+    sys.stdout = open(os.devnull, "w")
+    os.chdir(workspace)
+    os.environ.update(ARTIFACT_CACHE_DIR=str(cache_dir), CONFIG_PATH="configs/env.yaml", TRACE="0")
+    for var in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_DEFAULT_REGION"):
+        os.environ[var] = "bench"
+    s3 = FakeS3Client(s3_root)
+    s3_download.s3_client = lambda *a, **k: s3
+    barrier.wait()
+    model_refresh.main()
+    results.put(s3.calls["get_object"])
+
+
+def bench_cache_hit(benchmark, tmp_path, download_mb):
+    cache = artifact_cache.ArtifactCache(tmp_path / "cache")
+    src = tmp_path / "artifact.pkl"
+    src.write_bytes(os.urandom(download_mb * 2**20))
+    digest = hashlib.sha256(src.read_bytes()).hexdigest()
+
+    def fill(part):
+        shutil.move(src, part)
+        return digest
+
+    cache.fetch("s3://b/k@etag", fill, tmp_path / "first")
+
+    def never(part):
+        raise AssertionError("cache hit expected")
+
+    got, hit = benchmark(cache.fetch, "s3://b/k@etag", never, tmp_path / "out" / "model.pkl")
+    assert hit and got == digest
+
+
+def bench_concurrent_refresh_single_flight(benchmark, tmp_path, s3_root):
+    ctx = mp.get_context("fork")
+    workspaces = []
+    for i in range(PROCESSES):
+        ws = tmp_path / f"runner{i}"
+        (ws / "configs").mkdir(parents=True)
+        synthetic.write_config(ws / "configs" / "env.yaml", overrides={
+            "model_source": "s3", "model_s3_bucket": synthetic.BUCKET, "model_s3_prefix": synthetic.PREFIX,
+            "model_s3_index": "scan", "model_download_chunk_mb": 8})
+        workspaces.append(ws)
+    cache_dir = tmp_path / "cache"
+    gets = []
+
+    def reset():
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        for ws in workspaces:
+            shutil.rmtree(ws / "artifacts", ignore_errors=True)
+
+    def run():
+        barrier, results = ctx.Barrier(PROCESSES), ctx.Queue()
+        procs = [ctx.Process(target=_refresh, args=(ws, s3_root, cache_dir, barrier, results)) for ws in workspaces]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        assert all(p.exitcode == 0 for p in procs)
+        gets.append(sorted(results.get() for _ in procs))
+
+    benchmark.pedantic(run, setup=reset, rounds=3, iterations=1)
+    # Exactly one process fetched the object body; the others were served from the cache
+    assert all(sum(1 for n in g if n) == 1 for g in gets), gets
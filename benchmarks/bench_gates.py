@@ -0,0 +1,58 @@
+"""Each precheck gate in-process, plus the concurrent prechecks runner."""
+
+import asyncio
+
+import config_validate
+import disk_check
+import port_guard
+import prechecks
+import read_config
+import service_check
+import synthetic
+
+PASSING_DISK = {"disk_free_threshold": 0, "disk_critical_free_pct": 0, "disk_min_hours_to_full": 0,
+                "disk_inode_free_threshold": 0}
+
+
+def bench_config_validate(benchmark, workspace, quiet):
+    benchmark(config_validate.main)
+
+
+def bench_read_config_gate(benchmark, workspace, quiet):
+    benchmark(read_config.main)
+
+
+def _prefill_ring(path, samples):
+    """A full history ring, written directly instead of one append per sample."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    ts, used, total, iused, itotal = disk_check.sample("/")
+    with open(path, "wb") as f:
+        f.write(disk_check.RING_MAGIC + disk_check.RING_HEAD.pack(samples, samples))
+        for i in range(samples):
+            f.write(disk_check.RING_REC.pack(ts - (samples - i) * 300, used, total, iused, itotal))
+
+
+def bench_disk_check(benchmark, workspace, quiet, disk_samples):
+    synthetic.write_config(workspace / "configs" / "env.yaml",
+                           overrides={**PASSING_DISK, "disk_history_samples": disk_samples,
+                                      "disk_trend_window_hours": disk_samples * 300 / 3600})
+    _prefill_ring(disk_check.history_file(workspace / "logs" / "disk_history", "/"), disk_samples)
+    benchmark(disk_check.main)
+
+
+def bench_service_check(benchmark, workspace, quiet, service_specs):
+    specs = [{"name": f"svc{i}", "cmdline": "python"} if i % 2 else {"name": "python"}
+             for i in range(service_specs)]
+    synthetic.write_config(workspace / "configs" / "env.yaml", overrides={"services": specs})
+    benchmark(service_check.main)
+
+
+def bench_port_probe(benchmark, workspace, port_targets):
+    # Probe directly: whether a given local port is busy depends on the runner
+    targets = [{"host": "127.0.0.1", "port": 40000 + i, "expect": "free"} for i in range(port_targets)]
+    benchmark(lambda: asyncio.run(port_guard.probe_all(targets, 1.0)))
+
+
+def bench_prechecks_all(benchmark, workspace, quiet):
+    synthetic.write_config(workspace / "configs" / "env.yaml", overrides=PASSING_DISK)
+    benchmark(prechecks.run_all, prechecks.GATES, 60.0, len(prechecks.GATES))
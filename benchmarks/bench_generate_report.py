@@ -0,0 +1,60 @@
+"""generate_report rendering: placeholder chart (cold/warm cache) and KPI
+charts from request logs at several sizes (cold ingest vs incremental), and
+finding the latest report in a large reports directory via the report index."""
+
+import shutil
+from pathlib import Path
+from datetime import datetime, timedelta
+
+import email_report
+import generate_report
+import synthetic
+
+
+def _clear(workspace, *dirs):
+    for d in dirs:
+        shutil.rmtree(workspace / d, ignore_errors=True)
+
+
+def bench_render_warm(benchmark, workspace):
+    generate_report.render_report("dev")
+    benchmark(generate_report.render_report, "dev")
+
+
+def bench_render_cold_chart(benchmark, workspace):
+    benchmark.pedantic(generate_report.render_report, args=("dev",),
+                       setup=lambda: _clear(workspace, "reports/.cache/charts"), rounds=5, iterations=1)
+
+
+def _kpi_workspace(workspace, kpi_rows):
+    synthetic.write_kpi_log(workspace / "logs" / "requests" / "requests.jsonl", kpi_rows)
+    synthetic.write_config(workspace / "configs" / "env.yaml",
+                           overrides={"kpi_log_glob": "logs/requests/*.jsonl"})
+
+
+def bench_render_kpis_cold(benchmark, workspace, capsys, kpi_rows):
+    _kpi_workspace(workspace, kpi_rows)
+    benchmark.pedantic(generate_report.render_report, args=("dev",),
+                       setup=lambda: _clear(workspace, "reports/.cache"), rounds=3, iterations=1)
+    capsys.readouterr()
+
+
+def bench_render_kpis_incremental(benchmark, workspace, capsys, kpi_rows):
+    _kpi_workspace(workspace, kpi_rows)
+    generate_report.render_report("dev")
+    benchmark(generate_report.render_report, "dev")
+    capsys.readouterr()
+
+
+def bench_latest_report_indexed(benchmark, workspace, report_files):
+    reports = workspace / "reports"
+    reports.mkdir()
+    start = datetime(2024, 1, 1)
+    for i in range(report_files):
+        name = f"model_report_{start + timedelta(minutes=10 * i):%Y%m%d_%H%M%S}{'_dev' if i % 2 else '_prod'}.html"
+        (reports / name).write_text("<html/>")
+        if i % 2 == 0:
+            newest_prod = name
+    generate_report.render_report("dev")  # first use imports the backlog into the index
+    found = benchmark(email_report.latest_report, Path("reports"), "prod")
+    assert found.name == newest_prod
@@ -0,0 +1,96 @@
+"""model_refresh against a fake S3 bucket: latest-object lookup over large
+listings, a nightly run with no new model, a full download into the store,
+and every environment refreshed in one REFRESH_ENVS=all run."""
+
+import json
+import shutil
+
+import pytest
+import yaml
+
+import model_index
+import model_refresh
+import s3_download
+import synthetic
+from fake_s3 import FakeS3Client
+
+_buckets = {}
+
+
+@pytest.fixture
+def bucket(tmp_path_factory, s3_keys):
+    """Shared across benchmarks: populating tens of thousands of keys is slow."""
+    if s3_keys not in _buckets:
+        root = tmp_path_factory.mktemp(f"s3-{s3_keys}")
+        synthetic.populate_bucket(FakeS3Client(root), s3_keys)
+        _buckets[s3_keys] = root
+    return FakeS3Client(_buckets[s3_keys])
+
+
+def _s3_config(workspace, monkeypatch, **extra):
+    for var in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_DEFAULT_REGION"):
+        monkeypatch.setenv(var, "bench")
+    synthetic.write_config(workspace / "configs" / "env.yaml", overrides={
+        "model_source": "s3", "model_s3_bucket": synthetic.BUCKET, "model_s3_prefix": synthetic.PREFIX,
+        "model_index_path": "artifacts/.model_index.json", **extra})
+
+
+def bench_scan_latest(benchmark, bucket):
+    found = benchmark(model_index.scan_latest, bucket, synthetic.BUCKET, synthetic.PREFIX)
+    assert found["Key"].endswith(".pkl")
+
+
+def bench_manifest_latest_warm(benchmark, workspace, bucket):
+    cfg = {"model_index_path": str(workspace / "index.json"), "model_index_max_age_hours": 24}
+    model_index.manifest_latest(bucket, synthetic.BUCKET, synthetic.PREFIX, cfg)
+    found = benchmark(model_index.manifest_latest, bucket, synthetic.BUCKET, synthetic.PREFIX, cfg)
+    assert found["Key"].endswith(".pkl")
+
+
+def bench_refresh_no_new_model(benchmark, workspace, monkeypatch, quiet, bucket):
+    _s3_config(workspace, monkeypatch)
+    monkeypatch.setattr(s3_download, "s3_client", lambda *a, **k: bucket)
+    model_refresh.main()  # first run downloads; the benchmark is the steady state
+    benchmark(model_refresh.main)
+
+
+def bench_refresh_download(benchmark, workspace, monkeypatch, quiet, tmp_path_factory, download_mb):
+    s3 = FakeS3Client(tmp_path_factory.mktemp("s3-download"))
+    synthetic.populate_bucket(s3, 10, latest_mb=download_mb)
+    _s3_config(workspace, monkeypatch, model_download_chunk_mb=8)
+    monkeypatch.setattr(s3_download, "s3_client", lambda *a, **k: s3)
+
+    def reset():
+        for p in ("artifacts/.model_version", "artifacts/models", "artifacts/store"):
+            path = workspace / p
+            if path.is_dir():
+                shutil.rmtree(path)
+            elif path.exists():
+                path.unlink()
+
+    benchmark.pedantic(model_refresh.main, setup=reset, rounds=3, iterations=1)
+
+
+def bench_refresh_all_envs(benchmark, workspace, monkeypatch, quiet, tmp_path_factory, download_mb):
+    s3 = FakeS3Client(tmp_path_factory.mktemp("s3-envs"))
+    synthetic.populate_bucket(s3, 10, latest_mb=download_mb)
+    for var in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_DEFAULT_REGION"):
+        monkeypatch.setenv(var, "bench")
+    envs = {}
+    for i in range(4):
+        base = f"artifacts/env{i}"
+        envs[f"env{i}"] = {"model_source": "s3", "model_s3_bucket": synthetic.BUCKET,
+                           "model_s3_prefix": synthetic.PREFIX, "model_s3_index": "scan",
+                           "model_download_chunk_mb": 8, "model_local_dir": f"{base}/models",
+                           "model_current_symlink": f"{base}/current_model.pkl",
+                           "model_version_file": f"{base}/.model_version", "model_store_dir": f"{base}/store"}
+    (workspace / "configs" / "env.yaml").write_text(yaml.safe_dump(envs), encoding="utf-8")
+    monkeypatch.setenv("REFRESH_ENVS", "all")
+    monkeypatch.setattr(s3_download, "s3_client", lambda *a, **k: s3)  # inherited by the forked workers
+
+    def reset():
+        shutil.rmtree(workspace / "artifacts", ignore_errors=True)
+
+    benchmark.pedantic(model_refresh.main, setup=reset, rounds=3, iterations=1)
+    summary = json.loads((workspace / "logs" / "model_refresh_summary.json").read_text(encoding="utf-8"))
+    assert [e["status"] for e in summary["envs"]] == ["updated"] * 4
@@ -0,0 +1,34 @@
+"""read_config: raw YAML parse, pickled snapshot hit and in-process cache hit."""
+
+import os
+
+import read_config
+import synthetic
+
+
+def _config(workspace, n_envs):
+    return synthetic.write_config(workspace / "configs" / "env.yaml", n_envs=n_envs)
+
+
+def bench_parse_uncached(benchmark, workspace, monkeypatch, config_envs):
+    _config(workspace, config_envs)
+    monkeypatch.setenv("CONFIG_CACHE", "0")
+    benchmark(read_config.get_env_config, "dev")
+
+
+def bench_snapshot_hit(benchmark, workspace, config_envs):
+    path = _config(workspace, config_envs)
+    read_config.get_env_config("dev")  # writes the snapshot
+    assert os.path.exists(read_config.snapshot_path(str(path.relative_to(workspace))))
+
+    def fresh_process():
+        read_config.clear_cache()
+        return read_config.get_env_config("dev")
+
+    benchmark(fresh_process)
+
+
+def bench_in_process_hit(benchmark, workspace, config_envs):
+    _config(workspace, config_envs)
+    read_config.get_env_config("dev")
+    benchmark(read_config.get_env_config, "dev")
@@ -0,0 +1,43 @@
+"""model_smoketest on large memory-mapped artifacts (load + inference latency)."""
+
+import os
+
+import pytest
+
+import model_smoketest
+import synthetic
+
+_models = {}
+
+
+@pytest.fixture
+def model_file(tmp_path_factory, model_mb):
+    if model_mb not in _models:
+        _models[model_mb] = synthetic.build_model(tmp_path_factory.mktemp(f"model-{model_mb}") / "model.pkl",
+                                                  model_mb)
+    return _models[model_mb]
+
+
+def _workspace(workspace, model_file, mode):
+    link = workspace / "artifacts" / "current_model.pkl"
+    link.parent.mkdir(parents=True, exist_ok=True)
+    os.symlink(model_file, link)
+    synthetic.write_config(workspace / "configs" / "env.yaml", overrides={
+        "smoketest_mode": mode,
+        "smoketest_sample_input": str(synthetic.sample_input(workspace / "sample.pkl")),
+        "smoketest_inference_runs": 20,
+        # Benchmarks track timings themselves; the in-script regression gate would trip on repeats
+        "smoketest_max_load_regression_pct": 1e9,
+        "smoketest_max_rss_regression_pct": 1e9,
+        "smoketest_max_latency_regression_pct": 1e9,
+    })
+
+
+def bench_smoketest_stat(benchmark, workspace, quiet, model_file):
+    _workspace(workspace, model_file, "stat")
+    benchmark(model_smoketest.main)
+
+
+def bench_smoketest_load(benchmark, workspace, quiet, model_file):
+    _workspace(workspace, model_file, "load")
+    benchmark.pedantic(model_smoketest.main, rounds=5, iterations=1, warmup_rounds=1)
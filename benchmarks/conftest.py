@@ -0,0 +1,80 @@
+"""
+Shared fixtures for the benchmark suite.
+
+Scales come from BENCH_SCALE (small by default, "large" for nightly/local
+profiling); every fixture named in SCALES is parametrized over the values of
+the active scale, so each benchmark runs once per size.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path[:0] = [str(ROOT / "scripts"), str(Path(__file__).resolve().parent)]
+
+import read_config  # noqa: E402
+import synthetic  # noqa: E402
+
+SCALES = {
+    "small": {
+        "config_envs": [2, 50],
+        "s3_keys": [1_000, 5_000],
+        "download_mb": [16],
+        "model_mb": [16, 64],
+        "kpi_rows": [10_000, 100_000],
+        "report_files": [2_000, 20_000],
+        "disk_samples": [2_016],
+        "port_targets": [16, 256],
+        "service_specs": [1, 20],
+    },
+    "large": {
+        "config_envs": [2, 50, 500],
+        "s3_keys": [1_000, 10_000, 50_000],
+        "download_mb": [64, 256],
+        "model_mb": [64, 256, 1024],
+        "kpi_rows": [100_000, 1_000_000],
+        "report_files": [20_000, 100_000],
+        "disk_samples": [2_016, 20_160],
+        "port_targets": [256, 2_048],
+        "service_specs": [20, 200],
+    },
+}
+
+
+def active_scale() -> dict:
+    name = os.getenv("BENCH_SCALE", "small")
+    if name not in SCALES:
+        raise pytest.UsageError(f"BENCH_SCALE must be one of {sorted(SCALES)}, got {name!r}")
+    return SCALES[name]
+
+
+def pytest_generate_tests(metafunc):
+    scale = active_scale()
+    for name, values in scale.items():
+        if name in metafunc.fixturenames:
+            metafunc.parametrize(name, values, ids=[f"{name}={v}" for v in values])
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    """Empty repo-shaped working directory with the real env.yaml; cwd moves there."""
+    (tmp_path / "configs").mkdir()
+    synthetic.write_config(tmp_path / "configs" / "env.yaml")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("APP_ENV", "dev")
+    monkeypatch.setenv("CONFIG_PATH", "configs/env.yaml")
+    monkeypatch.setenv("TRACE_FILE", str(tmp_path / "logs" / "trace.jsonl"))
+    monkeypatch.setenv("ARTIFACT_CACHE_DIR", "")  # measure downloads, not the host's shared cache
+    read_config.clear_cache()
+    yield tmp_path
+    read_config.clear_cache()
+
+
+@pytest.fixture
+def quiet(capsys):
+    """Scripts print progress; keep benchmark output readable."""
+    yield
+    capsys.readouterr()
@@ -0,0 +1,95 @@
+"""
+Synthetic fixtures for the benchmarks: configs, model artifacts, fake S3
+buckets and KPI logs at a requested size. Everything is deterministic so runs
+compare against stored baselines.
+"""
+
+import json
+import random
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import yaml
+
+ROOT = Path(__file__).resolve().parents[1]
+BUCKET = "bench-bucket"
+PREFIX = "models/bench/"
+
+
+def base_config() -> Dict[str, Any]:
+    return yaml.safe_load((ROOT / "configs" / "env.yaml").read_text(encoding="utf-8"))
+
+
+def write_config(path: Path, n_envs: int = 0, filler_keys: int = 50,
+                 overrides: Optional[Dict[str, Any]] = None) -> Path:
+    """The real env.yaml, with `overrides` applied to dev and `n_envs` extra environments."""
+    cfg = base_config()
+    cfg["dev"].update(overrides or {})
+    for i in range(n_envs):
+        env = dict(cfg["prod"])
+        env.update({f"feature_flag_{k}": {"enabled": k % 2 == 0, "rollout_pct": k, "owners": [f"team{k % 7}"]}
+                    for k in range(filler_keys)})
+        cfg[f"tenant{i:04d}"] = env
+    path.write_text(yaml.safe_dump(cfg, sort_keys=False), encoding="utf-8")
+    return path
+
+
+class SyntheticModel:
+    """Dense layers over NumPy weights; predict() touches every weight page."""
+
+    def __init__(self, size_mb: int, seed: int = 0):
+        import numpy as np
+        rng = np.random.default_rng(seed)
+        rows = max(1, size_mb * 2**20 // (4 * 1024))
+        self.weights = rng.standard_normal((rows, 1024), dtype=np.float32)
+
+    def predict(self, x):
+        return float((self.weights @ x).sum())
+
+
+def build_model(path: Path, size_mb: int) -> Path:
+    from model_io import dump_model
+    path.parent.mkdir(parents=True, exist_ok=True)
+    dump_model(SyntheticModel(size_mb), path)
+    return path
+
+
+def sample_input(path: Path) -> Path:
+    import pickle
+    import numpy as np
+    path.write_bytes(pickle.dumps(np.ones(1024, dtype=np.float32)))
+    return path
+
+
+def populate_bucket(s3, n_keys: int, latest_mb: int = 1) -> str:
+    """n_keys model objects (plus sidecars) under PREFIX; the newest is latest_mb MiB."""
+    for i in range(n_keys - 1):
+        s3.put_object(Bucket=BUCKET, Key=f"{PREFIX}model_{i:06d}.pkl", Body=b"old")
+        if i % 10 == 0:
+            s3.put_object(Bucket=BUCKET, Key=f"{PREFIX}model_{i:06d}.json", Body=b"{}")
+    latest = f"{PREFIX}model_{n_keys - 1:06d}.pkl"
+    s3.put_object(Bucket=BUCKET, Key=latest, Body=random.Random(n_keys).randbytes(latest_mb * 2**20))
+    return latest
+
+
+def write_kpi_log(path: Path, rows: int, days: int = 14) -> Path:
+    """JSONL request log with `rows` requests spread over the last `days` days."""
+    import numpy as np
+    import pandas as pd
+    rng = np.random.default_rng(rows)
+    end = pd.Timestamp("2026-01-15", tz="UTC").value // 10**9
+    df = pd.DataFrame({
+        "ts": np.sort(rng.integers(end - days * 86400, end, rows)),
+        "status": rng.choice([200, 200, 200, 201, 404, 500, 503], rows),
+        "latency_ms": rng.gamma(2.0, 20.0, rows).round(2),
+        "path": rng.choice(["/predict", "/healthz", "/batch"], rows),
+    })
+    path.parent.mkdir(parents=True, exist_ok=True)
+    df.to_json(path, orient="records", lines=True)
+    return path
+
+
+def write_json(path: Path, data: Any) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data), encoding="utf-8")
+    return path
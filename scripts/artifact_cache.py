@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Host-wide artifact cache shared by every runner and APP_ENV on the machine.
+
+model_refresh.py consults it before downloading from S3, so a host running
+dev and prod pipelines (or several CI runners) fetches each artifact once.
+
+Layout under `artifact_cache_dir` (or ARTIFACT_CACHE_DIR; unset/empty = off,
+the default):
+  objects/<aa>/<sha256>   one read-only copy per distinct artifact
+  index.json              key → digest, size, added_at, last_used, hits
+  incoming/<keyhash>      in-progress fills (resumable, see s3_download.py)
+  locks/<aa>.lock         single-flight locks, striped by key hash
+  .index.lock             guards index.json read-modify-write
+
+Keys name an exact object version, e.g. 's3://bucket/key@<etag>'.
+  - Hits hard-link the object into the caller's destination (copy across
+    filesystems) and bump last_used.
+  - On a miss the caller's fill function runs under the key's lock; other
+    processes asking for the same key block on that lock and then get the
+    freshly cached copy instead of downloading it again.
+  - After each insert, least-recently-used entries are evicted until the
+    objects fit in `artifact_cache_max_gb`. Files already linked out stay
+    valid, because eviction only removes the cache's own link.
+
+Usage:
+    python scripts/artifact_cache.py [stats|prune]
+"""
+
+import os
+import sys
+import json
+import time
+import fcntl
+import shutil
+import hashlib
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from read_config import get_env_config
+from instrument import span
+
+
+@contextmanager
+def _flock(path: Path, wait_msg: Optional[str] = None) -> Iterator[None]:
+    f = open(path, "a")
+    try:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            if wait_msg:
+                print(wait_msg)
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+    finally:
+        f.close()
+
+
+class CacheError(Exception):
+    """Raised when the cache can't serve an artifact it was asked to fill."""
+
+
+class ArtifactCache:
+    def __init__(self, root: Path, max_bytes: Optional[int] = None):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.objects = self.root / "objects"
+        self.incoming = self.root / "incoming"
+        self.locks = self.root / "locks"
+        self.index_path = self.root / "index.json"
+        for d in (self.objects, self.incoming, self.locks):
+            d.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key_hash(key: str) -> str:
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def object_path(self, digest: str) -> Path:
+        return self.objects / digest[:2] / digest
+
+    # ---------- index ----------
+    @contextmanager
+    def _index(self) -> Iterator[Dict[str, Any]]:
+        with _flock(self.root / ".index.lock"):
+            try:
+                index = json.loads(self.index_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                index = {}
+            index.setdefault("entries", {})
+            yield index
+            tmp = self.index_path.with_name(f"{self.index_path.name}.{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(index, indent=2), encoding="utf-8")
+            os.replace(tmp, self.index_path)
+
+    def _link_out(self, key: str, dest: Path, hit: bool = True) -> Optional[str]:
+        """Materialize key's object at dest; its digest, or None on a miss."""
+        tmp = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+        with self._index() as index:
+            entry = index["entries"].get(key)
+            if not entry:
+                return None
+            obj = self.object_path(entry["digest"])
+            if not obj.is_file():
+                del index["entries"][key]
+                return None
+            entry["last_used"] = time.time()
+            entry["hits"] = entry.get("hits", 0) + hit
+            digest = entry["digest"]
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            tmp.unlink(missing_ok=True)
+            try:
+                os.link(obj, tmp)
+                os.replace(tmp, dest)
+                return digest
+            except OSError:
+                pass  # other filesystem: copy below, without holding the index lock
+        try:
+            shutil.copy2(obj, tmp)
+        except FileNotFoundError:  # evicted in between
+            tmp.unlink(missing_ok=True)
+            return None
+        os.replace(tmp, dest)
+        return digest
+
+    def _insert(self, key: str, digest: str, path: Path) -> None:
+        obj = self.object_path(digest)
+        with self._index() as index:
+            if obj.is_file():
+                path.unlink()
+            else:
+                obj.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(path, obj)
+                obj.chmod(0o444)
+            now = time.time()
+            index["entries"][key] = {"digest": digest, "size": obj.stat().st_size,
+                                     "added_at": now, "last_used": now, "hits": 0}
+            self._evict(index, protect=key)
+
+    def _evict(self, index: Dict[str, Any], protect: Optional[str] = None) -> Tuple[int, int]:
+        """Drop least-recently-used entries until the objects fit in max_bytes."""
+        entries = index["entries"]
+        sizes = {e["digest"]: e["size"] for e in entries.values()}
+        total = sum(sizes.values())
+        removed = freed = 0
+        if not self.max_bytes:
+            return removed, freed
+        for key in sorted(entries, key=lambda k: entries[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if key == protect:
+                continue
+            digest = entries.pop(key)["digest"]
+            removed += 1
+            if all(e["digest"] != digest for e in entries.values()):
+                self.object_path(digest).unlink(missing_ok=True)
+                total -= sizes[digest]
+                freed += sizes[digest]
+        return removed, freed
+
+    # ---------- public ----------
+    def fetch(self, key: str, fill: Callable[[Path], str], dest: Path) -> Tuple[str, bool]:
+        """
+        Put the artifact for `key` at `dest` and return (digest, hit). On a
+        miss, fill(path) must write the verified artifact to path and return
+        its SHA-256; it runs once per key even across concurrent processes.
+        """
+        digest = self._link_out(key, dest)
+        if digest:
+            return digest, True
+        h = self.key_hash(key)
+        with _flock(self.locks / f"{h[:2]}.lock", wait_msg=f"⏳ Waiting for another process to fetch {key}"):
+            digest = self._link_out(key, dest)
+            if digest:
+                return digest, True
+            part = self.incoming / h
+            self._insert(key, fill(part), part)
+            digest = self._link_out(key, dest, hit=False)
+        if digest is None:
+            raise CacheError(f"{key} was evicted right after it was cached; raise artifact_cache_max_gb")
+        return digest, False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._index() as index:
+            entries = index["entries"]
+            sizes = {e["digest"]: e["size"] for e in entries.values()}
+            return {"entries": len(entries), "objects": len(sizes), "bytes": sum(sizes.values()),
+                    "hits": sum(e.get("hits", 0) for e in entries.values())}
+
+    def prune(self) -> Tuple[int, int]:
+        with self._index() as index:
+            return self._evict(index)
+
+
+def from_config(cfg: Dict[str, Any]) -> Optional[ArtifactCache]:
+    root = os.getenv("ARTIFACT_CACHE_DIR", cfg.get("artifact_cache_dir") or "")
+    if not root:
+        return None
+    max_gb = cfg.get("artifact_cache_max_gb")
+    return ArtifactCache(Path(root).expanduser(), int(float(max_gb) * 1e9) if max_gb else None)
+
+
+def main():
+    cache = from_config(get_env_config())
+    if cache is None:
+        print("ℹ️  Shared artifact cache is off (set artifact_cache_dir or ARTIFACT_CACHE_DIR).")
+        return
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    if cmd == "prune":
+        removed, freed = cache.prune()
+        print(f"🧹 Evicted {removed} entr{'y' if removed == 1 else 'ies'}, freed {freed / 1e6:.1f} MB")
+    elif cmd == "stats":
+        s = cache.stats()
+        limit = f" of {cache.max_bytes / 1e9:.1f} GB" if cache.max_bytes else ""
+        print(f"📦 {cache.root}: {s['entries']} key(s), {s['objects']} object(s), "
+              f"{s['bytes'] / 1e6:.1f} MB{limit}, {s['hits']} hit(s)")
+    else:
+        print(f"❌ Unknown command {cmd!r}; use stats or prune")
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    with span("artifact_cache"):
+        main()
@@ -3,6 +3,7 @@
 
 import sys
 from read_config import get_env_config
+from instrument import span
 
 REQUIRED_KEYS = ["app_port", "debug", "disk_free_threshold", "service_name"]
 
@@ -15,4 +16,5 @@ def main():
     print("✅ Config validation passed")
 
 if __name__ == "__main__":
-    main()
+    with span("config_validate"):
+        main()
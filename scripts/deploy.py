@@ -1,30 +1,341 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-
 """
-Simulated deployment script.
-In a real pipeline, this would:
-- Pull code / fetch artifact
-- Install runtime dependencies
-- Restart or reload the application
-- Run a post-deploy health check
+Roll a release across the deploy targets: canary first, then growing waves.
+
+Targets come from `deploy_targets` in configs/env.yaml (or DEPLOY_TARGETS,
+comma-separated) and are driven by a pluggable Target class chosen with
+`deploy_target_type` (or DEPLOY_TARGET_TYPE):
+  simulated             in-process stand-in (the default; pull, install,
+                        restart, health check take `deploy_simulated_sec`)
+  http                  base URLs exposing POST /admin/deploy, GET
+                        /admin/release and a health endpoint
+                        (`deploy_health_path`); scripts/deploy_standin.py
+                        serves a local fleet of these
+  package.module:Class  any Target subclass
+
+Rollout:
+  - Batches are `deploy_canary` targets, then ×`deploy_growth` per wave, up
+    to `deploy_max_batch`; e.g. 1, 2, 4, 8, ... The targets in a batch
+    deploy in parallel (at most `deploy_max_parallel` at once).
+  - Each batch is probed `deploy_health_probes` times per target, concurrently
+    across targets, just before and `deploy_soak_sec` after its deploy.
+  - The rollout halts when a deploy fails or a batch regresses: its error
+    rate exceeds `deploy_max_error_rate` (and the pre-deploy rate), or its
+    p95 latency grows by more than `deploy_max_latency_regression_pct`% and
+    `deploy_latency_floor_ms`. With `deploy_auto_rollback` (default true),
+    every target updated so far is put back on its previous release.
+  - Target methods that raise never abort the rollout: a raising deploy()
+    counts as a failed deploy, a raising probe() as an unhealthy probe, and
+    a raising release() as an unknown previous release (not restorable).
+The release is DEPLOY_RELEASE, else the commit (GITHUB_SHA), else
+artifacts/.model_version. A per-batch summary goes to logs/deploy_summary.json.
+
+Exit codes:
+  0 → every target on the new release
+  1 → rollout halted (deploy failure or health regression)
+  2 → bad configuration (no targets, unknown target type)
 """
 
+import os
+import sys
+import json
 import time
+import importlib
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from read_config import get_env_config
+from instrument import span
+from lazy import lazy_import, load_pending
+
+requests = lazy_import("requests")
+
+SUMMARY_PATH = Path("logs/deploy_summary.json")
+DEFAULT_MAX_PARALLEL = 64
+
+
+class DeployError(Exception):
+    pass
+
+
+class Target:
+    """One deployable host. Subclasses implement release(), deploy() and probe()."""
+
+    def __init__(self, name: str, cfg: Dict[str, Any]):
+        self.name = name
+        self.cfg = cfg
+
+    def release(self) -> Optional[str]:
+        """Release currently running, or None if unknown."""
+        raise NotImplementedError
+
+    def deploy(self, release: str) -> None:
+        """Install and start `release`; raise DeployError on failure."""
+        raise NotImplementedError
+
+    def probe(self) -> Tuple[bool, float]:
+        """One health check: (healthy, latency in ms)."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class SimulatedTarget(Target):
+    STEPS = ["Pulling code/artifact", "Installing dependencies", "Restarting service", "Post-deploy health check"]
+
+    def __init__(self, name: str, cfg: Dict[str, Any]):
+        super().__init__(name, cfg)
+        self._release: Optional[str] = None
+
+    def release(self) -> Optional[str]:
+        return self._release
+
+    def deploy(self, release: str) -> None:
+        step_sec = float(self.cfg.get("deploy_simulated_sec", 2.0)) / len(self.STEPS)
+        for step in self.STEPS:
+            time.sleep(step_sec)
+        self._release = release
+
+    def probe(self) -> Tuple[bool, float]:
+        return True, 1.0
+
+
+class HTTPTarget(Target):
+    def __init__(self, name: str, cfg: Dict[str, Any]):
+        super().__init__(name, cfg)
+        self.base = name.rstrip("/")
+        self.session = requests.Session()
+
+    def release(self) -> Optional[str]:
+        try:
+            r = self.session.get(f"{self.base}/admin/release", timeout=5)
+            return r.json().get("release") if r.ok else None
+        except (requests.RequestException, ValueError):
+            return None
+
+    def deploy(self, release: str) -> None:
+        try:
+            r = self.session.post(f"{self.base}/admin/deploy", json={"release": release},
+                                  timeout=float(self.cfg.get("deploy_timeout_sec", 300)))
+        except requests.RequestException as e:
+            raise DeployError(str(e))
+        if not r.ok:
+            raise DeployError(f"HTTP {r.status_code}: {r.text[:200]}")
+
+    def probe(self) -> Tuple[bool, float]:
+        start = time.perf_counter()
+        try:
+            r = self.session.get(self.base + self.cfg.get("deploy_health_path", "/healthz"),
+                                 timeout=float(self.cfg.get("deploy_probe_timeout_sec", 5)))
+            ok = r.ok
+        except requests.RequestException:
+            ok = False
+        return ok, (time.perf_counter() - start) * 1000
+
+    def close(self) -> None:
+        self.session.close()
+
+
+TARGET_TYPES = {"simulated": SimulatedTarget, "http": HTTPTarget}
+
+
+def target_class(kind: str) -> type:
+    if kind in TARGET_TYPES:
+        return TARGET_TYPES[kind]
+    module, _, attr = kind.partition(":")
+    if not attr:
+        raise ValueError(f"unknown deploy_target_type {kind!r}; use {sorted(TARGET_TYPES)} or module:Class")
+    return getattr(importlib.import_module(module), attr)
+
+
+def target_type(cfg: Dict[str, Any]) -> str:
+    return os.getenv("DEPLOY_TARGET_TYPE") or cfg.get("deploy_target_type", "simulated")
+
+
+def load_targets(cfg: Dict[str, Any]) -> List[Target]:
+    raw = os.getenv("DEPLOY_TARGETS")
+    names = [t.strip() for t in raw.split(",") if t.strip()] if raw else list(cfg.get("deploy_targets") or [])
+    cls = target_class(target_type(cfg))
+    return [cls(name, cfg) for name in names]
+
+
+def release_id() -> str:
+    rel = os.getenv("DEPLOY_RELEASE") or (os.getenv("GITHUB_SHA") or "")[:12]
+    if not rel:
+        vfile = Path("artifacts/.model_version")
+        rel = vfile.read_text(encoding="utf-8").strip() if vfile.exists() else ""
+    return rel or datetime.utcnow().strftime("%Y%m%d%H%M%S")
+
+
+def plan_batches(n: int, canary: int = 1, growth: float = 2.0, max_batch: int = 0) -> List[Tuple[int, int]]:
+    """(start, end) index ranges: a canary of `canary`, then waves growing by `growth`."""
+    batches, start, size = [], 0, max(1, canary)
+    while start < n:
+        if max_batch:
+            size = min(size, max_batch)
+        end = min(n, start + size)
+        batches.append((start, end))
+        start = end
+        size = max(size + 1, int(size * growth))
+    return batches
+
+
+def _p95(values: List[float]) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))] if ordered else 0.0
+
+
+def _probe_one(t: Target) -> Tuple[bool, float]:
+    try:
+        return t.probe()
+    except Exception:
+        return False, 0.0
+
+
+def _release_of(t: Target) -> Optional[str]:
+    try:
+        return t.release()
+    except Exception as e:
+        print(f"⚠️  {t.name}: could not read its current release ({type(e).__name__}: {e}); it cannot be rolled back")
+        return None
+
+
+def probe_batch(targets: List[Target], probes: int, pool: ThreadPoolExecutor) -> Dict[str, Any]:
+    """`probes` health checks per target, all targets at once; a probe that raises counts as unhealthy."""
+    def one(t: Target) -> List[Tuple[bool, float]]:
+        return [_probe_one(t) for _ in range(probes)]
+
+    samples = [s for per_target in pool.map(one, targets) for s in per_target]
+    errors = sum(1 for ok, _ in samples if not ok)
+    latencies = [ms for ok, ms in samples if ok]
+    return {"probes": len(samples), "errors": errors,
+            "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+            "p95_ms": round(_p95(latencies), 2)}
+
+
+def regression(pre: Dict[str, Any], post: Dict[str, Any], cfg: Dict[str, Any]) -> Optional[str]:
+    max_err = float(cfg.get("deploy_max_error_rate", 0.02))
+    if post["error_rate"] > max_err and post["error_rate"] > pre["error_rate"]:
+        return f"error rate {post['error_rate']:.1%} (before {pre['error_rate']:.1%}, limit {max_err:.1%})"
+    pct = float(cfg.get("deploy_max_latency_regression_pct", 50))
+    floor = float(cfg.get("deploy_latency_floor_ms", 20))
+    grew = post["p95_ms"] - pre["p95_ms"]
+    if pre["p95_ms"] and grew > floor and post["p95_ms"] > pre["p95_ms"] * (1 + pct / 100):
+        return f"p95 latency {post['p95_ms']:.0f} ms (before {pre['p95_ms']:.0f} ms, limit +{pct:g}%)"
+    return None
+
+
+def _deploy_one(t: Target, release: str) -> Optional[str]:
+    try:
+        t.deploy(release)
+        return None
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+
+
+def deploy_batch(targets: List[Target], release: str, pool: ThreadPoolExecutor) -> Dict[str, str]:
+    """Deploy to every target at once; returns {target: error} for the ones that failed."""
+    errors = pool.map(lambda t: _deploy_one(t, release), targets)
+    return {t.name: err for t, err in zip(targets, errors) if err}
+
+
+def rollback_targets(targets: List[Target], previous: Dict[str, Optional[str]],
+                     pool: ThreadPoolExecutor) -> Tuple[List[str], Dict[str, str]]:
+    """Put every target back on its previous release at once; (restored, {target: error})."""
+    restorable = [t for t in targets if previous.get(t.name)]
+    errors = pool.map(lambda t: _deploy_one(t, previous[t.name]), restorable)
+    failed = {t.name: err for t, err in zip(restorable, errors) if err}
+    return [t.name for t in restorable if t.name not in failed], failed
+
+
+def rollout(targets: List[Target], release: str, cfg: Dict[str, Any]) -> Dict[str, Any]:
+    batches = plan_batches(len(targets), int(cfg.get("deploy_canary", 1)),
+                           float(cfg.get("deploy_growth", 2)), int(cfg.get("deploy_max_batch", 0)))
+    probes = int(cfg.get("deploy_health_probes", 5))
+    soak = float(cfg.get("deploy_soak_sec", 0))
+    workers = min(len(targets), int(cfg.get("deploy_max_parallel", DEFAULT_MAX_PARALLEL)))
+    summary: Dict[str, Any] = {"release": release, "targets": len(targets), "batches": [],
+                               "status": "ok", "halted_at": None, "reason": None, "rolled_back": []}
+    done: List[Target] = []
+    previous: Dict[str, Optional[str]] = {}
+
+    load_pending()  # requests is first used from the pool's threads
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="deploy") as pool:
+        for i, (start, end) in enumerate(batches):
+            batch = targets[start:end]
+            label = "canary" if i == 0 else f"wave {i}"
+            with span("deploy.batch", batch=i, size=len(batch)) as attrs:
+                t0 = time.perf_counter()
+                previous.update(zip([t.name for t in batch], pool.map(_release_of, batch)))
+                pre = probe_batch(batch, probes, pool)
+                failed = deploy_batch(batch, release, pool)
+                done.extend(batch)
+                if soak:
+                    time.sleep(soak)
+                post = probe_batch(batch, probes, pool)
+                reason = (f"{len(failed)} deploy(s) failed: " + "; ".join(f"{k}: {v}" for k, v in failed.items())
+                          if failed else regression(pre, post, cfg))
+                elapsed = round(time.perf_counter() - t0, 3)
+                attrs.update(error_rate=post["error_rate"], p95_ms=post["p95_ms"], halted=bool(reason))
+            summary["batches"].append({"batch": i, "size": len(batch), "elapsed_sec": elapsed,
+                                       "before": pre, "after": post, "failed": failed})
+            icon = "❌" if reason else "✅"
+            print(f"{icon} {label:<8} {len(batch):>4} target(s) in {elapsed:.2f}s  "
+                  f"errors {post['error_rate']:.1%}  p95 {post['p95_ms']:.0f} ms (before {pre['p95_ms']:.0f} ms)")
+            if reason:
+                summary.update(status="halted", halted_at=i, reason=reason)
+                break
+
+        if summary["status"] == "halted" and cfg.get("deploy_auto_rollback", True):
+            summary["rolled_back"], summary["rollback_failed"] = rollback_targets(done, previous, pool)
+    return summary
+
+
+def write_summary(summary: Dict[str, Any], path: Path = SUMMARY_PATH) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    out = dict(summary, env=os.getenv("APP_ENV", "dev"),
+               timestamp=datetime.utcnow().isoformat(timespec="seconds") + "Z")
+    path.write_text(json.dumps(out, indent=2), encoding="utf-8")
+
 
 def main():
-    print("✅ Prechecks passed.")
-    print("🚀 Deploying application... (simulated)")
-    steps = [
-        "Pulling code/artifact",
-        "Installing dependencies",
-        "Restarting service",
-        "Post-deploy health check"
-    ]
-    for i, step in enumerate(steps, start=1):
-        print(f"{i}) {step} ...")
-        time.sleep(0.5)
-    print("🎉 Deployment completed (simulated).")
+    cfg = get_env_config()
+    try:
+        targets = load_targets(cfg)
+    except (ValueError, ImportError, AttributeError) as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+    if not targets:
+        print("❌ No deploy targets (set deploy_targets or DEPLOY_TARGETS).")
+        sys.exit(2)
+
+    release = release_id()
+    print(f"🚀 Deploying {release} to {len(targets)} target(s) "
+          f"({target_type(cfg)}; canary {cfg.get('deploy_canary', 1)}, "
+          f"growth ×{cfg.get('deploy_growth', 2)})")
+    start = time.perf_counter()
+    try:
+        summary = rollout(targets, release, cfg)
+    finally:
+        for t in targets:
+            t.close()
+    summary["wall_sec"] = round(time.perf_counter() - start, 3)
+    write_summary(summary)
+
+    if summary["status"] != "ok":
+        print(f"🛑 Rollout halted at batch {summary['halted_at']}: {summary['reason']}")
+        if summary["rolled_back"]:
+            print(f"⬅️  Rolled back {len(summary['rolled_back'])} target(s) to their previous release")
+        if summary.get("rollback_failed"):
+            print(f"❌ Rollback failed on: {sorted(summary['rollback_failed'])}")
+        sys.exit(1)
+    print(f"🎉 Deployment of {release} completed on {len(targets)} target(s) in {summary['wall_sec']:.2f}s")
+
 
 if __name__ == "__main__":
-    main()
+    with span("deploy"):
+        main()
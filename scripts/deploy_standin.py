@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local fleet of stand-in deploy targets for exercising deploy.py's http
+targets without real hosts. Each target is a small HTTP server:
+
+  GET  /admin/release   {"release": <current or null>}
+  POST /admin/deploy    {"release"} → takes `deploy_delay` seconds, then switches
+  GET  /healthz         200 after `latency_ms`; on `bad_release`, fails with
+                        probability `bad_error_rate` and adds `bad_latency_ms`
+
+Usage:
+    python scripts/deploy_standin.py serve [n] [base_port]   # print DEPLOY_TARGETS for n targets
+    python scripts/deploy_standin.py bench [n]               # serial per-host vs canary + waves
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+
+class StandinTarget(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, deploy_delay: float = 0.2, latency_ms: float = 2.0,
+                 bad_release: Optional[str] = None, bad_error_rate: float = 0.5, bad_latency_ms: float = 0.0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.release: Optional[str] = None
+        self.deploy_delay, self.latency_ms = deploy_delay, latency_ms
+        self.bad_release, self.bad_error_rate, self.bad_latency_ms = bad_release, bad_error_rate, bad_latency_ms
+        self.deploys: List[str] = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    wbufsize = 64 * 1024           # headers + body in one segment (no delayed-ACK stalls)
+    disable_nagle_algorithm = True
+    server: StandinTarget
+
+    def _send(self, code: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        srv = self.server
+        if self.path == "/admin/release":
+            self._send(200, {"release": srv.release})
+        elif self.path == "/healthz":
+            bad = srv.bad_release is not None and srv.release == srv.bad_release
+            time.sleep((srv.latency_ms + (srv.bad_latency_ms if bad else 0)) / 1000)
+            if bad and random.random() < srv.bad_error_rate:
+                self._send(500, {"ok": False, "release": srv.release})
+            else:
+                self._send(200, {"ok": True, "release": srv.release})
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        srv = self.server
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        if self.path == "/admin/deploy" and body.get("release"):
+            time.sleep(srv.deploy_delay)
+            with srv.lock:
+                srv.release = body["release"]
+                srv.deploys.append(body["release"])
+            self._send(200, {"release": srv.release})
+        else:
+            self._send(404, {"error": "not found"})
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+def start_fleet(n: int, base_port: int = 0, **kwargs) -> List[StandinTarget]:
+    fleet = []
+    for i in range(n):
+        srv = StandinTarget(base_port + i if base_port else 0, **kwargs)
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        fleet.append(srv)
+    return fleet
+
+
+def stop_fleet(fleet: List[StandinTarget]) -> None:
+    for srv in fleet:
+        srv.shutdown()
+        srv.server_close()
+
+
+def bench(n: int) -> None:
+    from deploy import HTTPTarget, rollout
+
+    fleet = start_fleet(n, deploy_delay=0.2, bad_release="r-bad", bad_error_rate=0.5)
+    base = {"deploy_health_probes": 3, "deploy_max_parallel": 64}
+    try:
+        for label, cfg in [("serial", dict(base, deploy_canary=1, deploy_growth=1, deploy_max_batch=1)),
+                           ("waves", dict(base, deploy_canary=1, deploy_growth=2))]:
+            targets = [HTTPTarget(s.url, cfg) for s in fleet]
+            start = time.perf_counter()
+            summary = rollout(targets, f"r-{label}", cfg)
+            print(f"{label:<7} {n} targets: {time.perf_counter() - start:6.2f}s "
+                  f"in {len(summary['batches'])} batch(es), {summary['status']}")
+        targets = [HTTPTarget(s.url, base) for s in fleet]
+        summary = rollout(targets, "r-bad", base)
+        on_bad = sum(1 for s in fleet if s.release == "r-bad")
+        print(f"bad release: {summary['status']} at batch {summary['halted_at']}, "
+              f"{len(summary['rolled_back'])} rolled back, {on_bad} target(s) left on it")
+    finally:
+        stop_fleet(fleet)
+
+
+def main():
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "serve"
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    if cmd == "bench":
+        bench(n)
+        return
+    fleet = start_fleet(n, int(sys.argv[3]) if len(sys.argv) > 3 else 0,
+                        deploy_delay=float(os.getenv("STANDIN_DEPLOY_DELAY", 0.2)),
+                        bad_release=os.getenv("STANDIN_BAD_RELEASE"))
+    print("DEPLOY_TARGETS=" + ",".join(s.url for s in fleet))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stop_fleet(fleet)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,196 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+"""
+Disk gate: space and inodes on every configured mount, judged by trend.
 
-import shutil  #used for disk usage stats via shutil.disk_usage
+Each run samples every mount in `disk_mounts` (default ["/"]) with os.statvfs
+and appends the sample to a fixed-size binary ring buffer per mount under
+`disk_history_dir` (default logs/disk_history/), so history never grows past
+`disk_history_samples` records.
+
+A mount fails when:
+- a least-squares fit of usage over the last `disk_trend_window_hours` (6)
+  projects it full (space or inodes) within `disk_min_hours_to_full` (24), or
+- free space/inodes drop below `disk_critical_free_pct` (2) regardless of trend, or
+- there is not enough history to fit a trend yet and free space is below
+  `disk_free_threshold` / inodes below `disk_inode_free_threshold`.
+
+Exit codes:
+  0 → all mounts OK
+  2 → at least one mount low or filling too fast
+"""
+
+import os
 import sys
+import time
+import struct
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
 from read_config import get_env_config
+from instrument import span
+
+RING_MAGIC = b"PFDRING1"
+RING_HEAD = struct.Struct(">II")        # capacity, total samples written
+RING_REC = struct.Struct(">dQQQQ")      # ts, used, total, used_inodes, total_inodes
+DEFAULT_HISTORY_DIR = "logs/disk_history"
+DEFAULT_SAMPLES = 2016                  # a week at 5-minute intervals
+MIN_TREND_SAMPLES = 3
+MIN_TREND_SPAN_SEC = 300
+
+
+class RingSeries:
+    """Fixed-capacity on-disk ring of RING_REC records."""
+
+    def __init__(self, path: Path, capacity: int = DEFAULT_SAMPLES):
+        self.path = Path(path)
+        self.capacity = capacity
+
+    def _header(self, f) -> Tuple[int, int]:
+        f.seek(0)
+        raw = f.read(len(RING_MAGIC) + RING_HEAD.size)
+        if len(raw) < len(RING_MAGIC) + RING_HEAD.size or raw[:len(RING_MAGIC)] != RING_MAGIC:
+            return self.capacity, 0
+        cap, written = RING_HEAD.unpack(raw[len(RING_MAGIC):])
+        return cap, written
+
+    def append(self, record: Tuple) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        mode = "r+b" if self.path.exists() else "w+b"
+        with open(self.path, mode) as f:
+            cap, written = self._header(f)
+            if cap != self.capacity:
+                # Capacity changed in config: keep the newest records that fit
+                recent = self._read(f, cap, written)[-self.capacity:]
+                f.truncate(0)
+                cap, written = self.capacity, 0
+                for rec in recent:
+                    self._write_rec(f, cap, written, rec)
+                    written += 1
+            self._write_rec(f, cap, written, record)
+            written += 1
+            f.seek(0)
+            f.write(RING_MAGIC + RING_HEAD.pack(cap, written))
+
+    @staticmethod
+    def _write_rec(f, cap: int, index: int, rec: Tuple) -> None:
+        f.seek(len(RING_MAGIC) + RING_HEAD.size + (index % cap) * RING_REC.size)
+        f.write(RING_REC.pack(*rec))
+
+    def _read(self, f, cap: int, written: int) -> List[Tuple]:
+        n = min(cap, written)
+        f.seek(len(RING_MAGIC) + RING_HEAD.size)
+        raw = f.read(cap * RING_REC.size)
+        recs = [RING_REC.unpack_from(raw, i * RING_REC.size) for i in range(n)
+                if (i + 1) * RING_REC.size <= len(raw)]
+        start = written % cap if written > cap else 0
+        return recs[start:] + recs[:start]
+
+    def read(self) -> List[Tuple]:
+        """All stored records, oldest first."""
+        try:
+            with open(self.path, "rb") as f:
+                cap, written = self._header(f)
+                return self._read(f, cap, written)
+        except FileNotFoundError:
+            return []
 
-def main():
-    cfg = get_env_config()
-    threshold = float(cfg.get("disk_free_threshold", 20))
 
-    total, used, free = shutil.disk_usage("/")     #It returns three numbers (all in bytes)
-    free_percent = (free / total) * 100
+def history_file(history_dir: Path, mount: str) -> Path:
+    name = mount.strip("/").replace("/", "_") or "root"
+    return history_dir / f"{name}.ring"
 
-    print(f"Total: {total/1e9:.2f} GB  Used: {used/1e9:.2f} GB  Free: {free/1e9:.2f} GB")
-    print(f"Free disk space: {free_percent:.2f}% (threshold: {threshold}%)")
 
-    # Optional log
-    import os
-    os.makedirs("logs", exist_ok=True)
-    with open("logs/disk_check.log", "a", encoding="utf-8") as f:
-        f.write(f"Free: {free_percent:.2f}%\n")
+def sample(mount: str) -> Tuple[float, int, int, int, int]:
+    st = os.statvfs(mount)
+    total = st.f_blocks * st.f_frsize
+    free = st.f_bavail * st.f_frsize            # what shutil.disk_usage reports as free
+    used_inodes = st.f_files - st.f_favail
+    return time.time(), total - free, total, used_inodes, st.f_files
+
+
+def growth_per_sec(points: List[Tuple[float, float]]) -> Optional[float]:
+    """Least-squares slope of (t, value) points, or None if too little history."""
+    if len(points) < MIN_TREND_SAMPLES or points[-1][0] - points[0][0] < MIN_TREND_SPAN_SEC:
+        return None
+    n = len(points)
+    mt = sum(t for t, _ in points) / n
+    mv = sum(v for _, v in points) / n
+    var = sum((t - mt) ** 2 for t, _ in points)
+    if var == 0:
+        return None
+    return sum((t - mt) * (v - mv) for t, v in points) / var
+
+
+def hours_to_full(used: float, total: float, slope: Optional[float]) -> Optional[float]:
+    if slope is None or slope <= 0 or total <= 0:
+        return None
+    return max(0.0, total - used) / slope / 3600
+
+
+def assess_mount(mount: str, cfg: Dict[str, Any], history_dir: Path, capacity: int) -> Dict[str, Any]:
+    series = RingSeries(history_file(history_dir, mount), capacity)
+    rec = sample(mount)
+    series.append(rec)
+    ts, used, total, iused, itotal = rec
+
+    window = float(cfg.get("disk_trend_window_hours", 6)) * 3600
+    recent = [r for r in series.read() if r[0] >= ts - window]
+    slope = growth_per_sec([(r[0], r[1]) for r in recent])
+    ttf_space = hours_to_full(used, total, slope)
+    ttf_inodes = hours_to_full(iused, itotal, growth_per_sec([(r[0], r[3]) for r in recent])) if itotal else None
+
+    free_pct = (total - used) / total * 100 if total else 100.0
+    ifree_pct = (itotal - iused) / itotal * 100 if itotal else 100.0
+    min_hours = float(cfg.get("disk_min_hours_to_full", 24))
+    critical = float(cfg.get("disk_critical_free_pct", 2))
+
+    problems = []
+    for what, ttf in (("space", ttf_space), ("inodes", ttf_inodes)):
+        if ttf is not None and ttf < min_hours:
+            problems.append(f"{what} projected full in {ttf:.1f}h (< {min_hours:g}h)")
+    if free_pct < critical or ifree_pct < critical:
+        problems.append(f"below critical floor ({critical:g}% free)")
+    if slope is None:
+        threshold = float(cfg.get("disk_free_threshold", 20))
+        ithreshold = float(cfg.get("disk_inode_free_threshold", 5))
+        if free_pct < threshold:
+            problems.append(f"free space {free_pct:.2f}% < {threshold:g}% (no trend yet)")
+        if itotal and ifree_pct < ithreshold:
+            problems.append(f"free inodes {ifree_pct:.2f}% < {ithreshold:g}% (no trend yet)")
+
+    return {"mount": mount, "total": total, "used": used, "free_pct": free_pct,
+            "inode_free_pct": ifree_pct if itotal else None,
+            "hours_to_full": ttf_space, "inode_hours_to_full": ttf_inodes,
+            "samples": len(recent), "problems": problems}
+
+
+def main():
+    cfg = get_env_config()
+    mounts = cfg.get("disk_mounts") or ["/"]
+    history_dir = Path(cfg.get("disk_history_dir", DEFAULT_HISTORY_DIR))
+    capacity = int(cfg.get("disk_history_samples", DEFAULT_SAMPLES))
+
+    failed = False
+    for mount in mounts:
+        try:
+            r = assess_mount(str(mount), cfg, history_dir, capacity)
+        except OSError as e:
+            print(f"❌ {mount}: cannot stat ({e})")
+            failed = True
+            continue
+        free = r["total"] - r["used"]
+        inodes = f"{r['inode_free_pct']:.2f}%" if r["inode_free_pct"] is not None else "n/a"
+        trend = f"{r['hours_to_full']:.1f}h" if r["hours_to_full"] is not None else "not filling / no trend"
+        print(f"{mount}: Total: {r['total']/1e9:.2f} GB  Free: {free/1e9:.2f} GB ({r['free_pct']:.2f}%)  "
+              f"Inodes free: {inodes}  Time to full: {trend}  [{r['samples']} samples]")
+        for p in r["problems"]:
+            print(f"⚠️  ALERT: {mount}: {p}")
+        failed = failed or bool(r["problems"])
 
-    if free_percent < threshold:
-        print("⚠️  ALERT: Low disk space")
+    if failed:
         sys.exit(2)
 
 if __name__ == "__main__":
-    main()
+    with span("disk_check"):
+        main()
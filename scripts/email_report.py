@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-Email the latest HTML report as an attachment (optional).
+Email the latest HTML report (optional).
 
 If SMTP secrets are not configured (or partially configured),
 the script will SKIP emailing gracefully and exit 0,
@@ -9,21 +9,64 @@ so your pipeline does not fail just because email isn't enabled yet.
 
 Expected secrets (set in GitHub Actions):
   SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD
+Optional:
+  SMTP_STARTTLS=0   talk plain SMTP (local stand-in: scripts/smtp_standin.py)
+
+Delivery:
+- REPORT_ENVS (as in generate_report.py) selects the environments; each gets
+  its own latest report sent to its `report_email_to` (a string, comma-separated
+  string or list). All messages go over one SMTP session, reconnecting once
+  if the relay drops it.
+- The latest report comes from the report index (report_index.py), so
+  report_dir is never listed.
+- Inline base64 images are moved into CID attachments (identical images are
+  attached once), so the HTML part stays small.
+- A message larger than `report_email_max_kb` (default 5120), or than the
+  relay's advertised SIZE limit, is replaced per `report_email_oversize`:
+    gzip  → summary body + the report as a .html.gz attachment, falling back
+            to `link` if that is still too big (default)
+    link  → summary body with a link `report_link_base`/<report name>
+            (summary only when no link base is configured)
 """
 
 import os
-import sys
-import smtplib
+import re
+import gzip
+import base64
+import hashlib
 from pathlib import Path
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
 from read_config import get_env_config
+from instrument import span
+from lazy import lazy_import
+from report_index import ReportIndex
+
+if TYPE_CHECKING:
+    from email.message import EmailMessage
 
+# Only paid for when there is something to send
+smtplib = lazy_import("smtplib")
+# Only for selected_envs(); the module body (report rendering) is not needed to start
+generate_report = lazy_import("generate_report")
 
-def latest_report(report_dir: Path) -> Path | None:
-    files = sorted(report_dir.glob("model_report_*.html"),
-                   key=lambda p: p.stat().st_mtime, reverse=True)
-    return files[0] if files else None
+DEFAULT_MAX_KB = 5120
+_DATA_IMG = re.compile(r'src="data:image/(?P<subtype>png|jpeg|gif);base64,(?P<data>[A-Za-z0-9+/=\s]+)"')
+
+
+def latest_report(report_dir: Path, env: Optional[str] = None) -> Path | None:
+    """Newest report for `env` (None → any), looked up in the report index (report_index.py)."""
+    if not report_dir.is_dir():
+        return None
+    index = ReportIndex(report_dir)
+    try:
+        rpt = index.latest(env)
+        if rpt is not None and not rpt.exists():  # deleted behind the index's back
+            index.rebuild()
+            rpt = index.latest(env)
+        return rpt
+    finally:
+        index.close()
 
 
 def get_smtp_config():
@@ -53,21 +96,142 @@ def get_smtp_config():
     return host, port, user, password
 
 
-def main():
-    cfg = get_env_config()
-    env = os.getenv("APP_ENV", "dev")
-    report_dir = Path(cfg.get("report_dir", "reports"))
-    to_addr = cfg.get("report_email_to")
-    from_addr = cfg.get("report_email_from", "no-reply@company.com")
-
-    rpt = latest_report(report_dir)
-    if not rpt:
-        print("ℹ️  No report found to email. Skipping email step.")
-        return  # exit 0
+def recipients(value: Any) -> List[str]:
+    if not value:
+        return []
+    items = value if isinstance(value, (list, tuple)) else str(value).split(",")
+    return [str(a).strip() for a in items if str(a).strip()]
+
+
+def extract_images(html: str) -> Tuple[str, List[Tuple[str, str, bytes]]]:
+    """Replace data: URI images with cid: references; returns (html, [(cid, subtype, bytes)])."""
+    from email.utils import make_msgid
+    images: List[Tuple[str, str, bytes]] = []
+    by_digest: Dict[str, str] = {}
+
+    def swap(m):
+        raw = base64.b64decode(re.sub(r"\s+", "", m.group("data")))
+        digest = hashlib.sha256(raw).hexdigest()
+        if digest not in by_digest:
+            cid = make_msgid(domain="report.local")
+            by_digest[digest] = cid
+            images.append((cid, m.group("subtype"), raw))
+        return f'src="cid:{by_digest[digest][1:-1]}"'
+
+    return _DATA_IMG.sub(swap, html), images
+
+
+def summary_text(env: str, rpt: Path, size: int, note: str = "") -> str:
+    lines = [f"Report: {rpt.name}", f"Environment: {env}", f"Size: {size / 1024:.0f} KB"]
+    if note:
+        lines += ["", note]
+    return "\n".join(lines) + "\n"
+
+
+def _base_message(env: str, rpt: Path, from_addr: str, to_addrs: List[str]) -> "EmailMessage":
+    from email.message import EmailMessage
+    msg = EmailMessage()
+    msg["From"] = from_addr
+    msg["To"] = ", ".join(to_addrs)
+    msg["Subject"] = f"[{env}] Model Report: {rpt.name}"
+    return msg
+
+
+def build_message(env: str, rpt: Path, from_addr: str, to_addrs: List[str], max_bytes: int,
+                  oversize: str = "gzip", link_base: str = "") -> Tuple["EmailMessage", str]:
+    """Compose the message for one report; returns (message, mode) with mode inline|gzip|link."""
+    html = rpt.read_text(encoding="utf-8")
+    size = len(html.encode("utf-8"))
+
+    if oversize != "link":
+        msg = _base_message(env, rpt, from_addr, to_addrs)
+        msg.set_content(summary_text(env, rpt, size))
+        html_cid, images = extract_images(html)
+        msg.add_alternative(html_cid, subtype="html")
+        html_part = msg.get_payload()[1]
+        for cid, subtype, raw in images:
+            html_part.add_related(raw, "image", subtype, cid=cid)
+        if len(msg.as_bytes()) <= max_bytes:
+            return msg, "inline"
 
-    # If recipient missing, skip silently (not configured yet)
-    if not to_addr:
-        print("ℹ️  report_email_to missing in env.yaml. Skipping email step.")
+        msg = _base_message(env, rpt, from_addr, to_addrs)
+        msg.set_content(summary_text(env, rpt, size, "The full report is too large to inline; it is attached gzip-compressed."))
+        msg.add_attachment(gzip.compress(html.encode("utf-8"), compresslevel=9), maintype="application",
+                           subtype="gzip", filename=f"{rpt.name}.gz")
+        if len(msg.as_bytes()) <= max_bytes:
+            return msg, "gzip"
+
+    link = f"{link_base.rstrip('/')}/{rpt.name}" if link_base else ""
+    note = (f"The full report is too large for email: {link}" if link
+            else "The full report is too large for email; see the pipeline artifacts.")
+    msg = _base_message(env, rpt, from_addr, to_addrs)
+    msg.set_content(summary_text(env, rpt, size, note))
+    return msg, "link"
+
+
+class SMTPSession:
+    """One lazily opened, reused SMTP connection; reconnects once if the relay drops it."""
+
+    def __init__(self, host: str, port: int, user: str, password: str, starttls: bool = True):
+        self.host, self.port, self.user, self.password = host, port, user, password
+        self.starttls = starttls
+        self._server: Optional[smtplib.SMTP] = None
+
+    def _connect(self) -> "smtplib.SMTP":
+        if self._server is None:
+            server = smtplib.SMTP(self.host, self.port, timeout=60)
+            if self.starttls:
+                server.starttls()
+            server.login(self.user, self.password)
+            self._server = server
+        return self._server
+
+    def size_limit(self) -> int:
+        """Relay's advertised SIZE limit in bytes (0 = none advertised)."""
+        limit = self._connect().esmtp_features.get("size", "")
+        return int(limit) if limit.isdigit() else 0
+
+    def send(self, msg: "EmailMessage") -> None:
+        try:
+            self._connect().send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            self._server = None
+            self._connect().send_message(msg)
+
+    def close(self) -> None:
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except smtplib.SMTPException:
+                pass
+            self._server = None
+
+    def __enter__(self) -> "SMTPSession":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def main():
+    jobs = []
+    for env in generate_report.selected_envs():
+        cfg = get_env_config(env)
+        to_addrs = recipients(cfg.get("report_email_to"))
+        try:
+            rpt = latest_report(Path(cfg.get("report_dir", "reports")), env)
+        except Exception as e:  # e.g. sqlite3.OperationalError: index locked or unreadable
+            print(f"⚠️  [{env}] Could not look up the latest report ({type(e).__name__}: {e}). Skipping.")
+            continue
+        if not rpt:
+            print(f"ℹ️  [{env}] No report found to email. Skipping.")
+            continue
+        # If recipient missing, skip silently (not configured yet)
+        if not to_addrs:
+            print(f"ℹ️  [{env}] report_email_to missing in env.yaml. Skipping.")
+            continue
+        jobs.append((env, cfg, rpt, to_addrs))
+    if not jobs:
         return  # exit 0
 
     host, port, user, password = get_smtp_config()
@@ -76,31 +240,29 @@ def main():
         print("    Provide SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD as Actions secrets to enable emailing.")
         return  # exit 0
 
-    # Compose message
-    subject = f"[{env}] Model Report: {rpt.name}"
-    msg = MIMEMultipart()
-    msg["From"] = from_addr
-    msg["To"] = to_addr
-    msg["Subject"] = subject
-
-    body = f"Attached: {rpt.name}\nEnvironment: {env}"
-    msg.attach(MIMEText(body, "plain"))
-
-    html = rpt.read_text(encoding="utf-8")
-    msg.attach(MIMEText(html, "html"))
-
-    # Send
+    starttls = os.getenv("SMTP_STARTTLS", "1") != "0"
+    # Never fail the pipeline over email (SMTP, relay or message errors); print and exit 0
     try:
-        with smtplib.SMTP(host, port) as server:
-            server.starttls()
-            server.login(user, password)
-            server.send_message(msg)
-        print(f"✅ Email sent to {to_addr}")
+        with SMTPSession(host, port, user, password, starttls) as session:
+            relay_limit = session.size_limit()
+            for env, cfg, rpt, to_addrs in jobs:
+                max_bytes = int(cfg.get("report_email_max_kb", DEFAULT_MAX_KB)) * 1024
+                if relay_limit:
+                    max_bytes = min(max_bytes, relay_limit)
+                try:
+                    msg, mode = build_message(env, rpt, cfg.get("report_email_from", "no-reply@company.com"),
+                                              to_addrs, max_bytes, cfg.get("report_email_oversize", "gzip"),
+                                              cfg.get("report_link_base", ""))
+                    with span("email_report.send", env=env, mode=mode, bytes=len(msg.as_bytes())):
+                        session.send(msg)
+                    print(f"✅ [{env}] Email sent to {', '.join(to_addrs)} ({mode}, {len(msg.as_bytes()) / 1024:.1f} KB)")
+                except Exception as e:
+                    print(f"⚠️  [{env}] Email send failed: {e}. Not failing the job.")
     except Exception as e:
-        # Don't fail the pipeline for transient SMTP issues; print and exit 0
         print(f"⚠️  Email send failed: {e}. Not failing the job.")
         return  # exit 0
 
 
 if __name__ == "__main__":
-    main()
+    with span("email_report"):
+        main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local stand-in for the subset of the boto3 S3 client used by these scripts.
+
+Objects live on disk under <root>/<bucket>/<key>, with their user metadata in
+<root>/.meta/<bucket>/<key>.json, so several processes can share one fake
+bucket. Supports head_object, get_object (incl. Range and IfMatch), put_object,
+list_objects_v2 (Prefix, StartAfter, MaxKeys, ContinuationToken),
+get_paginator("list_objects_v2") and download_file. Every call is counted in
+`calls` so callers can assert how much S3 traffic a code path generates.
+
+Usage:
+    from fake_s3 import FakeS3Client
+    s3 = FakeS3Client("/tmp/fake-s3")
+    s3.put_object(Bucket="b", Key="models/m1.pkl", Body=b"...")
+"""
+
+import io
+import json
+import shutil
+import hashlib
+from pathlib import Path
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Optional
+
+
+class FakeS3Error(Exception):
+    """Mimics botocore's ClientError closely enough for callers that check .response."""
+
+    def __init__(self, code: str, message: str):
+        super().__init__(f"{code}: {message}")
+        self.response = {"Error": {"Code": code, "Message": message}}
+
+
+class _Paginator:
+    def __init__(self, client: "FakeS3Client"):
+        self._client = client
+
+    def paginate(self, **kwargs) -> Iterator[Dict[str, Any]]:
+        kwargs = dict(kwargs)
+        kwargs.pop("PaginationConfig", None)
+        while True:
+            page = self._client.list_objects_v2(**kwargs)
+            yield page
+            if not page.get("IsTruncated"):
+                return
+            kwargs["ContinuationToken"] = page["NextContinuationToken"]
+
+
+class FakeS3Client:
+    PAGE_SIZE = 1000
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+        self.calls: Counter = Counter()
+
+    # ---------- helpers ----------
+    def _path(self, bucket: str, key: str) -> Path:
+        return self.root / bucket / key
+
+    def _meta_path(self, bucket: str, key: str) -> Path:
+        return self.root / ".meta" / bucket / f"{key}.json"
+
+    def _meta(self, bucket: str, key: str) -> Dict[str, Any]:
+        path = self._path(bucket, key)
+        if not path.is_file():
+            raise FakeS3Error("404", f"s3://{bucket}/{key} not found")
+        meta_path = self._meta_path(bucket, key)
+        meta = json.loads(meta_path.read_text(encoding="utf-8")) if meta_path.exists() else {}
+        st = path.stat()
+        return {
+            "Key": key,
+            "Size": st.st_size,
+            "LastModified": datetime.fromtimestamp(st.st_mtime, tz=timezone.utc),
+            "ETag": meta.get("ETag") or '"%s"' % hashlib.md5(path.read_bytes()).hexdigest(),
+            "Metadata": meta.get("Metadata", {}),
+        }
+
+    # ---------- client API ----------
+    def put_object(self, Bucket: str, Key: str, Body: bytes = b"",
+                   Metadata: Optional[Dict[str, str]] = None, **_) -> Dict[str, Any]:
+        self.calls["put_object"] += 1
+        if isinstance(Body, str):
+            Body = Body.encode("utf-8")
+        elif hasattr(Body, "read"):
+            Body = Body.read()
+        path = self._path(Bucket, Key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".fake-tmp")
+        tmp.write_bytes(Body)
+        tmp.replace(path)
+        etag = '"%s"' % hashlib.md5(Body).hexdigest()
+        meta_path = self._meta_path(Bucket, Key)
+        meta_path.parent.mkdir(parents=True, exist_ok=True)
+        meta_path.write_text(json.dumps({"ETag": etag, "Metadata": Metadata or {}}), encoding="utf-8")
+        return {"ETag": etag}
+
+    def head_object(self, Bucket: str, Key: str, **_) -> Dict[str, Any]:
+        self.calls["head_object"] += 1
+        meta = self._meta(Bucket, Key)
+        return {
+            "ContentLength": meta["Size"],
+            "LastModified": meta["LastModified"],
+            "ETag": meta["ETag"],
+            "Metadata": meta["Metadata"],
+        }
+
+    def get_object(self, Bucket: str, Key: str, Range: Optional[str] = None,
+                   IfMatch: Optional[str] = None, **_) -> Dict[str, Any]:
+        self.calls["get_object"] += 1
+        meta = self._meta(Bucket, Key)
+        if IfMatch is not None and IfMatch != meta["ETag"]:
+            raise FakeS3Error("PreconditionFailed", f"s3://{Bucket}/{Key} ETag is {meta['ETag']}, not {IfMatch}")
+        with open(self._path(Bucket, Key), "rb") as f:
+            if Range:
+                start_s, end_s = Range.removeprefix("bytes=").split("-")
+                start = int(start_s)
+                end = int(end_s) if end_s else meta["Size"] - 1
+                f.seek(start)
+                data = f.read(end - start + 1)
+            else:
+                data = f.read()
+        return {
+            "Body": io.BytesIO(data),
+            "ContentLength": len(data),
+            "ETag": meta["ETag"],
+            "LastModified": meta["LastModified"],
+            "Metadata": meta["Metadata"],
+        }
+
+    def download_file(self, Bucket: str, Key: str, Filename: str, **_) -> None:
+        self.calls["download_file"] += 1
+        self._meta(Bucket, Key)
+        shutil.copyfile(self._path(Bucket, Key), Filename)
+
+    def list_objects_v2(self, Bucket: str, Prefix: str = "", StartAfter: str = "",
+                        MaxKeys: Optional[int] = None,
+                        ContinuationToken: Optional[str] = None, **_) -> Dict[str, Any]:
+        self.calls["list_objects_v2"] += 1
+        base = self.root / Bucket
+        keys = sorted(
+            p.relative_to(base).as_posix()
+            for p in base.rglob("*")
+            if p.is_file() and not p.name.endswith(".fake-tmp")
+        ) if base.exists() else []
+        after = ContinuationToken or StartAfter
+        keys = [k for k in keys if k.startswith(Prefix) and k > after]
+        limit = MaxKeys or self.PAGE_SIZE
+        page, rest = keys[:limit], keys[limit:]
+        out: Dict[str, Any] = {"KeyCount": len(page), "IsTruncated": bool(rest)}
+        if page:
+            out["Contents"] = [
+                {k: v for k, v in self._meta(Bucket, key).items() if k != "Metadata"}
+                for key in page
+            ]
+        if rest:
+            out["NextContinuationToken"] = page[-1]
+        return out
+
+    def get_paginator(self, name: str) -> _Paginator:
+        if name != "list_objects_v2":
+            raise NotImplementedError(name)
+        return _Paginator(self)
@@ -2,20 +2,41 @@
 # -*- coding: utf-8 -*-
 """
 Generate an HTML report summarizing the current model version and basic metrics,
-and save it under reports/model_report_<timestamp>.html.
+and save it under reports/model_report_<timestamp>_<env>.html.
+
+Rendering is kept cheap for nightly runs over many environments:
+- the chart plots daily KPIs rolled up from request logs by kpi_ingest.py
+  (a placeholder series when `kpi_log_glob` is not set);
+- charts are cached under <report_dir>/.cache/charts, keyed by a hash of their
+  input data; pandas/matplotlib are only imported when a chart is stale;
+- the Jinja template is compiled once per process through a cached
+  Environment with a bytecode cache in <report_dir>/.cache/jinja;
+- REPORT_ENVS (comma-separated, or "all") renders several environments in one
+  invocation, in a process pool of REPORT_WORKERS (default: CPU count).
+  Without it, only APP_ENV (default dev) is rendered.
+
+Each report is recorded in the report index (report_index.py), which applies
+retention (`report_keep` / `report_max_age_days`) and refreshes the
+<report_dir>/index.html dashboard without reading older reports.
 """
 
 import os
+import sys
 import json
+import hashlib
 from pathlib import Path
-from datetime import datetime
-import base64
-from io import BytesIO
+from datetime import datetime, date, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+from read_config import get_env_config, list_envs
+from instrument import span
+from report_index import publish
+from lazy import lazy_import
 
-import pandas as pd
-import matplotlib.pyplot as plt
-from jinja2 import Template
-from read_config import get_env_config
+model_smoketest = lazy_import("model_smoketest")
+
+CHART_CACHE_KEEP = 100
 
 HTML_TEMPLATE = """
 <!doctype html>
@@ -29,6 +50,8 @@ HTML_TEMPLATE = """
     .meta { color: #666; margin-bottom: 1rem; }
     pre { background: #f6f8fa; padding: 1rem; border-radius: 6px; }
     img { max-width: 640px; border: 1px solid #ddd; }
+    table { border-collapse: collapse; margin-top: 1rem; }
+    td, th { border: 1px solid #ddd; padding: 0.25rem 0.6rem; text-align: right; }
   </style>
 </head>
 <body>
@@ -38,56 +61,169 @@ HTML_TEMPLATE = """
   <h2>Current Model</h2>
   <pre>{{ model_info | tojson(indent=2) }}</pre>
 
+{% if kpis %}
+  <h2>Daily Requests</h2>
+  <img src="data:image/png;base64,{{ chart_b64 }}" alt="chart" />
+  <table>
+    <tr><th>Day</th><th>Requests</th><th>Errors</th><th>Error rate</th><th>Avg latency (ms)</th><th>Max latency (ms)</th></tr>
+    {% for k in kpis %}
+    <tr><td>{{ k.day }}</td><td>{{ k.requests }}</td><td>{{ k.errors }}</td><td>{{ k.error_rate }}</td><td>{{ k.latency_ms_avg }}</td><td>{{ k.latency_ms_max }}</td></tr>
+    {% endfor %}
+  </table>
+{% else %}
   <h2>Daily Count (Example Chart)</h2>
-  <p>This chart is a placeholder to show chart embedding. Replace with real KPI.</p>
+  <p>This chart is a placeholder to show chart embedding. Set <code>kpi_log_glob</code> in env.yaml to chart real KPIs.</p>
   <img src="data:image/png;base64,{{ chart_b64 }}" alt="chart" />
+{% endif %}
 
   <h2>Notes</h2>
   <ul>
-    <li>Replace the dummy data with your real evaluation metrics.</li>
+    <li>KPIs are rolled up incrementally from request logs by scripts/kpi_ingest.py.</li>
     <li>Attach additional artifacts as needed.</li>
   </ul>
 </body>
 </html>
 """
 
-def render_chart_b64():
-    # Dummy chart (replace with your metrics)
-    days = pd.date_range(end=pd.Timestamp.today(), periods=7)
-    values = [10, 13, 8, 12, 15, 14, 11]
+def dummy_chart_inputs() -> Dict[str, Any]:
+    today = date.today()
+    return {
+        "title": "Requests per Day (Dummy)",
+        "days": [(today - timedelta(days=6 - i)).isoformat() for i in range(7)],
+        "values": [10, 13, 8, 12, 15, 14, 11],
+    }
+
+def kpi_inputs(cfg: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """Chart data and table rows from the KPI rollups; dummy chart when no logs are configured."""
+    if not cfg.get("kpi_log_glob"):
+        return dummy_chart_inputs(), []
+    from kpi_ingest import daily_kpis, ingest
+    kpis = daily_kpis(ingest(cfg), int(cfg.get("kpi_chart_days", 14)))
+    if not len(kpis):
+        return dummy_chart_inputs(), []
+    rows = [{
+        "day": r.day.date().isoformat(),
+        "requests": int(r.requests),
+        "errors": int(r.errors),
+        "error_rate": f"{r.error_rate:.2%}" if r.error_rate == r.error_rate else "n/a",
+        "latency_ms_avg": f"{r.latency_ms_avg:.1f}" if r.latency_ms_avg == r.latency_ms_avg else "n/a",
+        "latency_ms_max": f"{r.latency_ms_max:.1f}" if r.latency_ms_max == r.latency_ms_max else "n/a",
+    } for r in kpis.itertuples()]
+    data = {"title": "Requests per Day",
+            "days": [r["day"] for r in rows],
+            "values": [r["requests"] for r in rows]}
+    return data, rows
+
+def render_chart_png(data: Dict[str, Any]) -> bytes:
+    # Heavy imports happen only when a chart actually has to be drawn
+    from io import BytesIO
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import pandas as pd
+
+    days = pd.to_datetime(data["days"])
     fig, ax = plt.subplots()
-    ax.plot(days, values, marker="o")
-    ax.set_title("Requests per Day (Dummy)")
+    ax.plot(days, data["values"], marker="o")
+    ax.set_title(data["title"])
     ax.set_xlabel("Date")
     ax.set_ylabel("Count")
     fig.autofmt_xdate()
     buf = BytesIO()
     fig.savefig(buf, format="png", dpi=120, bbox_inches="tight")
     plt.close(fig)
-    return base64.b64encode(buf.getvalue()).decode("ascii")
+    return buf.getvalue()
 
-def main():
-    cfg = get_env_config()
-    env = os.getenv("APP_ENV", "dev")
+def render_chart_b64(data: Dict[str, Any], cache_dir: Path) -> str:
+    """Base64 PNG for data, reused from cache_dir when the same data was drawn before."""
+    import base64
+    key = hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    cached = cache_dir / f"{key}.b64"
+    if cached.exists():
+        os.utime(cached)  # mark as recently used for pruning
+        return cached.read_text(encoding="ascii")
+
+    b64 = base64.b64encode(render_chart_png(data)).decode("ascii")
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp = cached.with_name(f"{cached.name}.{os.getpid()}.tmp")
+    tmp.write_text(b64, encoding="ascii")
+    os.replace(tmp, cached)
+    prune_cache(cache_dir, CHART_CACHE_KEEP)
+    return b64
+
+def prune_cache(cache_dir: Path, keep: int) -> None:
+    entries = sorted(cache_dir.glob("*.b64"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for stale in entries[keep:]:
+        stale.unlink(missing_ok=True)
+
+@lru_cache(maxsize=None)
+def report_template(cache_dir: str):
+    """Compiled report template; compiled once per process, bytecode reused across runs."""
+    from jinja2 import DictLoader, Environment, FileSystemBytecodeCache
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    env = Environment(loader=DictLoader({"model_report.html": HTML_TEMPLATE}),
+                      bytecode_cache=FileSystemBytecodeCache(cache_dir),
+                      auto_reload=False)
+    return env.get_template("model_report.html")
+
+def render_report(env: str) -> Path:
+    cfg = get_env_config(env)
     report_dir = Path(cfg.get("report_dir", "reports"))
     report_dir.mkdir(parents=True, exist_ok=True)
+    cache_dir = report_dir / ".cache"
 
-    smoketest_json = report_dir / "smoketest_summary.json"
-    model_info = {}
-    if smoketest_json.exists():
-        model_info = json.loads(smoketest_json.read_text(encoding="utf-8"))
+    # Per env: with a shared report_dir, another env's smoke test must not show up here
+    model_info = model_smoketest.read_summary(report_dir, env) or {}
 
-    ts = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    chart_b64 = render_chart_b64()
-    html = Template(HTML_TEMPLATE).render(
+    ts = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+    with span("generate_report.kpis", env=env):
+        chart_data, kpis = kpi_inputs(cfg)
+    with span("generate_report.chart", env=env):
+        chart_b64 = render_chart_b64(chart_data, cache_dir / "charts")
+    html = report_template(str(cache_dir / "jinja")).render(
         env=env,
         timestamp=f"{ts}Z",
         model_info=model_info,
-        chart_b64=chart_b64
+        chart_b64=chart_b64,
+        kpis=kpis
     )
-    out_html = report_dir / f"model_report_{ts}.html"
+    # Always name the env: dev and prod may share report_dir
+    out_html = report_dir / f"model_report_{ts}_{env}.html"
     out_html.write_text(html, encoding="utf-8")
-    print("✅ Report generated:", out_html)
+    with span("generate_report.index", env=env):
+        pruned = publish(cfg, env, out_html, model_info)
+    if pruned:
+        print(f"🧹 [{env}] Removed {pruned} report(s) past retention")
+    return out_html
+
+def selected_envs() -> List[str]:
+    wanted = os.getenv("REPORT_ENVS", "").strip()
+    if not wanted:
+        return [os.getenv("APP_ENV", "dev")]
+    if wanted == "all":
+        return list_envs()
+    return [e.strip() for e in wanted.split(",") if e.strip()]
+
+def main():
+    envs = selected_envs()
+    if len(envs) == 1:
+        print("✅ Report generated:", render_report(envs[0]))
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+    workers = int(os.getenv("REPORT_WORKERS", "0")) or min(len(envs), os.cpu_count() or 1)
+    failed = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {env: pool.submit(render_report, env) for env in envs}
+        for env, fut in futures.items():
+            try:
+                print(f"✅ Report generated [{env}]:", fut.result())
+            except BaseException as e:  # SystemExit from config errors included
+                print(f"❌ Report failed [{env}]: {type(e).__name__}: {e}")
+                failed.append(env)
+    if failed:
+        sys.exit(1)
 
 if __name__ == "__main__":
-    main()
+    with span("generate_report"):
+        main()
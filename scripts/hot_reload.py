@@ -1,13 +1,128 @@
 #!/usr/bin/env python3
-import os, sys, requests
+"""
+Switch the serving process to the model behind model_current_symlink.
+
+Default protocol (RELOAD_MODE=swap), so requests never wait on a model load:
+  1. POST /admin/models/preload   load + warm the new artifact in a standby slot
+  2. GET  /admin/models/standby   poll until state == "ready" (or "failed")
+  3. POST /admin/models/activate  atomic flip of the active model
+  4. POST /admin/models/release   free the previous model
+Servers without the standby API (404 on preload), or RELOAD_MODE=legacy, get
+the old single POST to /admin/reload. Error or non-JSON answers while polling
+the standby are retried until the timeout. Once the flip succeeded a failed
+release only warns: the new model is already serving.
+
+Environment:
+  RELOAD_URL            legacy endpoint (default http://localhost:8080/admin/reload);
+                        the admin API is resolved against the same base URL
+  RELOAD_TOKEN          bearer token
+  RELOAD_MODE           swap | legacy (default swap)
+  RELOAD_READY_TIMEOUT  seconds to wait for the standby to become ready (default 300)
+
+scripts/reload_standin.py provides a local server implementing this API.
+"""
+import os, sys, time
+from pathlib import Path
 from read_config import get_env_config
+from instrument import span
+from lazy import lazy_import
+
+requests = lazy_import("requests")
+
+
+class ReloadError(Exception):
+    pass
+
+
+class StandbyUnsupported(Exception):
+    """The server has no standby-slot API; use the legacy reload instead."""
+
+
+def legacy_reload(url, headers, session=None, json_body=None):
+    r = (session or requests).post(url, headers=headers, json=json_body, timeout=10)
+    r.raise_for_status()
+    return r
+
+
+def standby_state(session, base, headers):
+    """The standby slot's state; a 5xx or non-JSON answer reads as {"state": "unavailable"}."""
+    r = session.get(f"{base}/admin/models/standby", headers=headers, timeout=10)
+    if 400 <= r.status_code < 500:
+        raise ReloadError(f"standby status: HTTP {r.status_code}: {r.text[:200]}")
+    try:
+        state = r.json() if r.ok else None
+    except ValueError:
+        state = None
+    if not isinstance(state, dict):
+        return {"state": "unavailable", "error": f"HTTP {r.status_code}: {r.text[:200]}"}
+    return state
+
+
+def swap_model(base, path, version, headers, ready_timeout=300.0, session=None):
+    """Preload → wait ready → flip → release. Returns timings; raises ReloadError on failure."""
+    s = session or requests.Session()
+    t0 = time.perf_counter()
+    r = s.post(f"{base}/admin/models/preload", json={"path": path, "version": version},
+               headers=headers, timeout=10)
+    if r.status_code == 404:
+        raise StandbyUnsupported("server has no standby-slot API")
+    r.raise_for_status()
+
+    delay, deadline = 0.1, time.monotonic() + ready_timeout
+    while True:
+        state = standby_state(s, base, headers)
+        if state.get("state") == "ready" and state.get("version") == version:
+            break
+        if state.get("state") == "failed":
+            raise ReloadError(f"standby load failed: {state.get('error')}")
+        if time.monotonic() > deadline:
+            detail = f"; {state['error']}" if state.get("error") else ""
+            raise ReloadError(f"standby not ready after {ready_timeout:g}s (state={state.get('state')}{detail})")
+        time.sleep(delay)
+        delay = min(delay * 2, 2.0)
+    t_ready = time.perf_counter()
+
+    r = s.post(f"{base}/admin/models/activate", json={"version": version}, headers=headers, timeout=10)
+    r.raise_for_status()
+    t_flip = time.perf_counter()
+    previous = r.json().get("previous")
+    try:
+        s.post(f"{base}/admin/models/release", headers=headers, timeout=10).raise_for_status()
+    except requests.RequestException as e:
+        print(f"⚠️  Swapped, but releasing the previous model failed (it stays loaded): {e}")
+    return {"previous": previous,
+            "preload_sec": round(t_ready - t0, 3), "flip_sec": round(t_flip - t_ready, 4)}
+
+
 def main():
     cfg = get_env_config()
     url = os.getenv("RELOAD_URL") or "http://localhost:8080/admin/reload"
     token = os.getenv("RELOAD_TOKEN")
     headers = {"Authorization": f"Bearer {token}"} if token else {}
-    r = requests.post(url, headers=headers, timeout=10)
-    r.raise_for_status()
+    mode = os.getenv("RELOAD_MODE", "swap").lower()
+
+    if mode == "swap":
+        link = Path(cfg.get("model_current_symlink", "artifacts/current_model.pkl"))
+        try:
+            target = link.resolve(strict=True)
+        except FileNotFoundError:
+            print("❌ Current model symlink missing or dangling:", link)
+            sys.exit(2)
+        base = url.rsplit("/admin/", 1)[0]
+        try:
+            t = swap_model(base, str(target), target.name, headers,
+                           ready_timeout=float(os.getenv("RELOAD_READY_TIMEOUT", "300")))
+            print(f"✅ Swapped to {target.name} (was {t['previous']}); "
+                  f"preload {t['preload_sec']}s, flip {t['flip_sec'] * 1000:.1f} ms")
+            return
+        except StandbyUnsupported:
+            print("ℹ️  Server has no standby-slot API; falling back to legacy reload.")
+        except (ReloadError, requests.RequestException) as e:
+            print(f"❌ Model swap failed, still serving the previous model: {e}")
+            sys.exit(1)
+
+    r = legacy_reload(url, headers)
     print("✅ Reload triggered:", r.status_code)
 if __name__ == "__main__":
-    main()
+    with span("hot_reload"):
+        main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Shared timing/resource spans for every pipeline script.
+
+    from instrument import span
+
+    if __name__ == "__main__":
+        with span("disk_check"):
+            main()
+
+Each span appends one JSON line to TRACE_FILE (default logs/trace.jsonl):
+    name, run_id, pid, id, parent, start (epoch s), wall_s, cpu_s, peak_rss_mb,
+    io_read_bytes, io_write_bytes, net_sent_bytes, net_recv_bytes, status, attrs
+status is "ok", "error:<Exception>" or "exit:<code>" (SystemExit is recorded
+and re-raised). Spans nest within a thread; `thread=True` measures CPU of the
+current thread only and leaves out process-wide IO/network counters (for
+spans that run concurrently in one process, like prechecks gates).
+
+IO bytes are the process's storage reads/writes (psutil io_counters, so
+page-cache hits are not counted); network bytes are host-wide interface
+counters over the span, which is only meaningful for spans that own the
+network at the time. Fields that can't be measured on a platform are null.
+
+run_id comes from TRACE_RUN_ID, else GITHUB_RUN_ID-GITHUB_RUN_ATTEMPT, else a
+fresh id, and is exported so child processes share it. TRACE=0 disables
+tracing. A process's root span exports its id as TRACE_PARENT, so spans
+of child processes (maintenance steps) nest under it. Lines are written with a single O_APPEND write, so concurrent
+processes can share the file. See trace_summary.py for reports.
+
+Once the file reaches TRACE_MAX_MB (default 50; 0 = never) it is rotated to
+<file>.1 (older ones shift to .2 ... up to TRACE_KEEP, default 3) under a
+lock, so only one writer rotates; trace_files() lists them oldest first.
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+DEFAULT_TRACE_FILE = "logs/trace.jsonl"
+DEFAULT_MAX_MB = 50
+DEFAULT_KEEP = 3
+
+_current: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("span", default=None)
+_proc = None
+
+
+def enabled() -> bool:
+    return os.getenv("TRACE", "1") != "0"
+
+
+def trace_path() -> Path:
+    return Path(os.getenv("TRACE_FILE", DEFAULT_TRACE_FILE))
+
+
+def trace_files(path: Optional[Path] = None) -> List[Path]:
+    """The trace file and its rotated predecessors that exist, oldest first."""
+    path = path or trace_path()
+    keep = int(os.getenv("TRACE_KEEP", DEFAULT_KEEP))
+    rotated = [Path(f"{path}.{i}") for i in range(keep, 0, -1)]
+    return [p for p in rotated + [path] if p.exists()]
+
+
+def run_id() -> str:
+    rid = os.getenv("TRACE_RUN_ID")
+    if not rid:
+        gh = os.getenv("GITHUB_RUN_ID")
+        rid = f"{gh}-{os.getenv('GITHUB_RUN_ATTEMPT', '1')}" if gh else os.urandom(6).hex()
+        os.environ["TRACE_RUN_ID"] = rid
+    return rid
+
+
+def _process():
+    global _proc
+    if _proc is None:
+        try:
+            import psutil
+            _proc = psutil.Process()
+        except Exception:
+            _proc = False
+    return _proc
+
+
+def _counters() -> Dict[str, Optional[int]]:
+    out: Dict[str, Optional[int]] = {"io_read": None, "io_write": None, "net_sent": None, "net_recv": None}
+    proc = _process()
+    if not proc:
+        return out
+    try:
+        io = proc.io_counters()
+        out["io_read"], out["io_write"] = io.read_bytes, io.write_bytes
+    except Exception:
+        pass
+    try:
+        import psutil
+        net = psutil.net_io_counters()
+        out["net_sent"], out["net_recv"] = net.bytes_sent, net.bytes_recv
+    except Exception:
+        pass
+    return out
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _delta(after: Optional[int], before: Optional[int]) -> Optional[int]:
+    return after - before if after is not None and before is not None else None
+
+
+def _rotate(path: Path, fd: int, limit: int) -> int:
+    """Rotate `path` if it is still the full file `fd` has open; returns an fd for the current file."""
+    lock = os.open(f"{path}.lock", os.O_WRONLY | os.O_CREAT, 0o644)
+    try:
+        try:
+            import fcntl
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        except ImportError:
+            pass
+        st = os.fstat(fd)
+        try:
+            cur = os.stat(path)
+        except FileNotFoundError:
+            cur = None
+        # Another writer may have rotated while we waited for the lock
+        if cur is not None and (cur.st_dev, cur.st_ino) == (st.st_dev, st.st_ino) and cur.st_size >= limit:
+            keep = int(os.getenv("TRACE_KEEP", DEFAULT_KEEP))
+            for i in range(keep - 1, 0, -1):
+                if os.path.exists(f"{path}.{i}"):
+                    os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+            if keep > 0:
+                os.replace(path, f"{path}.1")
+            else:
+                os.unlink(path)
+    finally:
+        os.close(lock)
+    os.close(fd)
+    return os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+
+def emit(record: Dict[str, Any]) -> None:
+    """Append one record to the trace file; tracing never breaks the pipeline."""
+    try:
+        path = trace_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        line = (json.dumps(record, default=str) + "\n").encode("utf-8")
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            limit = int(float(os.getenv("TRACE_MAX_MB", DEFAULT_MAX_MB)) * 2**20)
+            if limit and os.fstat(fd).st_size >= limit:
+                fd = _rotate(path, fd, limit)
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+@contextmanager
+def span(name: str, thread: bool = False, **attrs: Any) -> Iterator[Dict[str, Any]]:
+    """Measure the enclosed block; yields the attrs dict so callers can add to it."""
+    if not enabled():
+        yield attrs
+        return
+    rid = run_id()  # resolved up front so subprocesses started inside inherit it
+    span_id = os.urandom(8).hex()
+    token = _current.set(span_id)
+    parent = token.old_value if token.old_value not in (None, contextvars.Token.MISSING) else None
+    inherited = os.environ.get("TRACE_PARENT")
+    if parent is None:
+        # Root span in this process: nest under the span that launched us, and
+        # let our own subprocesses nest under this one
+        parent = inherited
+        if not thread:
+            os.environ["TRACE_PARENT"] = span_id
+    cpu_clock = time.thread_time if thread else time.process_time
+    before = {} if thread else _counters()
+    start, wall0, cpu0 = time.time(), time.perf_counter(), cpu_clock()
+    status = "ok"
+    try:
+        yield attrs
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        status = "ok" if code == 0 else f"exit:{code}"
+        raise
+    except BaseException as e:
+        status = f"error:{type(e).__name__}"
+        raise
+    finally:
+        _current.reset(token)
+        if parent == inherited and not thread:
+            if inherited is None:
+                os.environ.pop("TRACE_PARENT", None)
+            else:
+                os.environ["TRACE_PARENT"] = inherited
+        record = {
+            "name": name, "run_id": rid, "pid": os.getpid(),
+            "thread": threading.current_thread().name if thread else None,
+            "id": span_id, "parent": parent, "start": round(start, 6),
+            "wall_s": round(time.perf_counter() - wall0, 6),
+            "cpu_s": round(cpu_clock() - cpu0, 6),
+            "peak_rss_mb": _peak_rss_mb(),
+            "status": status, "attrs": attrs,
+        }
+        if not thread:
+            after = _counters()
+            record.update({
+                "io_read_bytes": _delta(after["io_read"], before["io_read"]),
+                "io_write_bytes": _delta(after["io_write"], before["io_write"]),
+                "net_sent_bytes": _delta(after["net_sent"], before["net_sent"]),
+                "net_recv_bytes": _delta(after["net_recv"], before["net_recv"]),
+            })
+        emit(record)
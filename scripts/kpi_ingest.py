@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Incremental KPI ingestion: request/metrics logs → hourly rollups → report chart.
+
+Logs matching `kpi_log_glob` (JSONL/NDJSON or CSV, optionally .gz) are read
+in chunks of `kpi_chunk_rows` rows with only the needed columns, and each
+chunk is reduced with vectorized pandas group-bys into hourly rows:
+    source, hour, requests, errors, latency_ms_sum, latency_ms_max
+(errors = status >= 500). Rollups are stored in Parquet under `kpi_cache_dir`
+(default reports/.cache/kpi) together with a state file recording how far
+each source file has been read, so later runs only read new files and the
+newly appended tail of growing ones. A file that shrank or was replaced is
+re-read from the start and its old rows are dropped first.
+
+Column names are configurable: kpi_timestamp_field (ts), kpi_status_field
+(status), kpi_latency_field (latency_ms). Numeric timestamps are epoch seconds.
+
+    python scripts/kpi_ingest.py      # ingest and print the daily KPIs
+"""
+
+import io
+import os
+import gzip
+import glob
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from read_config import get_env_config
+from instrument import span
+
+DEFAULT_CACHE_DIR = "reports/.cache/kpi"
+DEFAULT_CHUNK_ROWS = 500_000
+ROLLUP_COLUMNS = ["source", "hour", "requests", "errors", "latency_ms_sum", "latency_ms_max"]
+
+
+class _Window(io.RawIOBase):
+    """Read-only view of bytes [start, end) of a file, so pandas never sees a half-written line."""
+
+    def __init__(self, path: str, start: int, end: int):
+        self._f = open(path, "rb")
+        self._f.seek(start)
+        self._left = end - start
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        n = min(len(b), self._left)
+        if n <= 0:
+            return 0
+        data = self._f.read(n)
+        b[:len(data)] = data
+        self._left -= len(data)
+        return len(data)
+
+    def close(self) -> None:
+        self._f.close()
+        super().close()
+
+
+def _complete_end(path: str, size: int) -> int:
+    """Offset just past the last newline at or before size."""
+    with open(path, "rb") as f:
+        pos = size
+        while pos > 0:
+            step = min(65536, pos)
+            f.seek(pos - step)
+            block = f.read(step)
+            i = block.rfind(b"\n")
+            if i >= 0:
+                return pos - step + i + 1
+            pos -= step
+    return 0
+
+
+def _fields(cfg: Dict[str, Any]) -> Dict[str, str]:
+    return {
+        "ts": cfg.get("kpi_timestamp_field", "ts"),
+        "status": cfg.get("kpi_status_field", "status"),
+        "latency": cfg.get("kpi_latency_field", "latency_ms"),
+    }
+
+
+def _reader(path: str, start: int, end: int, header: Optional[List[str]], fields, chunk_rows: int):
+    import pandas as pd
+
+    is_csv = ".csv" in Path(path).suffixes
+    if path.endswith(".gz"):
+        # Compressed segments are treated as immutable and read whole
+        stream = gzip.open(path, "rb")
+    else:
+        stream = io.BufferedReader(_Window(path, start, end))
+    if is_csv:
+        wanted = [fields["ts"], fields["status"], fields["latency"]]
+        kwargs = {"usecols": lambda c: c in wanted, "chunksize": chunk_rows}
+        if header is not None:
+            kwargs.update(header=None, names=header)
+        return pd.read_csv(stream, **kwargs)
+    return pd.read_json(stream, lines=True, chunksize=chunk_rows)
+
+
+def _rollup_chunk(df, source: str, fields):
+    import pandas as pd
+
+    ts = df[fields["ts"]]
+    if pd.api.types.is_numeric_dtype(ts):
+        ts = pd.to_datetime(ts, unit="s", utc=True, errors="coerce")
+    else:
+        ts = pd.to_datetime(ts, utc=True, errors="coerce", format="mixed")
+    status = pd.to_numeric(df[fields["status"]], errors="coerce") if fields["status"] in df else None
+    latency = pd.to_numeric(df[fields["latency"]], errors="coerce") if fields["latency"] in df else None
+    frame = pd.DataFrame({
+        "hour": ts.dt.floor("h"),
+        "errors": (status >= 500).astype("int64") if status is not None else 0,
+        "latency": latency if latency is not None else float("nan"),
+    }).dropna(subset=["hour"])
+    g = frame.groupby("hour")
+    out = pd.DataFrame({
+        "requests": g.size(),
+        "errors": g["errors"].sum(),
+        "latency_ms_sum": g["latency"].sum(),
+        "latency_ms_max": g["latency"].max(),
+    }).reset_index()
+    out.insert(0, "source", source)
+    return out
+
+
+def _combine(frames):
+    import pandas as pd
+
+    if not frames:
+        return pd.DataFrame(columns=ROLLUP_COLUMNS)
+    df = pd.concat(frames, ignore_index=True)
+    return (df.groupby(["source", "hour"], as_index=False)
+              .agg(requests=("requests", "sum"), errors=("errors", "sum"),
+                   latency_ms_sum=("latency_ms_sum", "sum"), latency_ms_max=("latency_ms_max", "max")))
+
+
+def ingest(cfg: Dict[str, Any]):
+    """Bring the hourly rollups up to date and return them as a DataFrame."""
+    import pandas as pd
+
+    cache_dir = Path(cfg.get("kpi_cache_dir", DEFAULT_CACHE_DIR))
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    rollup_path = cache_dir / "hourly.parquet"
+    state_path = cache_dir / "state.json"
+    fields = _fields(cfg)
+    chunk_rows = int(cfg.get("kpi_chunk_rows", DEFAULT_CHUNK_ROWS))
+
+    try:
+        state = json.loads(state_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        state = {}
+    rollups = pd.read_parquet(rollup_path) if rollup_path.exists() and state else pd.DataFrame(columns=ROLLUP_COLUMNS)
+
+    new_frames, reset_sources = [], set()
+    for path in sorted(glob.glob(cfg.get("kpi_log_glob") or "", recursive=True)):
+        st = os.stat(path)
+        seen = state.get(path)
+        if seen and st.st_ino == seen["inode"] and st.st_size == seen["size"] and st.st_mtime_ns == seen["mtime_ns"]:
+            continue
+        compressed = path.endswith(".gz")
+        resume = (seen and not compressed and st.st_ino == seen["inode"] and st.st_size >= seen["offset"])
+        start = seen["offset"] if resume else 0
+        if not resume:
+            reset_sources.add(path)
+        end = st.st_size if compressed else _complete_end(path, st.st_size)
+        if end <= start and not compressed:
+            continue
+
+        header = seen.get("header") if resume else None
+        if ".csv" in Path(path).suffixes and start == 0 and not compressed:
+            with open(path, "r", encoding="utf-8") as f:
+                header = [h.strip() for h in f.readline().split(",")]
+        chunks = 0
+        for chunk in _reader(path, start, end, header if start else None, fields, chunk_rows):
+            new_frames.append(_rollup_chunk(chunk, path, fields))
+            chunks += 1
+        state[path] = {"inode": st.st_ino, "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                       "offset": end, "header": header}
+        print(f"📥 {path}: read bytes {start}-{end} in {chunks} chunk(s)")
+
+    if new_frames or reset_sources:
+        if reset_sources and len(rollups):
+            rollups = rollups[~rollups["source"].isin(reset_sources)]
+        rollups = _combine([rollups] + new_frames if len(rollups) else new_frames)
+        tmp = rollup_path.with_name(f"{rollup_path.name}.{os.getpid()}.tmp")
+        rollups.to_parquet(tmp, index=False)
+        os.replace(tmp, rollup_path)
+        state_tmp = state_path.with_name(f"{state_path.name}.{os.getpid()}.tmp")
+        state_tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+        os.replace(state_tmp, state_path)
+    return rollups
+
+
+def daily_kpis(rollups, days: int):
+    """Per-day requests, error rate and mean latency for the last `days` days with data."""
+    import pandas as pd
+
+    if rollups is None or not len(rollups):
+        return pd.DataFrame(columns=["day", "requests", "errors", "error_rate", "latency_ms_avg", "latency_ms_max"])
+    df = rollups.assign(day=pd.to_datetime(rollups["hour"], utc=True).dt.floor("D"))
+    d = (df.groupby("day", as_index=False)
+           .agg(requests=("requests", "sum"), errors=("errors", "sum"),
+                latency_ms_sum=("latency_ms_sum", "sum"), latency_ms_max=("latency_ms_max", "max")))
+    d["error_rate"] = d["errors"] / d["requests"].where(d["requests"] > 0)
+    d["latency_ms_avg"] = d["latency_ms_sum"] / d["requests"].where(d["requests"] > 0)
+    return d.drop(columns="latency_ms_sum").sort_values("day").tail(days).reset_index(drop=True)
+
+
+def main() -> None:
+    cfg = get_env_config()
+    if not cfg.get("kpi_log_glob"):
+        print("ℹ️  kpi_log_glob not configured; nothing to ingest.")
+        return
+    rollups = ingest(cfg)
+    print(daily_kpis(rollups, int(cfg.get("kpi_chart_days", 14))).to_string(index=False))
+
+
+if __name__ == "__main__":
+    with span("kpi_ingest"):
+        main()
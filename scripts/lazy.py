@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lazy module imports for fast script startup.
+
+    from lazy import lazy_import
+    requests = lazy_import("requests")   # nothing imported yet
+    ...
+    requests.post(...)                   # module body runs here, once
+
+Heavy third-party modules (requests, yaml, smtplib, ...) only cost their
+import time on the code paths that actually use them, so cheap exits such as
+"already up-to-date" or "not configured, skipping" stay fast. Touching any
+attribute loads the module, including in annotations evaluated at definition
+time, so annotate with strings ("requests.Session") in modules that use this.
+
+Before Python 3.12 the first attribute access of a lazy module is not
+thread-safe: two threads touching it at once can see it half-executed. So
+lazy_import() imports eagerly once other threads are running, and code that
+is about to start worker threads calls load_pending() first, on its own
+thread, to finish every import still deferred.
+
+LAZY_IMPORTS=0 imports eagerly (handy when profiling where time goes).
+"""
+
+import os
+import sys
+import importlib
+import importlib.util
+import threading
+from types import ModuleType
+from typing import Dict
+
+_lock = threading.Lock()
+_pending: Dict[str, ModuleType] = {}  # created lazily, maybe not executed yet
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Module `name`, executed on first attribute access; already-imported modules are returned as is."""
+    if os.getenv("LAZY_IMPORTS", "1") == "0" or threading.active_count() > 1:
+        return importlib.import_module(name)
+    with _lock:
+        if name in sys.modules:
+            return sys.modules[name]
+        spec = importlib.util.find_spec(name)
+        if spec is None or spec.loader is None:
+            raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+        loader = importlib.util.LazyLoader(spec.loader)
+        spec.loader = loader
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        loader.exec_module(module)
+        _pending[name] = module
+        return module
+
+
+def load_pending() -> None:
+    """Execute every lazily imported module not used yet; call before starting threads that may use them."""
+    with _lock:
+        modules = list(_pending.values())
+        _pending.clear()
+    for module in modules:
+        getattr(module, "__name__")  # any attribute access runs the module body
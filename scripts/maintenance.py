@@ -1,23 +1,194 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+"""
+Nightly maintenance as a small DAG: refresh → smoke test → report → email,
+with KPI ingestion alongside refresh/smoke test.
 
-import subprocess
+Each step declares the steps it needs and the files it reads (inputs) and
+writes (outputs). Steps whose needs are done run in parallel, up to
+MAINTENANCE_WORKERS (default: all ready steps). Before a step runs, its
+inputs, its script and the env config are fingerprinted; if the fingerprint
+equals the one recorded after the step's last successful run and its outputs
+still exist, the step is skipped. So a night without a new model skips the
+smoke test, and without new KPIs the report and email too. Refresh has no
+file inputs (it asks S3 / the model dir) and always runs.
+
+State lives in logs/maintenance_state.json. MAINTENANCE_FORCE=1 runs every
+step regardless. A failed step stops only the steps that depend on it.
+
+Exit codes:
+  0 → every step succeeded or was skipped
+  1 → at least one step failed (or was blocked by a failure)
+"""
+
+import os
 import sys
+import glob
+import json
+import time
+import hashlib
+from pathlib import Path
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
 
-def run(step, cmd):
-    print(f"\n=== {step} ===")
-    subprocess.run(cmd, shell=True, check=True)
+from read_config import get_env_config
+from instrument import span
+from lazy import lazy_import, load_pending
 
-def main():
+# Loaded on first use, when the DAG runs, not at import
+subprocess = lazy_import("subprocess")
+futures = lazy_import("concurrent.futures")
+
+STATE_PATH = Path("logs/maintenance_state.json")
+CONFIG_PATH = "configs/env.yaml"
+HASH_LIMIT = 16 * 1024 * 1024  # bigger files (models) are fingerprinted by stat instead
+
+
+def build_steps(cfg: Dict[str, Any], env: str = "dev") -> List[Dict[str, Any]]:
+    report_dir = cfg.get("report_dir", "reports")
+    version_file = cfg.get("model_version_file", "artifacts/.model_version")
+    summary = f"{report_dir}/smoketest_summary.{env}.json"  # see model_smoketest.summary_path
+    dashboard = f"{report_dir}/index.html"  # rewritten whenever a report is added
+    kpi_rollups = f"{cfg.get('kpi_cache_dir', 'reports/.cache/kpi')}/hourly.parquet"
+    return [
+        {"name": "refresh", "script": "scripts/model_refresh.py", "needs": [],
+         "inputs": None, "outputs": [version_file]},
+        {"name": "kpi", "script": "scripts/kpi_ingest.py", "needs": [],
+         "inputs": [cfg.get("kpi_log_glob") or None], "outputs": [kpi_rollups] if cfg.get("kpi_log_glob") else []},
+        {"name": "smoketest", "script": "scripts/model_smoketest.py", "needs": ["refresh"],
+         "inputs": [version_file, cfg.get("model_current_symlink", "artifacts/current_model.pkl")],
+         "outputs": [summary]},
+        {"name": "report", "script": "scripts/generate_report.py", "needs": ["smoketest", "kpi"],
+         "inputs": [summary, kpi_rollups], "outputs": [dashboard]},
+        {"name": "email", "script": "scripts/email_report.py", "needs": ["report"],
+         "inputs": [dashboard], "outputs": []},
+    ]
+
+
+def _file_fingerprint(path: str) -> str:
+    try:
+        st = os.stat(path)  # follows symlinks: the current model's target counts
+    except OSError:
+        return "missing"
+    real = os.path.realpath(path)
+    if st.st_size > HASH_LIMIT:
+        return f"{real}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}"
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return f"{real}:{h.hexdigest()}"
+
+
+def fingerprint(step: Dict[str, Any], env: str) -> Optional[str]:
+    """Hash of everything the step reads; None if the step must always run."""
+    if step["inputs"] is None:
+        return None
+    h = hashlib.sha256(f"{env}\0{step['script']}".encode())
+    for pattern in [step["script"], CONFIG_PATH] + [p for p in step["inputs"] if p]:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            h.update(f"\0{path}\0{_file_fingerprint(path)}".encode())
+    return h.hexdigest()
+
+
+def outputs_present(step: Dict[str, Any]) -> bool:
+    return all(glob.glob(p) for p in step["outputs"])
+
+
+def load_state() -> Dict[str, Any]:
     try:
-        run("Refresh model", "python scripts/model_refresh.py")
-        run("Smoke test",    "python scripts/model_smoketest.py")
-        run("Generate report","python scripts/generate_report.py")
-        run("Email report",  "python scripts/email_report.py")
-        print("\n✅ Maintenance completed")
-    except subprocess.CalledProcessError as e:
-        print(f"\n❌ Maintenance failed at: {e}")
+        return json.loads(STATE_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state: Dict[str, Any]) -> None:
+    STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp = STATE_PATH.with_name(f"{STATE_PATH.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    os.replace(tmp, STATE_PATH)
+
+
+def run_step(step: Dict[str, Any]) -> Dict[str, Any]:
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, step["script"]], capture_output=True, text=True)
+    return {"rc": proc.returncode, "output": proc.stdout + proc.stderr,
+            "seconds": round(time.perf_counter() - start, 2)}
+
+
+def run_dag(steps: List[Dict[str, Any]], env: str, force: bool = False,
+            workers: int = 0) -> Dict[str, str]:
+    """Run the DAG; returns step → ok|skipped|failed|blocked."""
+    state = load_state()
+    env_state = state.setdefault(env, {})
+    by_name = {s["name"]: s for s in steps}
+    status: Dict[str, str] = {}
+    running: Dict[Any, Any] = {}
+
+    def ready():
+        for s in steps:
+            if s["name"] in status or any(r is s for r, _ in running.values()):
+                continue
+            if any(status.get(n) in ("failed", "blocked") for n in s["needs"]):
+                status[s["name"]] = "blocked"
+                print(f"\n=== {s['name']} ===\n⏭️  blocked by failed dependency")
+                continue
+            if all(status.get(n) in ("ok", "skipped") for n in s["needs"]):
+                yield s
+
+    load_pending()  # run_step uses subprocess from the worker threads
+    with futures.ThreadPoolExecutor(max_workers=workers or len(steps)) as pool:
+        while True:
+            progressed = False
+            for s in list(ready()):
+                progressed = True
+                fp = fingerprint(s, env)
+                last = env_state.get(s["name"], {})
+                if not force and fp is not None and last.get("fingerprint") == fp and outputs_present(s):
+                    status[s["name"]] = "skipped"
+                    print(f"\n=== {s['name']} ===\n⏭️  inputs unchanged since {last.get('finished_at')}; skipped")
+                    continue
+                running[pool.submit(run_step, s)] = (s, fp)
+            if not running:
+                if progressed and len(status) < len(steps):
+                    continue  # skips above may have unblocked more steps
+                break
+            done, _ = futures.wait(running, return_when=futures.FIRST_COMPLETED)
+            for fut in done:
+                s, fp = running.pop(fut)
+                res = fut.result()
+                print(f"\n=== {s['name']} ({res['seconds']}s) ===")
+                print(res["output"].rstrip())
+                if res["rc"] == 0:
+                    status[s["name"]] = "ok"
+                    if fp is not None:
+                        env_state[s["name"]] = {
+                            "fingerprint": fp,
+                            "finished_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                        }
+                        save_state(state)
+                else:
+                    status[s["name"]] = "failed"
+                    env_state.pop(s["name"], None)
+                    save_state(state)
+                    print(f"❌ {s['name']} exited with {res['rc']}")
+    # Anything left waits on a step that never became ready (unknown need)
+    return {name: status.get(name, "blocked") for name in by_name}
+
+
+def main():
+    env = os.getenv("APP_ENV", "dev")
+    cfg = get_env_config(env)
+    force = os.getenv("MAINTENANCE_FORCE", "0") == "1"
+    workers = int(os.getenv("MAINTENANCE_WORKERS", "0"))
+
+    status = run_dag(build_steps(cfg, env), env, force, workers)
+    print("\n" + "  ".join(f"{name}: {st}" for name, st in status.items()))
+    if any(st in ("failed", "blocked") for st in status.values()):
+        print("\n❌ Maintenance failed")
         sys.exit(1)
+    print("\n✅ Maintenance completed")
 
 if __name__ == "__main__":
-    main()
+    with span("maintenance"):
+        main()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Binary deltas between consecutive model versions (rsync-style).
+
+Publisher side:
+    python scripts/model_delta.py make <old.pkl> <new.pkl> <new.pkl.delta>
+    # upload next to the new artifact, e.g. models/project-x/model_v8.pkl.delta
+
+The old file is cut into fixed-size blocks indexed by a weak rolling checksum
+(rsync's Adler-style a/b sums) and a strong hash. The new file is scanned with
+the rolling checksum; every block found in the old file becomes a COPY op and
+everything else a DATA op, so the delta is roughly the size of what changed.
+The checksums for every offset are computed with numpy over windows of the
+new file (prefix sums, wrapping uint32 arithmetic reduced mod 2**16), so
+Python only visits offsets whose weak checksum hits the table.
+
+The delta object must NOT carry the usual x-amz-meta-sha256 of its own: that
+key belongs to the target artifact. Integrity of the download comes from the
+delta's ETag/ChecksumSHA256, the base/target hashes in its header and the
+final check of the rebuilt file.
+
+Refresh side (model_refresh.py, when `model_delta: true`): if the newest
+object has a '<key>.delta' sibling whose base is the artifact we already
+have, download the delta, rebuild the new artifact locally and verify its
+SHA-256; any mismatch or error falls back to the full download.
+
+    python scripts/model_delta.py apply <old.pkl> <new.pkl.delta> <new.pkl>
+
+Delta format (big-endian):
+  header  MAGIC, block_size u32, base_size u64, target_size u64,
+          base_sha256 32B, target_sha256 32B
+  ops     b"C" first_block u64, count u32   copy blocks from base
+          b"D" length u32, bytes            literal data
+          b"E"                              end
+"""
+
+import os
+import sys
+import mmap
+import struct
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from instrument import span
+
+MAGIC = b"PFDDELTA1\n"
+HEADER = struct.Struct(">IQQ32s32s")
+COPY = struct.Struct(">QI")
+DATA = struct.Struct(">I")
+DEFAULT_BLOCK_SIZE = 16 * 1024
+MAX_LITERAL = 4 * 1024 * 1024
+WINDOW = 4 * 1024 * 1024  # new-file offsets checksummed per numpy pass
+DELTA_SUFFIX = ".delta"
+_MOD = 1 << 16
+_FILTER = (1 << 24) - 1
+
+
+class DeltaError(Exception):
+    """Raised when a delta is malformed or does not match its base/target."""
+
+
+def _weak_keys(np, data, block_size: int):
+    """
+    Weak checksum key (b << 16 | a) of every block_size window of data.
+    a = sum(x_m), b = sum((i + bs - m) * x_m) over the window at i; both come
+    from prefix sums, and uint32 wraparound is harmless because 2**16
+    divides 2**32.
+    """
+    x = np.frombuffer(data, dtype=np.uint8).astype(np.uint32)
+    s = np.zeros(len(x) + 1, dtype=np.uint32)
+    t = np.zeros(len(x) + 1, dtype=np.uint32)
+    np.cumsum(x, out=s[1:])
+    np.cumsum(x * np.arange(len(x), dtype=np.uint32), out=t[1:])
+    i = np.arange(len(x) - block_size + 1, dtype=np.uint32)
+    a = s[block_size:] - s[:-block_size]
+    b = (i + np.uint32(block_size)) * a - (t[block_size:] - t[:-block_size])
+    mask = np.uint32(_MOD - 1)
+    return ((b & mask) << np.uint32(16)) | (a & mask)
+
+
+def _strong(block) -> bytes:
+    return hashlib.blake2b(block, digest_size=16).digest()
+
+
+def _map(f):
+    size = os.fstat(f.fileno()).st_size
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+
+def make_delta(old_path: Path, new_path: Path, out_path: Path,
+               block_size: int = DEFAULT_BLOCK_SIZE) -> Dict[str, int]:
+    """Write a delta turning old_path into new_path; returns copy/literal byte counts."""
+    import numpy as np
+    with open(old_path, "rb") as fo, open(new_path, "rb") as fn, open(out_path, "wb") as out:
+        old, new = _map(fo), _map(fn)
+        n = len(new)
+
+        table: Dict[int, Dict[bytes, int]] = {}
+        nblocks = len(old) // block_size
+        weights = np.arange(block_size, 0, -1, dtype=np.uint32)
+        per_pass = max(1, WINDOW // block_size)
+        for first in range(0, nblocks, per_pass):
+            count = min(per_pass, nblocks - first)
+            blocks = np.frombuffer(old, dtype=np.uint8, count=count * block_size,
+                                   offset=first * block_size).reshape(count, block_size)
+            a = blocks.sum(axis=1, dtype=np.uint32) % _MOD
+            b = (blocks * weights).sum(axis=1, dtype=np.uint32) % _MOD
+            for idx, key in enumerate(((b << np.uint32(16)) | a).tolist(), first):
+                block = old[idx * block_size:(idx + 1) * block_size]
+                table.setdefault(key, {}).setdefault(_strong(block), idx)
+        # Cheap prefilter on the low 24 bits; the dict lookup settles the rest
+        hit = np.zeros(_FILTER + 1, dtype=bool)
+        hit[np.fromiter(table, dtype=np.uint32, count=len(table)) & np.uint32(_FILTER)] = True
+
+        out.write(MAGIC)
+        out.write(HEADER.pack(block_size, len(old), n,
+                              hashlib.sha256(old).digest(), hashlib.sha256(new).digest()))
+        stats = {"copied": 0, "literal": 0}
+        run = None  # pending [first_block, count]
+
+        def flush_run():
+            nonlocal run
+            if run:
+                out.write(b"C" + COPY.pack(*run))
+                run = None
+
+        def literal(start, end):
+            if end <= start:
+                return
+            flush_run()
+            for s in range(start, end, MAX_LITERAL):
+                chunk = new[s:min(end, s + MAX_LITERAL)]
+                out.write(b"D" + DATA.pack(len(chunk)) + chunk)
+            stats["literal"] += end - start
+
+        i, lit_start = 0, 0
+        last = n - block_size  # final offset a block can start at
+        for w in range(0, last + 1, WINDOW):
+            end = min(w + WINDOW, last + 1)  # offsets [w, end) in this pass
+            if i >= end:
+                continue  # a copied block already covers this window
+            keys = _weak_keys(np, new[w:end + block_size - 1], block_size)
+            for off in np.flatnonzero(hit[keys & np.uint32(_FILTER)]).tolist():
+                pos = w + off
+                if pos < i:
+                    continue
+                cands = table.get(int(keys[off]))
+                idx = cands.get(_strong(new[pos:pos + block_size])) if cands else None
+                if idx is None:
+                    continue
+                literal(lit_start, pos)
+                if run and run[0] + run[1] == idx:
+                    run[1] += 1
+                else:
+                    flush_run()
+                    run = [idx, 1]
+                stats["copied"] += block_size
+                i = lit_start = pos + block_size
+        literal(lit_start, n)
+        flush_run()
+        out.write(b"E")
+        return stats
+
+
+def read_header(f) -> Dict[str, Any]:
+    if f.read(len(MAGIC)) != MAGIC:
+        raise DeltaError("not a model delta (bad magic)")
+    block_size, base_size, target_size, base_sha, target_sha = HEADER.unpack(f.read(HEADER.size))
+    return {"block_size": block_size, "base_size": base_size, "target_size": target_size,
+            "base_sha256": base_sha.hex(), "target_sha256": target_sha.hex()}
+
+
+def apply_delta(base_path: Path, delta_path: Path, out_path: Path,
+                base_sha256: Optional[str] = None) -> str:
+    """
+    Rebuild the target from base + delta into out_path and return its SHA-256.
+    Raises DeltaError (and removes out_path) if anything doesn't match.
+    """
+    h = hashlib.sha256()
+    try:
+        with open(delta_path, "rb") as d, open(base_path, "rb") as base, open(out_path, "wb") as out:
+            hdr = read_header(d)
+            if base_sha256 and hdr["base_sha256"] != base_sha256:
+                raise DeltaError(f"delta base {hdr['base_sha256'][:12]} != local {base_sha256[:12]}")
+            if os.fstat(base.fileno()).st_size != hdr["base_size"]:
+                raise DeltaError("base size does not match delta header")
+            bs = hdr["block_size"]
+            while True:
+                op = d.read(1)
+                if op == b"C":
+                    first, count = COPY.unpack(d.read(COPY.size))
+                    base.seek(first * bs)
+                    remaining = count * bs
+                    while remaining:
+                        chunk = base.read(min(remaining, MAX_LITERAL))
+                        if not chunk:
+                            raise DeltaError("copy op past end of base")
+                        out.write(chunk)
+                        h.update(chunk)
+                        remaining -= len(chunk)
+                elif op == b"D":
+                    (length,) = DATA.unpack(d.read(DATA.size))
+                    chunk = d.read(length)
+                    if len(chunk) != length:
+                        raise DeltaError("truncated data op")
+                    out.write(chunk)
+                    h.update(chunk)
+                elif op == b"E":
+                    break
+                else:
+                    raise DeltaError(f"bad op {op!r}")
+            out.flush()
+            os.fsync(out.fileno())
+            if out.tell() != hdr["target_size"]:
+                raise DeltaError("rebuilt size does not match delta header")
+        digest = h.hexdigest()
+        if digest != hdr["target_sha256"]:
+            raise DeltaError("rebuilt artifact failed SHA-256 check")
+        return digest
+    except (DeltaError, OSError, struct.error):
+        out_path.unlink(missing_ok=True)
+        raise
+
+
+def fetch_via_delta(s3, bucket: str, key: str, base_path: Path, base_sha256: str,
+                    out_path: Path, expected_sha256: Optional[str] = None) -> Optional[str]:
+    """
+    Try to rebuild s3://bucket/key from base_path and '<key>.delta'.
+    Returns the verified digest, or None (after printing why) if the caller
+    should fall back to a full download.
+    """
+    from s3_download import DownloadError, download_object
+
+    delta_key = key + DELTA_SUFFIX
+    try:
+        head = s3.head_object(Bucket=bucket, Key=delta_key)
+    except Exception:
+        print(f"ℹ️  No delta published for {key}; using full download.")
+        return None
+    meta = {k.lower(): v for k, v in (head.get("Metadata") or {}).items()}
+    if meta.get("base-sha256") and meta["base-sha256"] != base_sha256:
+        print("ℹ️  Published delta is against a different base; using full download.")
+        return None
+
+    delta_path = out_path.with_name(out_path.name + DELTA_SUFFIX)
+    try:
+        # The delta's sha256 metadata names the target, which apply_delta and
+        # the check below verify; the download itself is checked by ETag.
+        download_object(s3, bucket, delta_key, delta_path, use_metadata=False)
+        digest = apply_delta(base_path, delta_path, out_path, base_sha256=base_sha256)
+    except (DownloadError, DeltaError, OSError) as e:
+        print(f"⚠️  Delta update failed ({e}); using full download.")
+        return None
+    finally:
+        delta_path.unlink(missing_ok=True)
+    if expected_sha256 and digest != expected_sha256:
+        out_path.unlink(missing_ok=True)
+        print("⚠️  Delta result does not match the published sha256; using full download.")
+        return None
+    print(f"🧩 Rebuilt {key} from delta ({head['ContentLength']/1e6:.1f} MB transferred).")
+    return digest
+
+
+def main() -> None:
+    usage = ("usage: model_delta.py make <old> <new> <out.delta> [block_size]\n"
+             "       model_delta.py apply <base> <delta> <out>")
+    args = sys.argv[1:]
+    if len(args) >= 4 and args[0] == "make":
+        bs = int(args[4]) if len(args) > 4 else DEFAULT_BLOCK_SIZE
+        stats = make_delta(Path(args[1]), Path(args[2]), Path(args[3]), bs)
+        size = Path(args[3]).stat().st_size
+        print(f"✅ Delta written: {args[3]} ({size} bytes; "
+              f"{stats['copied']} bytes copied, {stats['literal']} literal)")
+        with open(args[3], "rb") as f:
+            hdr = read_header(f)
+        print(f"   Upload with metadata base-sha256={hdr['base_sha256']} sha256={hdr['target_sha256']}")
+    elif len(args) == 4 and args[0] == "apply":
+        try:
+            digest = apply_delta(Path(args[1]), Path(args[2]), Path(args[3]))
+        except DeltaError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        print(f"✅ Rebuilt {args[3]} (sha256 {digest})")
+    else:
+        print(usage)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    with span("model_delta"):
+        main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Find the newest model (*.pkl) under an S3 prefix without listing the whole prefix.
+
+Strategies (config key `model_s3_index`, default "scan"):
+  scan     → page through every object under the prefix (the original behavior)
+  manifest → keep a local manifest of (key, LastModified, size, etag) at
+             `model_index_path` (default artifacts/.model_index.json) and only
+             list keys after the last one seen (StartAfter). Requires keys that
+             sort lexically in publish order (e.g. model_20240101_1200.pkl;
+             model_v10 sorts before model_v9 and would never be listed).
+             A full scan rebuilds it when it is missing, belongs to another
+             bucket/prefix, or is older than `model_index_max_age_hours` (24).
+             Each refresh checks that the indexed keys' LastModified never
+             goes down in key order. When it does, keys aren't in publish
+             order and the manifest can't be trusted: a warning is printed
+             and the answer comes from a full listing (the rebuild's own,
+             or one scan) until the keys are fixed. A key published below
+             the cursor is only seen at the next rebuild, so this catches
+             such prefixes within model_index_max_age_hours, not at once.
+             If the indexed latest no longer exists, the manifest is
+             rebuilt on the spot.
+  pointer  → read a '<prefix>latest.json' object written by the publisher,
+             e.g. {"key": "models/project-x/model_v3.pkl"}; falls back to
+             the manifest strategy when the pointer is absent or unreadable.
+
+Each strategy is a function (s3, bucket, prefix, cfg) -> object dict or None,
+registered in INDEXES.
+"""
+
+import os
+import json
+from pathlib import Path
+from datetime import datetime, timezone, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_INDEX_PATH = "artifacts/.model_index.json"
+DEFAULT_MAX_AGE_HOURS = 24
+POINTER_NAME = "latest.json"
+MANIFEST_FORMAT = 2
+
+
+def _is_model(key: str) -> bool:
+    return key.endswith(".pkl")
+
+
+def _entry(obj: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "key": obj["Key"],
+        "last_modified": obj["LastModified"].isoformat(),
+        "size": obj.get("Size"),
+        "etag": obj.get("ETag"),
+    }
+
+
+def _as_object(entry: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "Key": entry["key"],
+        "LastModified": datetime.fromisoformat(entry["last_modified"]),
+        "Size": entry["size"],
+        "ETag": entry["etag"],
+    }
+
+
+def _newest(entries: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if not entries:
+        return None
+    return _as_object(max(entries, key=lambda e: datetime.fromisoformat(e["last_modified"])))
+
+
+def _list_after(s3, bucket: str, prefix: str, start_after: str = ""):
+    """Yield every object under prefix whose key sorts after start_after."""
+    paginator = s3.get_paginator("list_objects_v2")
+    kwargs = {"Bucket": bucket, "Prefix": prefix}
+    if start_after:
+        kwargs["StartAfter"] = start_after
+    for page in paginator.paginate(**kwargs):
+        yield from page.get("Contents", [])
+
+
+# ---------- scan ----------
+def scan_latest(s3, bucket: str, prefix: str, cfg: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    latest = None
+    for obj in _list_after(s3, bucket, prefix):
+        if _is_model(obj["Key"]):
+            if (latest is None) or (obj["LastModified"] > latest["LastModified"]):
+                latest = obj
+    return latest
+
+
+# ---------- manifest ----------
+def load_manifest(path: Path, bucket: str, prefix: str, max_age: timedelta) -> Optional[Dict[str, Any]]:
+    try:
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if (manifest.get("format") != MANIFEST_FORMAT
+            or manifest.get("bucket") != bucket or manifest.get("prefix") != prefix):
+        return None
+    built = datetime.fromisoformat(manifest["built_at"])
+    if datetime.now(timezone.utc) - built > max_age:
+        return None
+    return manifest
+
+
+def save_manifest(path: Path, manifest: Dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(manifest), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def publish_ordered(entries: List[Dict[str, Any]]) -> bool:
+    """True if LastModified never decreases in key order, i.e. keys sort in publish order."""
+    stamps = [datetime.fromisoformat(e["last_modified"]) for e in sorted(entries, key=lambda e: e["key"])]
+    return all(a <= b for a, b in zip(stamps, stamps[1:]))
+
+
+def refresh_manifest(s3, bucket: str, prefix: str, path: Path, max_age: timedelta,
+                     rebuild: bool = False) -> Dict[str, Any]:
+    """
+    Return an up-to-date manifest, listing only new keys when possible.
+    Its "rebuilt" flag (not saved) says whether this call listed everything.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    manifest = None if rebuild else load_manifest(path, bucket, prefix, max_age)
+    rebuilt = manifest is None
+    if rebuilt:
+        if not rebuild:
+            print("🗂️  Model index missing or stale; rebuilding with a full scan.")
+        manifest = {"format": MANIFEST_FORMAT, "bucket": bucket, "prefix": prefix,
+                    "built_at": now, "last_key": "", "objects": []}
+
+    added = 0
+    for obj in _list_after(s3, bucket, prefix, manifest["last_key"]):
+        # Only model keys advance the cursor, so a sidecar such as latest.json
+        # sorting late can't hide models published (lexically) before it.
+        if _is_model(obj["Key"]):
+            manifest["last_key"] = max(manifest["last_key"], obj["Key"])
+            manifest["objects"].append(_entry(obj))
+            added += 1
+    manifest["refreshed_at"] = now
+    if rebuilt or added:
+        manifest["ordered"] = publish_ordered(manifest["objects"])
+    save_manifest(path, manifest)
+    if added:
+        print(f"🗂️  Model index: +{added} object(s), {len(manifest['objects'])} total.")
+    return {**manifest, "rebuilt": rebuilt}
+
+
+def manifest_latest(s3, bucket: str, prefix: str, cfg: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    path = Path(cfg.get("model_index_path", DEFAULT_INDEX_PATH))
+    max_age = timedelta(hours=float(cfg.get("model_index_max_age_hours", DEFAULT_MAX_AGE_HOURS)))
+    manifest = refresh_manifest(s3, bucket, prefix, path, max_age)
+    if not manifest["ordered"]:
+        # StartAfter can't see new keys that sort below the cursor
+        print(f"⚠️  Model keys under {prefix} don't sort in publish order, so the model index "
+              f"can miss new versions; using a full listing. Set model_s3_index: scan.")
+        return _newest(manifest["objects"]) if manifest["rebuilt"] else scan_latest(s3, bucket, prefix, cfg)
+    latest = _newest(manifest["objects"])
+    if latest is None or manifest["rebuilt"]:
+        return latest  # a full listing is current by definition
+    try:
+        s3.head_object(Bucket=bucket, Key=latest["Key"])
+    except Exception as e:
+        print(f"⚠️  Indexed latest {latest['Key']} is not readable ({type(e).__name__}); rebuilding the model index.")
+        manifest = refresh_manifest(s3, bucket, prefix, path, max_age, rebuild=True)
+        latest = _newest(manifest["objects"])
+    return latest
+
+
+# ---------- pointer ----------
+def read_pointer(s3, bucket: str, prefix: str) -> Optional[str]:
+    try:
+        body = s3.get_object(Bucket=bucket, Key=prefix + POINTER_NAME)["Body"].read()
+        pointer = json.loads(body)
+    except Exception as e:
+        print(f"ℹ️  No usable {POINTER_NAME} pointer ({type(e).__name__}); falling back to manifest.")
+        return None
+    key = pointer.get("key") or pointer.get("Key")
+    return key if key and _is_model(key) else None
+
+
+def pointer_latest(s3, bucket: str, prefix: str, cfg: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    key = read_pointer(s3, bucket, prefix)
+    if key:
+        try:
+            head = s3.head_object(Bucket=bucket, Key=key)
+        except Exception as e:
+            print(f"⚠️  {POINTER_NAME} points at {key}, which is not readable ({e}); falling back to manifest.")
+        else:
+            return {"Key": key, "LastModified": head["LastModified"],
+                    "Size": head["ContentLength"], "ETag": head.get("ETag")}
+    return manifest_latest(s3, bucket, prefix, cfg)
+
+
+INDEXES: Dict[str, Callable[..., Optional[Dict[str, Any]]]] = {
+    "scan": scan_latest,
+    "manifest": manifest_latest,
+    "pointer": pointer_latest,
+}
+
+
+def find_latest(s3, bucket: str, prefix: str, cfg: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    strategy = cfg.get("model_s3_index", "scan")
+    if strategy not in INDEXES:
+        raise ValueError(f"Unknown model_s3_index {strategy!r}. Available: {list(INDEXES)}")
+    return INDEXES[strategy](s3, bucket, prefix, cfg)
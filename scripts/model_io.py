@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Save/load model artifacts with pickle protocol 5 and out-of-band buffers.
+
+dump_model() writes a small container:
+  MAGIC, nbuf u32, pickle_len u64, nbuf × (offset u64, length u64),
+  pickle stream, then each out-of-band buffer at a 64-byte aligned offset.
+
+load_model() memory-maps the file and hands the buffers to pickle as
+memoryviews of the mapping, so large contiguous arrays (NumPy, bytes-like
+PickleBuffer payloads) are not copied: pages are faulted in on first touch
+and shared between processes loading the same artifact. Mapped arrays are
+read-only. Files without the magic are loaded as plain pickles, so existing
+artifacts keep working.
+
+Only load artifacts you trust: unpickling runs arbitrary code.
+"""
+
+import mmap
+import pickle
+import struct
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+MAGIC = b"PFDPKL5\n"
+HEAD = struct.Struct(">IQ")
+ENTRY = struct.Struct(">QQ")
+ALIGN = 64
+
+
+def _align(n: int) -> int:
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def dump_model(obj: Any, path: Path) -> Dict[str, int]:
+    """Write obj to path; returns {'buffers': n, 'buffer_bytes': total}."""
+    buffers = []
+    payload = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+    raws = [b.raw() for b in buffers]
+
+    offset = _align(len(MAGIC) + HEAD.size + ENTRY.size * len(raws) + len(payload))
+    table = []
+    for raw in raws:
+        table.append((offset, raw.nbytes))
+        offset = _align(offset + raw.nbytes)
+
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(HEAD.pack(len(raws), len(payload)))
+        for entry in table:
+            f.write(ENTRY.pack(*entry))
+        f.write(payload)
+        for (off, _), raw in zip(table, raws):
+            f.seek(off)
+            f.write(raw)
+    return {"buffers": len(raws), "buffer_bytes": sum(r.nbytes for r in raws)}
+
+
+def load_model(path: Path) -> Tuple[Any, Dict[str, Any]]:
+    """Return (model, info) where info describes how it was loaded."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            f.seek(0)
+            return pickle.load(f), {"format": "pickle", "oob_buffers": 0, "mapped_bytes": 0}
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    view = memoryview(mm)
+    pos = len(MAGIC)
+    nbuf, plen = HEAD.unpack_from(mm, pos)
+    pos += HEAD.size
+    table = [ENTRY.unpack_from(mm, pos + i * ENTRY.size) for i in range(nbuf)]
+    pos += ENTRY.size * nbuf
+    buffers = [view[off:off + length] for off, length in table]
+    # The mapping stays alive for as long as any loaded array references it
+    model = pickle.loads(view[pos:pos + plen], buffers=buffers)
+    return model, {"format": "pickle5-oob", "oob_buffers": nbuf,
+                   "mapped_bytes": sum(length for _, length in table)}
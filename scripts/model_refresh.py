@@ -6,23 +6,71 @@ Refresh model artifact and update a stable 'current' symlink.
 Behavior:
 - Reads environment config via read_config.get_env_config()
 - Supports two sources:
-  * s3    → downloads the latest .pkl by LastModified from S3
+  * s3    → finds the latest .pkl by LastModified (via the version index in
+            model_index.py, `model_s3_index`) and downloads it using
+            concurrent ranged GETs with resume and SHA-256 verification
+            (tunable via model_download_chunk_mb / model_download_workers)
   * local → picks the most recently modified .pkl in model_local_dir
+- Keeps artifacts in a content-addressed store (model_store.py): downloaded
+  versions in model_local_dir are hard links to objects keyed by SHA-256,
+  so identical bytes under a new name are neither re-downloaded nor stored
+  twice, and a retention policy (model_store_keep / model_store_max_gb)
+  bounds disk usage. Local models are only recorded: never linked,
+  chmodded or deleted
+- Before downloading, consults the host-wide artifact cache
+  (artifact_cache.py, `artifact_cache_dir`, off by default) shared by all
+  envs and runners on the machine; concurrent refreshes of the same object
+  download it once. If the cache fails, the refresh downloads directly
+- With `model_delta: true`, rebuilds a new S3 version from the previous one
+  plus a published '<key>.delta' (model_delta.py) before falling back to a
+  full download
 - Updates an absolute symlink at 'model_current_symlink'
-- Writes the selected version filename to 'artifacts/.model_version'
-
-Exit codes:
+- Writes the selected version filename to 'model_version_file'
+  (default artifacts/.model_version) via a temp file + rename
+- Records each activated version in the release history beside it
+  (releases.py; the last model_store_keep are kept, pinned in the store) so
+  rollback.py can flip back without a download; versions rolled back from
+  are not re-activated
+- Takes per-path file locks (refresh_lock) around the switch, so concurrent
+  refreshes of environments sharing a version file, symlink or store
+  serialize there; downloads still run in parallel
+- REFRESH_ENVS (comma-separated, or "all") refreshes several environments in
+  one invocation, in a process pool of REFRESH_WORKERS (default: one per
+  env), and writes a consolidated status report to
+  logs/model_refresh_summary.json. Without it, only APP_ENV (default dev).
+
+Exit codes (with REFRESH_ENVS, the highest among failed environments):
   0 → success / already up-to-date
   2 → missing prerequisites (e.g., no local models, missing AWS env, no S3 objects)
   3 → unsupported model_source
+  4 → S3 download failed or did not match the published checksum
 """
 
 import os
 import sys
+import json
+import time
+import fcntl
 from pathlib import Path
-from typing import Optional, Dict, Any
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+from read_config import DEFAULT_ENV, get_env_config, list_envs
+from instrument import span
+from lazy import lazy_import
+from model_store import DEFAULT_KEEP, DEFAULT_STORE_DIR, ModelStore
+from releases import ReleaseHistory, atomic_symlink, atomic_write_text
 
-from read_config import get_env_config
+# Only the S3 path needs these (and boto3 behind them); local refreshes and
+# "already up-to-date" exits never load them
+artifact_cache = lazy_import("artifact_cache")
+model_delta = lazy_import("model_delta")
+model_index = lazy_import("model_index")
+s3_download = lazy_import("s3_download")
+
+DEFAULT_VERSION_FILE = "artifacts/.model_version"
+SUMMARY_PATH = Path("logs/model_refresh_summary.json")
 
 
 def ensure_dirs(*paths: Path) -> None:
@@ -30,8 +78,8 @@ def ensure_dirs(*paths: Path) -> None:
         p.mkdir(parents=True, exist_ok=True)
 
 
-def version_file_path() -> Path:
-    return Path("artifacts/.model_version")
+def version_file_path(cfg: Optional[Dict[str, Any]] = None) -> Path:
+    return Path((cfg or {}).get("model_version_file", DEFAULT_VERSION_FILE))
 
 
 def read_model_version(vfile: Path) -> Optional[str]:
@@ -39,55 +87,165 @@ def read_model_version(vfile: Path) -> Optional[str]:
 
 
 def write_model_version(vfile: Path, version: str) -> None:
-    vfile.write_text(version, encoding="utf-8")
+    atomic_write_text(vfile, version)
 
 
 def set_symlink(target: Path, link: Path) -> None:
     """
     Create/replace a symlink 'link' pointing to 'target'.
-    Always use an absolute target path to avoid accidental dangling links.
+    Always use an absolute target path to avoid accidental dangling links;
+    the new link is renamed over the old one, so 'link' never goes missing.
     """
-    target_abs = target.resolve()  # absolute path to actual file
-    try:
-        link.unlink()
-    except FileNotFoundError:
-        pass
-    link.symlink_to(target_abs)
+    atomic_symlink(target, link)
 
 
-def latest_s3_object(bucket: str, prefix: str) -> Optional[Dict[str, Any]]:
-    import boto3
-    s3 = boto3.client("s3")
-    paginator = s3.get_paginator("list_objects_v2")
-    latest = None
-    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
-        for obj in page.get("Contents", []):
-            if obj["Key"].endswith(".pkl"):
-                if (latest is None) or (obj["LastModified"] > latest["LastModified"]):
-                    latest = obj
-    return latest
+def open_history(cfg: Dict[str, Any], vfile: Path) -> ReleaseHistory:
+    return ReleaseHistory.beside(vfile, int(cfg.get("model_store_keep", DEFAULT_KEEP)))
 
 
-def download_s3_object(bucket: str, key: str, dest: Path) -> None:
-    import boto3
-    s3 = boto3.client("s3")
-    dest.parent.mkdir(parents=True, exist_ok=True)
-    s3.download_file(bucket, key, str(dest))
+def record_release(history: ReleaseHistory, model_dir: Path, prev_version: Optional[str],
+                   version: str, path: Path, digest: Optional[str]) -> None:
+    # Versions activated before the history existed still count as a rollback target
+    if prev_version and prev_version != version and not history.get(prev_version) \
+            and (model_dir / prev_version).exists():
+        history.record(prev_version, model_dir / prev_version)
+    history.record(version, path, digest)
 
 
-def main() -> None:
-    cfg = get_env_config()
+def rejected(history: ReleaseHistory, version: str, prev_version: Optional[str]) -> bool:
+    if not history.is_rejected(version):
+        return False
+    print(f"⏸️  {version} was rolled back; staying on {prev_version}. "
+          f"To use it anyway: ROLLBACK_TO={version} python scripts/rollback.py")
+    return True
+
+
+def newest_local_model(model_dir: Path) -> Optional[Path]:
+    """Most recently modified *.pkl in model_dir (single pass, no sort)."""
+    newest, newest_mtime = None, -1.0
+    with os.scandir(model_dir) as it:
+        for entry in it:
+            if entry.name.endswith(".pkl") and entry.is_file():
+                mtime = entry.stat().st_mtime
+                if mtime > newest_mtime:
+                    newest, newest_mtime = Path(entry.path), mtime
+    return newest
+
+
+def open_store(cfg: Dict[str, Any]) -> ModelStore:
+    return ModelStore(Path(cfg.get("model_store_dir", DEFAULT_STORE_DIR)))
+
+
+def apply_retention(store: ModelStore, cfg: Dict[str, Any], *pinned: Optional[str]) -> None:
+    max_gb = cfg.get("model_store_max_gb")
+    stats = store.gc(keep=int(cfg.get("model_store_keep", DEFAULT_KEEP)),
+                     max_bytes=int(float(max_gb) * 1e9) if max_gb else None,
+                     pinned=[v for v in pinned if v])
+    if stats["refs"] or stats["objects"]:
+        print(f"🧹 Retention: removed {stats['refs']} version(s), "
+              f"{stats['objects']} object(s), freed {stats['bytes']/1e6:.1f} MB")
+
+
+def latest_s3_object(bucket: str, prefix: str, s3=None,
+                     cfg: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Newest *.pkl under the prefix, found via the strategy in
+    cfg['model_s3_index'] (see model_index.py); full scan when cfg is None.
+    """
+    if s3 is None:
+        s3 = s3_download.s3_client()
+    if cfg is None:
+        return model_index.scan_latest(s3, bucket, prefix)
+    return model_index.find_latest(s3, bucket, prefix, cfg)
+
+
+def download_s3_object(bucket: str, key: str, dest: Path,
+                       chunk_size: Optional[int] = None,
+                       max_workers: Optional[int] = None,
+                       s3=None) -> str:
+    """
+    Concurrent ranged download with resume and SHA-256 verification
+    (see s3_download.py). Returns the artifact's SHA-256; dest is only
+    created once the transfer is complete and verified. chunk_size and
+    max_workers default to s3_download's DEFAULT_CHUNK_SIZE/DEFAULT_WORKERS.
+    """
+    chunk_size = chunk_size or s3_download.DEFAULT_CHUNK_SIZE
+    max_workers = max_workers or s3_download.DEFAULT_WORKERS
+    if s3 is None:
+        s3 = s3_download.s3_client(max_workers)
+    return s3_download.download_object(s3, bucket, key, dest, chunk_size=chunk_size, max_workers=max_workers)
+
+
+@contextmanager
+def file_locks(paths: List[str]) -> Iterator[None]:
+    """Exclusive flocks on `paths`, taken in sorted order so callers can't deadlock."""
+    with ExitStack() as stack:
+        for path in sorted(set(paths)):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            f = stack.enter_context(open(path, "a"))
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                print(f"⏳ Waiting for {path} (another refresh or rollback holds it)")
+                fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def refresh_lock(cfg: Dict[str, Any], vfile: Path, link: Path):
+    """
+    Lock what a refresh (or rollback) switches: the version file and the
+    release history beside it, the current-model symlink and the model store
+    index. Environments sharing any of these paths serialize; environments
+    with their own paths never wait on each other.
+    """
+    store_dir = Path(cfg.get("model_store_dir", DEFAULT_STORE_DIR))
+    return file_locks([os.path.abspath(f"{vfile}.lock"), os.path.abspath(f"{link}.lock"),
+                       os.path.abspath(store_dir / ".lock")])
+
+
+def activate(cfg: Dict[str, Any], store: ModelStore, history: ReleaseHistory, model_dir: Path,
+             vfile: Path, link: Path, prev_version: Optional[str], version: str, path: Path,
+             digest: Optional[str]) -> None:
+    """Point the symlink and version file at `version`; caller holds refresh_lock."""
+    set_symlink(path, link)
+    write_model_version(vfile, version)
+    record_release(history, model_dir, prev_version, version, path, digest)
+    apply_retention(store, cfg, version, prev_version, *history.versions())
+    print(f"✅ Updated to version: {version}")
+
+
+def refresh_env(env: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Refresh one environment (APP_ENV when None) and return its entry for the
+    consolidated report. Failures exit with the codes in the module docstring.
+    """
+    cfg = get_env_config(env)
+    env = env or os.getenv("APP_ENV", DEFAULT_ENV)
+    start = time.perf_counter()
 
     model_source = cfg.get("model_source", "s3")
     model_dir = Path(cfg.get("model_local_dir", "artifacts/models"))
     current_link = Path(cfg.get("model_current_symlink", "artifacts/current_model.pkl"))
-    vfile = version_file_path()
+    vfile = version_file_path(cfg)
 
     ensure_dirs(model_dir, current_link.parent, vfile.parent)
 
+    # Safe without the lock: the version file is only ever replaced by a rename
     prev_version = read_model_version(vfile)
     print(f"Previous version: {prev_version}")
 
+    def status(state: str, version: Optional[str]) -> Dict[str, Any]:
+        return {"env": env, "status": state, "version": version, "previous": prev_version,
+                "elapsed_sec": round(time.perf_counter() - start, 3)}
+
+    def settled(version: str) -> Optional[Dict[str, Any]]:
+        if version == prev_version:
+            print("✅ Model already up-to-date.")
+            return status("up-to-date", version)
+        if rejected(open_history(cfg, vfile), version, prev_version):
+            return status("held", prev_version)
+        return None
+
     if model_source == "s3":
         # Validate AWS env; fail clearly if not provided
         missing = [k for k in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_DEFAULT_REGION")
@@ -100,7 +258,10 @@ def main() -> None:
         bucket = cfg["model_s3_bucket"]
         prefix = cfg["model_s3_prefix"]
 
-        latest = latest_s3_object(bucket, prefix)
+        workers = int(cfg.get("model_download_workers", s3_download.DEFAULT_WORKERS))
+        s3 = s3_download.s3_client(workers)
+
+        latest = latest_s3_object(bucket, prefix, s3=s3, cfg=cfg)
         if not latest:
             print("❌ No model objects (*.pkl) found in the specified S3 prefix.")
             sys.exit(2)
@@ -108,44 +269,205 @@ def main() -> None:
         latest_key = latest["Key"]
         latest_version = latest_key.rsplit("/", 1)[-1]
 
-        if latest_version == prev_version:
-            print("✅ Model already up-to-date.")
-            return
+        done = settled(latest_version)
+        if done:
+            return done
 
         dest = model_dir / latest_version
-        print(f"⬇️  Downloading s3://{bucket}/{latest_key} -> {dest}")
-        download_s3_object(bucket, latest_key, dest)
-
-        set_symlink(dest, current_link)
-        write_model_version(vfile, latest_version)
-        print(f"✅ Updated to version: {latest_version}")
-        return
+        store = open_store(cfg)
+        try:
+            head = s3_download.head_object(s3, bucket, latest_key)
+        except s3_download.DownloadError as e:
+            print(f"❌ Download failed: {e}")
+            sys.exit(4)
+        digest = store.digest_for(s3_download.expected_digests(head).get("sha256"), head.get("ETag"))
+        incoming = None
+        with ExitStack() as staging:
+            if digest:
+                print(f"♻️  s3://{bucket}/{latest_key} already in local store ({digest[:12]}); skipping download.")
+            else:
+                # Staged per env, so envs sharing a store never write the same partial
+                # file, and a second run of this env waits for the first. The download
+                # itself doesn't hold refresh_lock; only the switch below does.
+                incoming = store.root / "incoming" / env / latest_version
+                incoming.parent.mkdir(parents=True, exist_ok=True)
+                staging.enter_context(file_locks([os.path.abspath(incoming.parent.with_suffix(".lock"))]))
+                if read_model_version(vfile) == latest_version:
+                    print("✅ Model already up-to-date.")
+                    return status("up-to-date", latest_version)
+                base = store.index["refs"].get(prev_version) if prev_version else None
+                if cfg.get("model_delta") and base and store.has(base["digest"]):
+                    digest = model_delta.fetch_via_delta(s3, bucket, latest_key,
+                                                         store.object_path(base["digest"]), base["digest"], incoming,
+                                                         expected_sha256=s3_download.expected_digests(head).get("sha256"))
+                if not digest:
+                    chunk_size = int(float(cfg.get("model_download_chunk_mb",
+                                                   s3_download.DEFAULT_CHUNK_SIZE // 2**20)) * 2**20)
+                    try:
+                        cache = artifact_cache.from_config(cfg)
+                    except OSError as e:
+                        print(f"⚠️  Shared artifact cache unavailable ({e}); downloading directly.")
+                        cache = None
+
+                    def download(path: Path) -> str:
+                        print(f"⬇️  Downloading s3://{bucket}/{latest_key} -> {dest}")
+                        return download_s3_object(bucket, latest_key, path, chunk_size, workers, s3=s3)
+
+                    try:
+                        with span("model_refresh.download", key=latest_key, bytes=head.get("ContentLength")) as attrs:
+                            if cache is not None:
+                                try:
+                                    digest, hit = cache.fetch(f"s3://{bucket}/{latest_key}@{head.get('ETag')}",
+                                                              download, incoming)
+                                    attrs["cache_hit"] = hit
+                                    if hit:
+                                        print(f"📦 s3://{bucket}/{latest_key} served from the shared artifact cache ({cache.root})")
+                                except (OSError, artifact_cache.CacheError) as e:
+                                    print(f"⚠️  Shared artifact cache failed ({e}); downloading directly.")
+                                    digest = None
+                            if not digest:
+                                digest = download(incoming)
+                    except s3_download.DownloadError as e:
+                        print(f"❌ Download failed: {e}")
+                        sys.exit(4)
+
+            with refresh_lock(cfg, vfile, current_link):
+                # Another env sharing these paths may have switched while we downloaded
+                prev_version = read_model_version(vfile)
+                done = settled(latest_version)
+                if done:
+                    if incoming is not None:
+                        incoming.unlink(missing_ok=True)
+                    return done
+                store = open_store(cfg)
+                if incoming is not None:
+                    store.add_file(incoming, digest, etag=head.get("ETag"))
+                elif not store.has(digest):
+                    print(f"❌ {digest[:12]} was evicted from {store.root} by a concurrent refresh; re-run.")
+                    sys.exit(4)
+                print(f"🔒 sha256: {digest}")
+                store.link(digest, dest, latest_version)
+                activate(cfg, store, open_history(cfg, vfile), model_dir, vfile, current_link,
+                         prev_version, latest_version, dest, digest)
+        return status("updated", latest_version)
 
     elif model_source == "local":
-        files = sorted(model_dir.glob("*.pkl"),
-                       key=lambda p: p.stat().st_mtime,
-                       reverse=True)
-        if not files:
-            print(f"❌ No local model files found in {model_dir}. "
-                  f"Add at least one *.pkl and re-run.")
-            sys.exit(2)
+        with refresh_lock(cfg, vfile, current_link):
+            prev_version = read_model_version(vfile)
+            latest = newest_local_model(model_dir)
+            if latest is None:
+                print(f"❌ No local model files found in {model_dir}. "
+                      f"Add at least one *.pkl and re-run.")
+                sys.exit(2)
+
+            latest_version = latest.name
+            done = settled(latest_version)
+            if done:
+                return done
+
+            # Recorded for retention/rollback bookkeeping; the user's file is left untouched
+            store = open_store(cfg)
+            digest = store.adopt(latest)
+            activate(cfg, store, open_history(cfg, vfile), model_dir, vfile, current_link,
+                     prev_version, latest_version, latest, digest)
+        return status("updated", latest_version)
 
-        latest = files[0]
-        latest_version = latest.name
+    else:
+        print(f"❌ Unsupported model_source: {model_source}")
+        sys.exit(3)
 
-        if latest_version == prev_version:
-            print("✅ Model already up-to-date.")
-            return
 
-        set_symlink(latest, current_link)
-        write_model_version(vfile, latest_version)
-        print(f"✅ Updated to version: {latest_version}")
-        return
+# ---------- several environments in one run ----------
+class _EnvPrefixed:
+    """stdout wrapper tagging each line with its env, so parallel output stays readable."""
+
+    def __init__(self, stream, env: str):
+        self.stream, self.env, self._bol = stream, env, True
+
+    def write(self, text: str) -> int:
+        for line in text.splitlines(keepends=True):
+            if self._bol:
+                self.stream.write(f"[{self.env}] ")
+            self.stream.write(line)
+            self._bol = line.endswith("\n")
+        return len(text)
+
+    def flush(self) -> None:
+        self.stream.flush()
 
+
+def _refresh_worker(env: str) -> Dict[str, Any]:
+    if isinstance(sys.stdout, _EnvPrefixed):  # pool processes are reused across envs
+        sys.stdout.env = env
     else:
-        print(f"❌ Unsupported model_source: {model_source}")
-        sys.exit(3)
+        sys.stdout = _EnvPrefixed(sys.stdout, env)
+    try:
+        with span("model_refresh.env", env=env):
+            return refresh_env(env)
+    finally:
+        sys.stdout.flush()
+
+
+def selected_envs() -> List[str]:
+    wanted = os.getenv("REFRESH_ENVS", "").strip()
+    if not wanted:
+        return [os.getenv("APP_ENV", DEFAULT_ENV)]
+    if wanted == "all":
+        return list_envs()
+    return [e.strip() for e in wanted.split(",") if e.strip()]
+
+
+def refresh_all(envs: List[str], workers: int) -> List[Dict[str, Any]]:
+    """Refresh `envs` in a process pool; one status entry per env, in order."""
+    from concurrent.futures import ProcessPoolExecutor
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {env: pool.submit(_refresh_worker, env) for env in envs}
+        for env, fut in futures.items():
+            try:
+                results.append(fut.result())
+            except BaseException as e:  # sys.exit() in the worker arrives as SystemExit
+                code = e.code if isinstance(e, SystemExit) and isinstance(e.code, int) else 1
+                results.append({"env": env, "status": "failed", "exit_code": code,
+                                "error": f"{type(e).__name__}: {e}"})
+    return results
+
+
+def write_summary(results: List[Dict[str, Any]], elapsed: float) -> None:
+    SUMMARY_PATH.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write_text(SUMMARY_PATH, json.dumps(
+        {"generated_at": datetime.now(timezone.utc).isoformat(), "elapsed_sec": round(elapsed, 3),
+         "envs": results}, indent=2))
+
+    icons = {"updated": "✅", "up-to-date": "✅", "held": "⏸️ ", "failed": "❌"}
+    width = max(len(r["env"]) for r in results)
+    print(f"\n📋 Model refresh: {len(results)} environment(s) in {elapsed:.1f}s → {SUMMARY_PATH}")
+    for r in results:
+        if r["status"] == "failed":
+            detail = f"exit {r['exit_code']}"
+        elif r["status"] == "updated":
+            detail = f"{r['previous']} → {r['version']} ({r['elapsed_sec']:.1f}s)"
+        else:
+            detail = str(r["version"])
+        print(f"  {icons[r['status']]} {r['env']:<{width}}  {r['status']:<10}  {detail}")
+
+
+def main() -> None:
+    envs = selected_envs()
+    if len(envs) == 1:
+        refresh_env(envs[0])
+        return
+
+    workers = int(os.getenv("REFRESH_WORKERS", "0")) or len(envs)
+    start = time.perf_counter()
+    results = refresh_all(envs, workers)
+    write_summary(results, time.perf_counter() - start)
+    codes = [r["exit_code"] for r in results if r["status"] == "failed"]
+    if codes:
+        sys.exit(max(codes))
 
 
 if __name__ == "__main__":
-    main()
+    with span("model_refresh"):
+        main()
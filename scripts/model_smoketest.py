@@ -3,20 +3,175 @@
 """
 Basic smoke test after model refresh:
 - Verifies the 'current' symlink exists (even if it's a symlink) and resolves to a real file.
-- Writes a simple JSON summary to the reports directory.
+- With `smoketest_mode: load`, also deserializes the model (model_io.load_model:
+  pickle protocol 5 with mmap-backed out-of-band buffers), and records load
+  wall time, peak RSS during the load and, if the model has predict() and
+  `smoketest_sample_input` points at a pickled sample, an inference latency
+  distribution. The peak is the kernel's high-water mark, reset right before
+  the load (Linux /proc/self/clear_refs), so it reflects this model rather
+  than whatever the process did earlier; where it can't be reset only the
+  RSS growth is recorded and the RSS check is skipped.
+- Compares those metrics with the last *different* model version of the same
+  env and fails when a regression exceeds the configured percentage.
+- Writes a simple JSON summary per env to the reports directory
+  (<report_dir>/smoketest_summary.<env>.json; dev and prod may share it).
+
+Config (env.yaml):
+  smoketest_mode: "stat" | "load"                 (default: stat)
+  smoketest_sample_input: path to pickled input   (optional)
+  smoketest_inference_runs: 50
+  smoketest_max_load_regression_pct: 50
+  smoketest_max_rss_regression_pct: 50
+  smoketest_max_latency_regression_pct: 50
 
 Exit codes:
   0 → success
   2 → missing/dangling symlink or target not a file
+  3 → model failed to load or run a sample inference
+  4 → load/latency/memory regression versus the previous version
 """
 
 import os
 import sys
 import json
+import time
+import pickle
+import resource
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
 
 from read_config import get_env_config
+from model_io import load_model
+from instrument import span
+
+REGRESSION_METRICS = {
+    # metric → (config key for the allowed increase in percent,
+    #           absolute change below which differences are treated as noise)
+    "load_sec": ("smoketest_max_load_regression_pct", 0.05),
+    "peak_rss_mb": ("smoketest_max_rss_regression_pct", 16.0),
+    "latency_p95_ms": ("smoketest_max_latency_regression_pct", 0.5),
+}
+DEFAULT_REGRESSION_PCT = 50.0
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _proc_status_mb(field: str) -> Optional[float]:
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024  # kB
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss() -> bool:
+    """Reset the process's RSS high-water mark (VmHWM); False where unsupported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        return False
+    return _proc_status_mb("VmHWM") is not None
+
+
+def percentile(sorted_vals: List[float], pct: float) -> float:
+    idx = min(len(sorted_vals) - 1, max(0, round(pct / 100 * (len(sorted_vals) - 1))))
+    return sorted_vals[idx]
+
+
+def summary_path(report_dir: Path, env: str) -> Path:
+    return report_dir / f"smoketest_summary.{env}.json"
+
+
+def read_summary(report_dir: Path, env: str) -> Optional[Dict[str, Any]]:
+    """
+    env's last smoke test summary, or None. Falls back to the shared
+    smoketest_summary.json written by older versions, but only if it is env's.
+    """
+    for path in (summary_path(report_dir, env), report_dir / "smoketest_summary.json"):
+        try:
+            summary = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        if isinstance(summary, dict) and summary.get("env") == env:
+            return summary
+    return None
+
+
+def measure_load(model_file: Path, cfg: Dict[str, Any]) -> Dict[str, Any]:
+    # ru_maxrss never goes down, so without a reset it reports the process's
+    # lifetime peak; growth against it is only a lower bound
+    scoped = reset_peak_rss()
+    rss_before = _proc_status_mb("VmRSS") if scoped else peak_rss_mb()
+    start = time.perf_counter()
+    model, info = load_model(model_file)
+    load_sec = time.perf_counter() - start
+    peak = _proc_status_mb("VmHWM") if scoped else peak_rss_mb()
+    metrics: Dict[str, Any] = {
+        "load_sec": round(load_sec, 4),
+        "rss_growth_mb": round(peak - rss_before, 1),
+        "model_type": type(model).__name__,
+        **info,
+    }
+    if scoped:
+        metrics["peak_rss_mb"] = round(peak, 1)
+
+    sample_path = cfg.get("smoketest_sample_input")
+    predict = getattr(model, "predict", None)
+    if sample_path and callable(predict):
+        with open(sample_path, "rb") as f:
+            sample = pickle.load(f)
+        runs = int(cfg.get("smoketest_inference_runs", 50))
+        predict(sample)  # warm-up, excluded from the distribution
+        lat = []
+        for _ in range(runs):
+            t = time.perf_counter()
+            predict(sample)
+            lat.append((time.perf_counter() - t) * 1000)
+        lat.sort()
+        metrics.update({
+            "inference_runs": runs,
+            "latency_p50_ms": round(percentile(lat, 50), 3),
+            "latency_p95_ms": round(percentile(lat, 95), 3),
+            "latency_p99_ms": round(percentile(lat, 99), 3),
+            "latency_max_ms": round(lat[-1], 3),
+        })
+    return metrics
+
+
+def pick_baseline(previous: Optional[Dict[str, Any]], model_file: str) -> Optional[Dict[str, Any]]:
+    """Metrics of the last different model version, carried forward across re-runs."""
+    if not previous:
+        return None
+    if previous.get("model_file") == model_file:
+        return previous.get("baseline")
+    if previous.get("load"):
+        return {"model_file": previous["model_file"], **previous["load"]}
+    return None
+
+
+def find_regressions(current: Dict[str, Any], baseline: Optional[Dict[str, Any]],
+                     cfg: Dict[str, Any]) -> List[str]:
+    if not baseline:
+        return []
+    out = []
+    for metric, (key, noise) in REGRESSION_METRICS.items():
+        old, new = baseline.get(metric), current.get(metric)
+        if not old or new is None or new - old < noise:
+            continue
+        allowed = float(cfg.get(key, DEFAULT_REGRESSION_PCT))
+        change = (new - old) / old * 100
+        if change > allowed:
+            out.append(f"{metric}: {old} → {new} (+{change:.0f}%, allowed +{allowed:g}%)")
+    return out
 
 
 def main() -> None:
@@ -42,19 +197,45 @@ def main() -> None:
         print("❌ Resolved model target is not a regular file:", model_target)
         sys.exit(2)
 
+    env = os.getenv("APP_ENV", "dev")
+    out_json = summary_path(report_dir, env)
     summary = {
-        "env": os.getenv("APP_ENV", "dev"),
-        "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "env": env,
+        "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
         "symlink": str(current_link),
         "model_file": str(model_target),
         "file_size_bytes": model_target.stat().st_size,
         "smoketest": "ok"
     }
 
-    out_json = report_dir / "smoketest_summary.json"
+    exit_code = 0
+    if cfg.get("smoketest_mode", "stat") == "load":
+        previous = read_summary(report_dir, env)
+        try:
+            metrics = measure_load(model_target, cfg)
+        except Exception as e:
+            print(f"❌ Model failed to load/run: {type(e).__name__}: {e}")
+            summary.update(smoketest="load_failed", error=f"{type(e).__name__}: {e}")
+            exit_code = 3
+        else:
+            summary["load"] = metrics
+            summary["baseline"] = pick_baseline(previous, str(model_target))
+            print(f"⏱️  Loaded in {metrics['load_sec']}s, peak RSS "
+                  f"{metrics.get('peak_rss_mb', 'n/a')} MB (+{metrics['rss_growth_mb']} MB)"
+                  + (f", p95 {metrics['latency_p95_ms']} ms" if "latency_p95_ms" in metrics else ""))
+            regressions = find_regressions(metrics, summary["baseline"], cfg)
+            if regressions:
+                summary.update(smoketest="regression", regressions=regressions)
+                for r in regressions:
+                    print(f"❌ Regression vs {summary['baseline']['model_file']}: {r}")
+                exit_code = 4
+
     out_json.write_text(json.dumps(summary, indent=2), encoding="utf-8")
     print("✅ Smoke test summary written:", out_json)
+    if exit_code:
+        sys.exit(exit_code)
 
 
 if __name__ == "__main__":
-    main()
+    with span("model_smoketest"):
+        main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Content-addressed local store for model artifacts.
+
+Layout under `model_store_dir` (default artifacts/store):
+  objects/<aa>/<sha256>   one read-only copy of each distinct artifact
+  index.json              refs (version name → digest, size, path, added_at)
+                          and known S3 ETags (etag → digest)
+
+A downloaded version in model_local_dir (e.g. artifacts/models/model_v7.pkl)
+is a hard link to its object, so the same bytes published under a new name cost no
+download and no extra disk. When the store and model dir are on different
+filesystems the link degrades to a copy.
+
+Files a user drops into model_local_dir (model_source: local) are adopted:
+recorded as refs by digest but left exactly as they are, with no object in
+objects/; retention only forgets those refs and never deletes the files.
+
+Retention (gc): keep the `model_store_keep` most recently added versions plus
+any pinned ones (the current model), drop older refs and then any object no
+ref points at; if the store still exceeds `model_store_max_gb`, drop the
+oldest unpinned refs until it fits.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+from pathlib import Path
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional
+
+DEFAULT_STORE_DIR = "artifacts/store"
+DEFAULT_KEEP = 5
+HASH_BLOCK = 1024 * 1024
+
+
+def sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ModelStore:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.objects = self.root / "objects"
+        self.index_path = self.root / "index.json"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.index = self._load_index()
+
+    # ---------- index ----------
+    def _load_index(self) -> Dict[str, Any]:
+        try:
+            index = json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            index = {}
+        index.setdefault("refs", {})
+        index.setdefault("etags", {})
+        return index
+
+    def save(self) -> None:
+        tmp = self.index_path.with_name(f"{self.index_path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(self.index, indent=2), encoding="utf-8")
+        os.replace(tmp, self.index_path)
+
+    # ---------- objects ----------
+    def object_path(self, digest: str) -> Path:
+        return self.objects / digest[:2] / digest
+
+    def has(self, digest: Optional[str]) -> bool:
+        return bool(digest) and self.object_path(digest).is_file()
+
+    def digest_for(self, sha256: Optional[str] = None, etag: Optional[str] = None) -> Optional[str]:
+        """Digest of an artifact already in the store, identified by its published sha256 or ETag."""
+        if self.has(sha256):
+            return sha256
+        digest = self.index["etags"].get(etag) if etag else None
+        return digest if self.has(digest) else None
+
+    def add_file(self, path: Path, digest: Optional[str] = None, etag: Optional[str] = None) -> str:
+        """
+        Move a fully written file into the store and return its digest.
+        If identical content is already stored, the new copy is discarded.
+        """
+        digest = digest or sha256_file(path)
+        obj = self.object_path(digest)
+        if obj.is_file():
+            path.unlink()
+        else:
+            obj.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(path, obj)
+            obj.chmod(0o444)  # shared by hard links: never edit in place
+        if etag:
+            self.index["etags"][etag] = digest
+        return digest
+
+    def link(self, digest: str, dest: Path, version: str) -> None:
+        """Materialize the object at dest (hard link, or copy across filesystems) and record the ref."""
+        obj = self.object_path(digest)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        if not (dest.exists() and os.path.samefile(dest, obj)):
+            tmp = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+            tmp.unlink(missing_ok=True)
+            try:
+                os.link(obj, tmp)
+            except OSError:
+                shutil.copy2(obj, tmp)
+            os.replace(tmp, dest)
+        self.index["refs"][version] = {
+            "digest": digest,
+            "size": obj.stat().st_size,
+            "path": str(dest),
+            "added_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+    def adopt(self, path: Path) -> str:
+        """
+        Record a file the user placed in model_local_dir (model_source: local)
+        as a version. The file is only hashed: it is not linked, moved or
+        chmodded, and retention forgets its ref without ever deleting it.
+        Files already recorded with unchanged inode, size and mtime are not
+        re-hashed.
+        """
+        st = path.stat()
+        stamp = [st.st_ino, st.st_size, st.st_mtime_ns]
+        ref = self.index["refs"].get(path.name)
+        if ref and ref.get("adopted") and ref.get("path") == str(path) and ref.get("stamp") == stamp:
+            return ref["digest"]
+        digest = sha256_file(path)
+        self.index["refs"][path.name] = {
+            "digest": digest,
+            "size": st.st_size,
+            "path": str(path),
+            "added_at": datetime.now(timezone.utc).isoformat(),
+            "adopted": True,
+            "stamp": stamp,
+        }
+        return digest
+
+    # ---------- retention ----------
+    def usage_bytes(self) -> int:
+        return sum(p.stat().st_size for p in self.objects.glob("*/*") if p.is_file())
+
+    def gc(self, keep: int = DEFAULT_KEEP, max_bytes: Optional[int] = None,
+           pinned: Iterable[str] = ()) -> Dict[str, int]:
+        """Apply the retention policy; returns counts of removed refs/objects and bytes freed."""
+        pinned = set(pinned)
+        refs = self.index["refs"]
+        newest_first = sorted(refs, key=lambda v: refs[v]["added_at"], reverse=True)
+        drop = [v for v in newest_first[keep:] if v not in pinned]
+        for v in drop:
+            self._drop_ref(v)
+
+        removed_objects, freed = self._sweep()
+        if max_bytes is not None:
+            for v in reversed(newest_first[:keep]):
+                if self.usage_bytes() <= max_bytes:
+                    break
+                if v in pinned or v not in refs:
+                    continue
+                self._drop_ref(v)
+                drop.append(v)
+                n, b = self._sweep()
+                removed_objects += n
+                freed += b
+        self.save()
+        return {"refs": len(drop), "objects": removed_objects, "bytes": freed}
+
+    def _drop_ref(self, version: str) -> None:
+        ref = self.index["refs"].pop(version)
+        if not ref.get("adopted"):  # adopted files belong to the user, not the store
+            Path(ref["path"]).unlink(missing_ok=True)
+
+    def _sweep(self):
+        # Only objects the store wrote itself live here; adopted refs have none
+        live = {r["digest"] for r in self.index["refs"].values() if not r.get("adopted")}
+        removed, freed = 0, 0
+        for obj in self.objects.glob("*/*"):
+            if obj.name not in live:
+                freed += obj.stat().st_size
+                obj.unlink()
+                removed += 1
+        self.index["etags"] = {e: d for e, d in self.index["etags"].items() if d in live}
+        return removed, freed
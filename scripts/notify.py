@@ -2,50 +2,330 @@
 # -*- coding: utf-8 -*-
 
 """
-Send a simple alert to Slack or Teams using an incoming webhook.
+Send alerts to Slack, Teams or generic JSON webhooks, batched and rate-limited.
+
+Each invocation drops its alert into a private spool directory
+(ALERT_SPOOL_DIR, default ~/.cache/pyfordevops/alerts, mode 0700; kept out of
+logs/, which CI uploads). A spooled alert names its targets by a hash of
+their URL, never the URL itself: webhook URLs are secrets, and the dispatcher
+resolves the hashes against its own ALERT_TARGETS / ALERT_WEBHOOK_URL.
+
+One process at a time holds the dispatcher lock. A lone alert is sent at
+once; when others are already waiting (a burst of failures), the dispatcher
+first waits ALERT_WINDOW_SEC (default 3) for the rest of the burst, then sends
+each target one digest of the alerts addressed to it. Alerts spooled while it
+is sending go out in its next digest. Other processes just spool and exit 0.
+A spool file is removed only once every one of its targets accepted it;
+otherwise it is kept with just the failed targets for the next run (up to
+ALERT_MAX_ATTEMPTS, 5). Targets this dispatcher has no URL for are kept the
+same way, without failing the run.
+
+Targets are sent concurrently with asyncio. Each target has its own pooled
+requests.Session (keep-alive) and a token bucket. On 429 the sender waits for
+Retry-After (or exponential backoff with jitter) and retries, as it does for
+5xx and connection errors, up to ALERT_MAX_RETRIES (default 5) times.
 
 Environment variables:
-- ALERT_WEBHOOK_URL (required)
-- ALERT_FORMAT = "slack" | "teams" (default: slack)
+- ALERT_TARGETS    JSON list of {"url", "format": slack|teams|generic,
+                   "rate_per_sec" (1.0), "burst" (1)}; or
+- ALERT_WEBHOOK_URL + ALERT_FORMAT = "slack" | "teams" | "generic" (default: slack)
 - ALERT_TEXT (fallback text)
 - APP_ENV (for context)
+- ALERT_WINDOW_SEC / ALERT_SPOOL_DIR / ALERT_MAX_RETRIES / ALERT_MAX_LINES (40 per message)
+- ALERT_MAX_ATTEMPTS (dispatch runs a spooled alert survives before it is dropped)
+
+Local stand-in for testing: scripts/webhook_standin.py
 """
 
 import os
 import sys
 import json
-import requests
+import time
+import fcntl
+import random
+import hashlib
+from pathlib import Path
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from instrument import span
+from lazy import lazy_import
+
+# asyncio alone costs ~40 ms to import; spooling an alert needs neither
+asyncio = lazy_import("asyncio")
+requests = lazy_import("requests")
+
+DEFAULT_SPOOL_DIR = "~/.cache/pyfordevops/alerts"
+DEFAULT_WINDOW_SEC = 3.0
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_MAX_LINES = 40
+DEFAULT_MAX_ATTEMPTS = 5
+BACKOFF_BASE_SEC = 0.5
+BACKOFF_MAX_SEC = 30.0
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, at most `burst` saved up."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def hold_off(self, seconds: float) -> None:
+        """Push the next token out by `seconds` (server asked us to back off)."""
+        self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+        self.updated = time.monotonic()
+
+
+def load_targets() -> List[Dict[str, Any]]:
+    raw = os.getenv("ALERT_TARGETS", "").strip()
+    if raw:
+        targets = json.loads(raw)
+    elif os.getenv("ALERT_WEBHOOK_URL"):
+        targets = [{"url": os.getenv("ALERT_WEBHOOK_URL"), "format": os.getenv("ALERT_FORMAT", "slack")}]
+    else:
+        targets = []
+    return [{"url": t["url"], "format": str(t.get("format", "slack")).lower(),
+             "rate_per_sec": float(t.get("rate_per_sec", 1.0)), "burst": int(t.get("burst", 1))}
+            for t in targets if t.get("url")]
+
+
+def target_id(t: Dict[str, Any]) -> str:
+    """Stable name for a target that doesn't reveal its (secret) URL."""
+    return hashlib.sha256(f"{t['format']} {t['url']}".encode("utf-8")).hexdigest()[:16]
+
+
+def open_spool(spool_dir: Path) -> Path:
+    spool_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+    spool_dir.chmod(0o700)
+    return spool_dir
+
+
+def _write_private(path: Path, data: Dict[str, Any]) -> None:
+    tmp = path.with_name(f".{path.name}.tmp")
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def spool_alert(spool_dir: Path, alert: Dict[str, Any], targets: List[Dict[str, Any]]) -> Path:
+    """Spool alert for targets, which are recorded by target_id only."""
+    path = open_spool(spool_dir) / f"{time.time_ns()}-{os.getpid()}.json"
+    _write_private(path, {**alert, "targets": [target_id(t) for t in targets]})
+    return path
+
+
+def read_spool(spool_dir: Path, skip: Set[str] = frozenset()) -> List[Tuple[Path, Dict[str, Any]]]:
+    """Every spooled alert not named in skip, oldest first; unreadable files are removed."""
+    alerts = []
+    for p in sorted(spool_dir.glob("[0-9]*.json")):
+        if p.name in skip:
+            continue
+        try:
+            alerts.append((p, json.loads(p.read_text(encoding="utf-8"))))
+        except ValueError:
+            p.unlink(missing_ok=True)
+        except OSError:
+            pass
+    return alerts
+
 
-def send_slack(url: str, text: str):
-    payload = {"text": text}
-    r = requests.post(url, json=payload, timeout=10)
-    r.raise_for_status()
+def group_by_target(spooled: List[Tuple[Path, Dict[str, Any]]], targets: List[Dict[str, Any]]
+                    ) -> Tuple[List[Tuple[Dict[str, Any], List[Dict[str, Any]]]], List[str]]:
+    """
+    (target, alerts) pairs, each alert going to the targets it was spooled
+    with, and the ids of spooled targets not among `targets`.
+    """
+    known = {target_id(t): t for t in targets}
+    groups: Dict[str, Tuple[Dict[str, Any], List[Dict[str, Any]]]] = {}
+    unknown: List[str] = []
+    for _, alert in spooled:
+        body = {k: v for k, v in alert.items() if k not in ("targets", "attempts")}
+        for tid in alert["targets"]:
+            if tid in known:
+                groups.setdefault(tid, (known[tid], []))[1].append(body)
+            elif tid not in unknown:
+                unknown.append(tid)
+    return list(groups.values()), unknown
+
+
+def settle_spool(spooled: List[Tuple[Path, Dict[str, Any]]], failed: List[str],
+                 max_attempts: int) -> int:
+    """
+    Remove spool files every target accepted; rewrite the rest with only the
+    targets that failed (dropping them after max_attempts). Returns how many
+    alerts were kept for a later run.
+    """
+    kept = 0
+    for path, alert in spooled:
+        retry = [tid for tid in alert["targets"] if tid in failed]
+        attempts = alert.get("attempts", 0) + 1
+        if not retry:
+            path.unlink(missing_ok=True)
+        elif attempts >= max_attempts:
+            print(f"❌ Dropping alert after {attempts} failed dispatches: {alert['text']}", file=sys.stderr)
+            path.unlink(missing_ok=True)
+        else:
+            _write_private(path, {**alert, "targets": retry, "attempts": attempts})
+            kept += 1
+    return kept
+
+
+def digest_lines(alerts: List[Dict[str, Any]]) -> List[str]:
+    """One line per distinct (env, text), with a repeat count."""
+    counts = Counter((a.get("env", "?"), a["text"]) for a in alerts)
+    return [f"[{env}] {text}" + (f" (×{n})" if n > 1 else "") for (env, text), n in counts.items()]
+
+
+def build_payloads(fmt: str, alerts: List[Dict[str, Any]], max_lines: int) -> List[Dict[str, Any]]:
+    """Digest messages for one target; long digests are split into pages of max_lines."""
+    if fmt == "generic":
+        return [{"count": len(alerts), "alerts": alerts[i:i + max_lines]}
+                for i in range(0, len(alerts), max_lines)]
+    if len(alerts) == 1:
+        return [{"text": alerts[0]["text"]}]
+    lines = digest_lines(alerts)
+    pages = [lines[i:i + max_lines] for i in range(0, len(lines), max_lines)]
+    head = f"🚨 {len(alerts)} alerts"
+    return [{"text": "\n".join([head + (f" ({n}/{len(pages)})" if len(pages) > 1 else "")] + [f"• {l}" for l in page])}
+            for n, page in enumerate(pages, 1)]
+
+
+def _retry_after(resp: "requests.Response") -> Optional[float]:
+    try:
+        return max(0.0, float(resp.headers.get("Retry-After", "")))
+    except ValueError:
+        return None
+
+
+async def post_with_retry(session: "requests.Session", bucket: TokenBucket, url: str,
+                          payload: Dict[str, Any], max_retries: int) -> None:
+    for attempt in range(max_retries + 1):
+        await bucket.acquire()
+        wait = None
+        try:
+            r = await asyncio.to_thread(session.post, url, json=payload, timeout=10)
+            if r.status_code < 400:
+                return
+            if r.status_code != 429 and r.status_code < 500:
+                r.raise_for_status()
+            wait = _retry_after(r) if r.status_code == 429 else None
+            error: Exception = requests.HTTPError(f"{r.status_code} from webhook", response=r)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+        if attempt == max_retries:
+            raise error
+        if wait is None:
+            wait = min(BACKOFF_MAX_SEC, BACKOFF_BASE_SEC * 2 ** attempt) * random.uniform(0.5, 1.0)
+        bucket.hold_off(wait)
+
+
+async def dispatch(groups: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]],
+                   max_retries: int = DEFAULT_MAX_RETRIES, max_lines: int = DEFAULT_MAX_LINES) -> List[str]:
+    """Send each target the digest of its alerts, concurrently; returns the target_ids that failed."""
+
+    async def one(t, alerts):
+        with requests.Session() as session:
+            bucket = TokenBucket(t["rate_per_sec"], t["burst"])
+            for payload in build_payloads(t["format"], alerts, max_lines):
+                await post_with_retry(session, bucket, t["url"], payload, max_retries)
+
+    results = await asyncio.gather(*(one(t, alerts) for t, alerts in groups), return_exceptions=True)
+    failed = []
+    for (t, _), res in zip(groups, results):
+        if isinstance(res, Exception):
+            print(f"❌ Failed to send alert ({t['format']}): {res}", file=sys.stderr)
+            failed.append(target_id(t))
+    return failed
+
+
+def _dispatch_locked(spool_dir: Path, targets: List[Dict[str, Any]], window: float,
+                     tried: Set[str]) -> Optional[bool]:
+    lock = open(spool_dir / ".dispatch.lock", "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock.close()
+        return None
+    ok = True
+    try:
+        max_retries = int(os.getenv("ALERT_MAX_RETRIES", DEFAULT_MAX_RETRIES))
+        max_lines = int(os.getenv("ALERT_MAX_LINES", DEFAULT_MAX_LINES))
+        max_attempts = int(os.getenv("ALERT_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS))
+        while True:
+            # Alerts kept after a failed send wait for the next run, not this loop
+            spooled = read_spool(spool_dir, skip=tried)
+            if len(spooled) > 1 and window:
+                time.sleep(window)  # a burst is under way: let the rest of it land
+                spooled = read_spool(spool_dir, skip=tried)
+            if not spooled:
+                return ok
+            tried.update(p.name for p, _ in spooled)
+            for _, alert in spooled:
+                # Alerts spooled before targets were recorded go to this process's targets
+                alert.setdefault("targets", [target_id(t) for t in targets])
+            groups, unknown = group_by_target(spooled, targets)
+            if unknown:
+                print(f"⚠️  {len(unknown)} spooled target(s) are not configured in this process; "
+                      f"kept for a run that has their URL", file=sys.stderr)
+            failed = asyncio.run(dispatch(groups, max_retries, max_lines))
+            kept = settle_spool(spooled, failed + unknown, max_attempts)
+            print(f"{'✅' if not failed else '⚠️ '} Alert digest of {len(spooled)} alert(s) sent to "
+                  f"{len(groups) - len(failed)}/{len(groups)} target(s)"
+                  + (f"; {kept} kept for retry" if kept else ""))
+            # Only our own failed sends fail this run; unknown targets are not ours to send
+            ok = ok and not failed
+            window = 0  # anything spooled while we were sending goes out right away
+    finally:
+        lock.close()
+
+
+def run_dispatcher(spool_dir: Path, targets: List[Dict[str, Any]], window: float) -> Optional[bool]:
+    """Drain and send until the spool stays empty; None if another process is dispatching."""
+    tried: Set[str] = set()
+    result = _dispatch_locked(spool_dir, targets, window, tried)
+    # A process that spooled while we held the lock gave up on it; pick its alert up
+    while result is not None and read_spool(spool_dir, skip=tried):
+        again = _dispatch_locked(spool_dir, targets, 0, tried)
+        if again is None:
+            break
+        result = result and again
+    return result
 
-def send_teams(url: str, text: str):
-    # Teams expects a card or simple text in "text" field
-    payload = {"text": text}
-    r = requests.post(url, json=payload, timeout=10)
-    r.raise_for_status()
 
 def main():
-    url = os.getenv("ALERT_WEBHOOK_URL")
-    fmt = os.getenv("ALERT_FORMAT", "slack").lower()
     env = os.getenv("APP_ENV", "dev")
     text = os.getenv("ALERT_TEXT", f"🚨 PyForDevOps: pipeline failed for env={env}")
+    targets = load_targets()
 
-    if not url:
+    if not targets:
         print("ALERT_WEBHOOK_URL is not set; skipping notification.")
         return
 
-    try:
-        if fmt == "teams":
-            send_teams(url, text)
-        else:
-            send_slack(url, text)
-        print("✅ Alert sent")
-    except Exception as e:
-        print(f"❌ Failed to send alert: {e}", file=sys.stderr)
+    spool_dir = Path(os.getenv("ALERT_SPOOL_DIR", DEFAULT_SPOOL_DIR)).expanduser()
+    spool_alert(spool_dir, {"env": env, "text": text, "ts": time.time()}, targets)
+    ok = run_dispatcher(spool_dir, targets, float(os.getenv("ALERT_WINDOW_SEC", DEFAULT_WINDOW_SEC)))
+    if ok is None:
+        print("✅ Alert queued for the running dispatcher")
+        return
+    if not ok:
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
+    with span("notify"):
+        main()
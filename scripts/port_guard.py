@@ -1,22 +1,125 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+"""
+Check many TCP ports across hosts concurrently before deploy.
+
+Targets come from `port_checks` in configs/env.yaml. Each entry expands to
+every host × port combination:
+  - port: 8080            # or ports: [8080, 8081]
+    host: 127.0.0.1       # or hosts: [...]; default 127.0.0.1
+    expect: free          # free → must not be in use; open → must accept connections
+Without `port_checks`, `app_port` on 127.0.0.1 must be free (the old behavior).
+
+Every target is probed at once with asyncio, each connect bounded by
+`port_check_timeout_sec` (default 1.0), and classified as:
+  open      connection accepted (port in use)
+  refused   actively refused (nothing listening)
+  filtered  no answer within the timeout, or host/network unreachable
+For busy local ports the owning PID/process is looked up via
+psutil.net_connections when permitted.
+
+Exit codes:
+  0 → every target matches its expectation
+  1 → at least one does not
+"""
 
-import socket
 import sys
+import asyncio
+from typing import Any, Dict, List
+
 from read_config import get_env_config
+from instrument import span
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_TIMEOUT = 1.0
+MAX_IN_FLIGHT = 256
+LOCAL_HOSTS = {"127.0.0.1", "localhost", "0.0.0.0", "::1", "::"}
+
+
+def port_targets(cfg: Dict[str, Any]) -> List[Dict[str, Any]]:
+    entries = cfg.get("port_checks") or [{"port": int(cfg.get("app_port", 8080)), "expect": "free"}]
+    targets = []
+    for e in entries:
+        hosts = e.get("hosts") or [e.get("host", DEFAULT_HOST)]
+        ports = e.get("ports") or [e["port"]]
+        for host in hosts:
+            for port in ports:
+                targets.append({"host": str(host), "port": int(port), "expect": e.get("expect", "free")})
+    return targets
+
+
+async def probe(host: str, port: int, timeout: float) -> str:
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except ConnectionRefusedError:
+        return "refused"
+    except (asyncio.TimeoutError, OSError):
+        return "filtered"
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return "open"
+
+
+async def probe_all(targets: List[Dict[str, Any]], timeout: float) -> List[Dict[str, Any]]:
+    limit = asyncio.Semaphore(MAX_IN_FLIGHT)
+
+    async def one(t):
+        async with limit:
+            state = await probe(t["host"], t["port"], timeout)
+        ok = state == "open" if t["expect"] == "open" else state == "refused"
+        return {**t, "state": state, "ok": ok}
+
+    return await asyncio.gather(*(one(t) for t in targets))
+
+
+def port_owners(ports) -> Dict[int, Dict[str, Any]]:
+    """port → {'pid', 'name'} for local listening sockets (best effort)."""
+    try:
+        import psutil
+        conns = psutil.net_connections(kind="tcp")
+    except Exception:
+        return {}
+    owners = {}
+    for c in conns:
+        if c.status == "LISTEN" and c.laddr and c.laddr.port in ports and c.pid:
+            try:
+                name = psutil.Process(c.pid).name()
+            except Exception:
+                name = None
+            owners[c.laddr.port] = {"pid": c.pid, "name": name}
+    return owners
+
 
 def main():
     cfg = get_env_config()
-    port = int(cfg.get("app_port", 8080))
+    targets = port_targets(cfg)
+    timeout = float(cfg.get("port_check_timeout_sec", DEFAULT_TIMEOUT))
+
+    results = asyncio.run(probe_all(targets, timeout))
 
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    result = sock.connect_ex(("127.0.0.1", port))
+    busy_local = {r["port"] for r in results
+                  if r["state"] == "open" and r["expect"] == "free" and r["host"] in LOCAL_HOSTS}
+    owners = port_owners(busy_local) if busy_local else {}
 
-    if result == 0:
-        print(f"❌ Port {port} is already in use")
+    failed = 0
+    for r in results:
+        where = f"{r['host']}:{r['port']}"
+        if r["ok"]:
+            print(f"✅ {where} {'is free' if r['expect'] == 'free' else 'is accepting connections'}")
+            continue
+        failed += 1
+        if r["expect"] == "free" and r["state"] == "open":
+            owner = owners.get(r["port"]) if r["host"] in LOCAL_HOSTS else None
+            who = f" (pid {owner['pid']}, {owner['name']})" if owner else ""
+            print(f"❌ Port {where} is already in use{who}")
+        else:
+            print(f"❌ {where} expected {r['expect']} but is {r['state']}")
+    if failed:
         sys.exit(1)
-    else:
-        print(f"✅ Port {port} is free")
 
 if __name__ == "__main__":
-    main()
+    with span("port_guard"):
+        main()
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Resident precheck agent: keeps the gates warm and serves cached verdicts.
+
+Instead of CI launching the gates from scratch on every run, the agent runs on
+the host, imports every gate from prechecks.GATES once and re-evaluates each
+one on its own schedule:
+  - every `precheck_agent_intervals[<gate>]` seconds (DEFAULT_INTERVALS), and
+  - as soon as something it depends on changes, checked every POLL_SEC:
+      all gates   the config file (CONFIG_PATH) mtime/size
+      port        the set of listening TCP ports (/proc/net/tcp, tcp6)
+      service     the set of running PIDs (/proc)
+    Change-triggered runs are spaced at least PRECHECK_AGENT_MIN_GAP seconds
+    (default 2) apart so a busy process table can't keep a gate spinning.
+The latest verdict of each gate is served as JSON over HTTP on a UNIX socket
+(PRECHECK_AGENT_SOCKET, default logs/precheck_agent.sock) and, if
+PRECHECK_AGENT_HTTP is set (e.g. 127.0.0.1:8787), on TCP too:
+    GET  /verdicts[?gates=disk,port]   → {"env", "config", "agent_pid", "gates": {name: verdict}}
+    POST /refresh[?gates=...]          → re-run now (asynchronously)
+    GET  /healthz
+A verdict is the prechecks result dict plus checked_at (epoch s) and trigger
+(startup | interval | change | refresh).
+
+prechecks.py uses the agent when PRECHECK_AGENT is set to its socket path or
+http://host:port: fresh passing verdicts are taken as is, anything missing,
+older than PRECHECK_AGENT_MAX_AGE seconds (default 120) or failing is run
+locally. If the agent is down, prechecks runs every gate itself.
+
+The agent serves one APP_ENV (its own). Per-run spans are off unless
+PRECHECK_AGENT_TRACE=1, so a long-lived agent doesn't grow the trace file.
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import signal
+import threading
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+from socketserver import ThreadingUnixStreamServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from read_config import DEFAULT_CONFIG_PATH, get_env_config
+from instrument import span
+from prechecks import _ThreadRouter, load_check, run_check, selected_gates
+
+DEFAULT_SOCKET = "logs/precheck_agent.sock"
+DEFAULT_MAX_AGE = 120.0
+DEFAULT_MIN_GAP = 2.0
+POLL_SEC = 1.0
+
+DEFAULT_INTERVALS = {
+    "disk": 60,
+    "read_config": 300,
+    "config_validate": 300,
+    "port": 15,
+    "service": 15,
+}
+
+
+def config_path() -> str:
+    return os.getenv("CONFIG_PATH", DEFAULT_CONFIG_PATH)
+
+
+def config_stamp() -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(config_path())
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def listening_ports() -> Optional[frozenset]:
+    """Local ports in LISTEN state, from /proc/net (None where unavailable)."""
+    ports = set()
+    found = False
+    for table in ("/proc/net/tcp", "/proc/net/tcp6"):
+        try:
+            with open(table, encoding="ascii") as f:
+                next(f, None)
+                for line in f:
+                    fields = line.split()
+                    if len(fields) > 3 and fields[3] == "0A":
+                        ports.add(int(fields[1].rsplit(":", 1)[1], 16))
+            found = True
+        except OSError:
+            continue
+    return frozenset(ports) if found else None
+
+
+def running_pids() -> Optional[frozenset]:
+    try:
+        return frozenset(name for name in os.listdir("/proc") if name.isdigit())
+    except OSError:
+        return None
+
+
+# Extra change probes per gate (the config file is watched for every gate)
+PROBES: Dict[str, List[Callable[[], Any]]] = {
+    "port": [listening_ports],
+    "service": [running_pids],
+}
+
+
+class GateRunner:
+    """Owns one gate: its schedule, its change probes and its latest verdict."""
+
+    def __init__(self, name: str, module: str, interval: float, min_gap: float, routers):
+        self.name, self.module = name, module
+        self.interval, self.min_gap = interval, min_gap
+        self.routers = routers
+        self.probes = [config_stamp] + PROBES.get(name, [])
+        self.verdict: Optional[Dict[str, Any]] = None
+        self.wake = threading.Event()
+        self._seen: List[Any] = []
+        self._check = None
+
+    def changed(self) -> bool:
+        return [p() for p in self.probes] != self._seen
+
+    def run(self, trigger: str) -> None:
+        self._seen = [p() for p in self.probes]
+        result: Dict[str, Any] = {"gate": self.name, "module": self.module}
+        try:
+            if self._check is None:
+                self._check = load_check(self.module)
+            run_check(self.name, self._check, result, self.routers)
+        except Exception as e:
+            result.update(status="fail", exit_code=1, elapsed_sec=0.0,
+                          output=f"❌ Could not load gate '{self.name}': {type(e).__name__}: {e}\n")
+        result.update(checked_at=round(time.time(), 3), trigger=trigger)
+        self.verdict = result
+
+    def loop(self, stop: threading.Event) -> None:
+        self.run("startup")
+        last = time.monotonic()
+        while not stop.is_set():
+            refresh = self.wake.wait(POLL_SEC)
+            if stop.is_set():
+                return
+            self.wake.clear()
+            since = time.monotonic() - last
+            if refresh:
+                trigger = "refresh"
+            elif since >= self.interval:
+                trigger = "interval"
+            elif since >= self.min_gap and self.changed():
+                trigger = "change"
+            else:
+                continue
+            self.run(trigger)
+            last = time.monotonic()
+
+
+class Agent:
+    def __init__(self, runners: Dict[str, GateRunner]):
+        self.runners = runners
+        self.env = os.getenv("APP_ENV", "dev")
+        self.started_at = time.time()
+
+    def state(self, gates: Optional[List[str]] = None) -> Dict[str, Any]:
+        names = gates or list(self.runners)
+        return {
+            "env": self.env, "config": os.path.abspath(config_path()), "agent_pid": os.getpid(),
+            "started_at": round(self.started_at, 3),
+            "gates": {n: self.runners[n].verdict for n in names if n in self.runners and self.runners[n].verdict},
+        }
+
+    def refresh(self, gates: Optional[List[str]] = None) -> List[str]:
+        names = [n for n in (gates or list(self.runners)) if n in self.runners]
+        for n in names:
+            self.runners[n].wake.set()
+        return names
+
+
+def _handler(agent: Agent):
+    from http.server import BaseHTTPRequestHandler
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _gates(self) -> Optional[List[str]]:
+            raw = parse_qs(urlparse(self.path).query).get("gates")
+            return [g for g in raw[0].split(",") if g] if raw else None
+
+        def _send(self, code: int, body: Dict[str, Any]) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == "/verdicts":
+                self._send(200, agent.state(self._gates()))
+            elif path == "/healthz":
+                self._send(200, {"ok": True, "env": agent.env})
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if urlparse(self.path).path == "/refresh":
+                self._send(202, {"refreshing": agent.refresh(self._gates())})
+            else:
+                self._send(404, {"error": "not found"})
+
+        def address_string(self) -> str:
+            # UNIX-socket peers have no (host, port)
+            return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return Handler
+
+
+class _UnixHTTPServer(ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def _request(address: str, method: str, path: str, timeout: float) -> Tuple[int, bytes]:
+    """One HTTP/1.0 request over a plain socket (http.client alone costs ~20 ms to import)."""
+    if address.startswith("http://"):
+        u = urlparse(address)
+        sock = socket.create_connection((u.hostname, u.port or 80), timeout=timeout)
+    else:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(address)
+    try:
+        sock.sendall(f"{method} {path} HTTP/1.0\r\nHost: precheck-agent\r\nContent-Length: 0\r\n\r\n".encode("ascii"))
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    finally:
+        sock.close()
+    head, _, body = b"".join(chunks).partition(b"\r\n\r\n")
+    status = head.split(b" ", 2)
+    if len(status) < 2 or not status[1].isdigit():
+        raise OSError("malformed response from precheck agent")
+    return int(status[1]), body
+
+
+def query(address: str, gates: Optional[List[str]] = None, timeout: float = 2.0) -> Dict[str, Any]:
+    """Latest verdicts from the agent at `address` (socket path or http://host:port)."""
+    status, body = _request(address, "GET", "/verdicts" + (f"?gates={','.join(gates)}" if gates else ""), timeout)
+    if status != 200:
+        raise OSError(f"agent answered HTTP {status}")
+    return json.loads(body)
+
+
+def refresh(address: str, gates: Optional[List[str]] = None, timeout: float = 2.0) -> List[str]:
+    """Ask the agent to re-run `gates` (default: all) now; returns the gates it will re-run."""
+    status, body = _request(address, "POST", "/refresh" + (f"?gates={','.join(gates)}" if gates else ""), timeout)
+    if status != 202:
+        raise OSError(f"agent answered HTTP {status}")
+    return json.loads(body)["refreshing"]
+
+
+def cached_results(address: str, gates: List[Tuple[str, str]], max_age: float) -> Dict[str, Dict[str, Any]]:
+    """
+    Fresh passing verdicts for `gates`, keyed by gate name, each with its age
+    in age_sec. Gates left out should be run locally. Raises OSError when the
+    agent can't be reached or serves another env/config.
+    """
+    state = query(address, [name for name, _ in gates])
+    env = os.getenv("APP_ENV", "dev")
+    if state.get("env") != env or state.get("config") != os.path.abspath(config_path()):
+        raise OSError(f"agent serves env={state.get('env')} ({state.get('config')}), not {env}")
+    now = time.time()
+    fresh = {}
+    for name, verdict in (state.get("gates") or {}).items():
+        age = now - verdict.get("checked_at", 0)
+        if verdict.get("status") == "pass" and age <= max_age:
+            fresh[name] = dict(verdict, age_sec=round(age, 1))
+    return fresh
+
+
+def _remove_stale_socket(path: Path) -> None:
+    if not path.exists():
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(str(path))
+    except OSError:
+        path.unlink()
+        return
+    finally:
+        probe.close()
+    print(f"❌ Another agent is already listening on {path}")
+    sys.exit(1)
+
+
+def main():
+    if os.getenv("PRECHECK_AGENT_TRACE") != "1":
+        os.environ["TRACE"] = "0"
+    cfg = get_env_config()
+    intervals = dict(DEFAULT_INTERVALS, **(cfg.get("precheck_agent_intervals") or {}))
+    min_gap = float(os.getenv("PRECHECK_AGENT_MIN_GAP", DEFAULT_MIN_GAP))
+
+    # Gate output is captured per thread for the whole life of the agent
+    routers = (_ThreadRouter(sys.stdout), _ThreadRouter(sys.stderr))
+    sys.stdout, sys.stderr = routers
+    runners = {name: GateRunner(name, module, float(intervals.get(name, 60)), min_gap, routers)
+               for name, module in selected_gates()}
+    agent = Agent(runners)
+    stop = threading.Event()
+
+    sock_path = Path(os.getenv("PRECHECK_AGENT_SOCKET", DEFAULT_SOCKET))
+    sock_path.parent.mkdir(parents=True, exist_ok=True)
+    _remove_stale_socket(sock_path)
+    servers = [_UnixHTTPServer(str(sock_path), _handler(agent))]
+    os.chmod(sock_path, 0o660)
+    http_addr = os.getenv("PRECHECK_AGENT_HTTP")
+    if http_addr:
+        from http.server import ThreadingHTTPServer
+        host, _, port = http_addr.rpartition(":")
+        servers.append(ThreadingHTTPServer((host or "127.0.0.1", int(port)), _handler(agent)))
+
+    def shutdown(signum, frame):
+        stop.set()
+        for r in runners.values():
+            r.wake.set()
+        for s in servers:
+            threading.Thread(target=s.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    for r in runners.values():
+        threading.Thread(target=r.loop, args=(stop,), name=f"precheck-{r.name}", daemon=True).start()
+    for s in servers[1:]:
+        threading.Thread(target=s.serve_forever, daemon=True).start()
+
+    where = f"{sock_path}" + (f" and http://{http_addr}" if http_addr else "")
+    print(f"🛰️  Precheck agent (env={agent.env}) serving {len(runners)} gate(s) on {where}")
+    try:
+        servers[0].serve_forever()
+    finally:
+        for s in servers:
+            s.server_close()
+        sock_path.unlink(missing_ok=True)
+        print("👋 Precheck agent stopped")
+
+
+if __name__ == "__main__":
+    with span("precheck_agent"):
+        main()
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Run all pre-deployment gates in a single interpreter.
+
+Each gate script exposes a main() that prints its verdict and calls
+sys.exit() on failure. Instead of launching one `python` process per gate,
+this runner imports every gate's main() and runs them concurrently on a
+bounded pool of worker threads, so interpreter startup, the yaml import and
+(through read_config's cache) the config parse are paid once, not per gate.
+
+Output of each gate (including from threads the gate starts) is captured
+and printed as one block when the gate finishes, followed by a timing
+summary. The summary is also written to
+logs/prechecks_summary.json so CI can upload it with the other logs.
+
+Environment variables:
+- PRECHECKS         comma-separated gate names to run (default: all)
+- PRECHECK_TIMEOUT  per-gate timeout in seconds, counted from when the gate
+                    starts running (default: 30). A gate that overruns it is
+                    reported as timed out and abandoned: Python can't kill a
+                    thread, so it keeps running, and keeps its worker slot,
+                    until it returns or the process exits.
+- PRECHECK_WORKERS  max gates running at once, abandoned ones included
+                    (default: number of gates)
+- PRECHECK_AGENT    socket path or http://host:port of a running
+                    precheck_agent.py; its fresh passing verdicts are used
+                    instead of running those gates (see precheck_agent.py)
+- PRECHECK_AGENT_MAX_AGE  oldest cached verdict accepted, seconds (default: 120)
+
+Exit codes:
+  0 → all gates passed
+  1 → at least one gate failed, crashed or timed out
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import weakref
+import threading
+import importlib
+from pathlib import Path
+from datetime import datetime
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from instrument import span
+from lazy import load_pending
+
+# (gate name, module exposing main())
+GATES: List[Tuple[str, str]] = [
+    ("disk", "disk_check"),
+    ("read_config", "read_config"),
+    ("config_validate", "config_validate"),
+    ("port", "port_guard"),
+    ("service", "service_check"),
+]
+
+DEFAULT_TIMEOUT = 30.0
+SUMMARY_PATH = Path("logs/prechecks_summary.json")
+
+
+class _ThreadRouter(io.TextIOBase):
+    """
+    Stand-in for sys.stdout/sys.stderr that sends writes from a gate's worker
+    thread, and from threads that gate starts, into that gate's buffer and
+    everything else to the real stream.
+    """
+
+    _live: "weakref.WeakSet[_ThreadRouter]" = weakref.WeakSet()
+
+    def __init__(self, fallback):
+        self._fallback = fallback
+        self._local = threading.local()
+        _install_thread_hook()
+        self._live.add(self)
+
+    def bind(self, buf: io.StringIO) -> None:
+        self._local.buf = buf
+
+    def unbind(self) -> None:
+        self._local.buf = None
+
+    def current(self) -> Optional[io.StringIO]:
+        """Buffer of the gate this thread runs, or was started by; None outside gates."""
+        buf = getattr(self._local, "buf", None)
+        if buf is None:
+            buf = getattr(threading.current_thread(), "_gate_output", {}).get(self)
+        return buf
+
+    def write(self, s: str) -> int:
+        return (self.current() or self._fallback).write(s)
+
+    def flush(self) -> None:
+        self._fallback.flush()
+
+
+_thread_init = threading.Thread.__init__
+
+
+def _thread_init_inheriting_output(self, *args, **kwargs):
+    # Runs on the creating thread: a thread started by a gate writes to that gate's buffer
+    _thread_init(self, *args, **kwargs)
+    bound = {r: buf for r in list(_ThreadRouter._live) if (buf := r.current()) is not None}
+    if bound:
+        self._gate_output = bound
+
+
+def _install_thread_hook() -> None:
+    threading.Thread.__init__ = _thread_init_inheriting_output
+
+
+def _exit_code(e: SystemExit) -> int:
+    if e.code is None:
+        return 0
+    if isinstance(e.code, int):
+        return e.code
+    # sys.exit("message") → message goes to stderr, exit status 1
+    print(e.code, file=sys.stderr)
+    return 1
+
+
+def load_check(module_name: str) -> Callable[[], None]:
+    return importlib.import_module(module_name).main
+
+
+def run_check(name: str, check: Callable[[], None], result: Dict[str, Any],
+              routers: Tuple[_ThreadRouter, ...]) -> None:
+    buf = io.StringIO()
+    for r in routers:
+        r.bind(buf)
+    start = time.perf_counter()
+    try:
+        with span(f"gate:{name}", thread=True):
+            check()
+        code = 0
+    except SystemExit as e:
+        code = _exit_code(e)
+    except Exception as e:
+        print(f"❌ Gate '{name}' crashed: {type(e).__name__}: {e}")
+        code = 1
+    finally:
+        result["elapsed_sec"] = round(time.perf_counter() - start, 4)
+        for r in routers:
+            r.unbind()
+    result["exit_code"] = code
+    result["status"] = "pass" if code == 0 else "fail"
+    result["output"] = buf.getvalue()
+
+
+def selected_gates() -> List[Tuple[str, str]]:
+    wanted = os.getenv("PRECHECKS")
+    if not wanted:
+        return GATES
+    names = [n.strip() for n in wanted.split(",") if n.strip()]
+    known = dict(GATES)
+    unknown = [n for n in names if n not in known]
+    if unknown:
+        print(f"❌ Unknown gates in PRECHECKS: {unknown}. Available: {list(known)}")
+        sys.exit(1)
+    return [(n, known[n]) for n in names]
+
+
+def run_all(gates: List[Tuple[str, str]], timeout: float, workers: int) -> List[Dict[str, Any]]:
+    """
+    Run the given gates concurrently and return one result dict per gate,
+    in the order given. At most `workers` gates run at once, and each gets
+    `timeout` seconds from the moment it starts, so time spent queued
+    doesn't count. Gates that exceed it are reported as 'timeout'; their
+    (daemon) threads are abandoned, not killed, and hold their slot until
+    they return. Once every slot is held that way, gates still queued are
+    reported as 'timeout' without being started.
+    """
+    # Import up front, on the main thread: module import is serialized anyway
+    # and an import error should be reported against the gate, not hang it.
+    results: List[Dict[str, Any]] = []
+    checks: List[Tuple[str, Callable[[], None], Dict[str, Any]]] = []
+    for name, module_name in gates:
+        result: Dict[str, Any] = {"gate": name, "module": module_name}
+        results.append(result)
+        try:
+            checks.append((name, load_check(module_name), result))
+        except Exception as e:
+            result.update(status="fail", exit_code=1, elapsed_sec=0.0,
+                          output=f"❌ Could not load gate '{name}': {type(e).__name__}: {e}\n")
+
+    load_pending()  # gates share lazily imported modules (yaml, ...) across threads
+    routers = (_ThreadRouter(sys.stdout), _ThreadRouter(sys.stderr))
+    real_stdout, real_stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = routers
+    workers = max(1, workers)
+    slots = threading.Semaphore(workers)
+    changed = threading.Condition()  # a gate started or finished
+    states = []
+    abandoned = 0  # slots held by gates that timed out and are still running
+
+    def worker(name, check, result, state):
+        nonlocal abandoned
+        slots.acquire()
+        with changed:
+            if state["done"]:  # given up on while queued
+                slots.release()
+                return
+            state["start"] = time.monotonic()
+            changed.notify_all()
+        try:
+            run_check(name, check, result, routers)
+        finally:
+            with changed:
+                if state["done"]:
+                    abandoned -= 1
+                state["done"] = True
+                slots.release()
+                changed.notify_all()
+
+    def give_up(state, output, elapsed):
+        result = state["result"]
+        # Swap in a fresh dict so a late-finishing gate can't overwrite the verdict
+        results[results.index(result)] = {
+            "gate": result["gate"], "module": result["module"],
+            "status": "timeout", "exit_code": None, "elapsed_sec": elapsed, "output": output,
+        }
+        state["done"] = True
+
+    try:
+        for name, check, result in checks:
+            state = {"result": result, "start": None, "done": False}
+            threading.Thread(target=worker, args=(name, check, result, state),
+                             name=f"precheck-{name}", daemon=True).start()
+            states.append(state)
+
+        with changed:
+            pending = states
+            while pending:
+                now = time.monotonic()
+                for state in pending:
+                    if state["done"] or state["start"] is None or now < state["start"] + timeout:
+                        continue
+                    give_up(state, f"❌ Gate '{state['result']['gate']}' timed out after {timeout:g}s\n", timeout)
+                    abandoned += 1
+                if abandoned >= workers:  # no slot frees up until a hung gate returns
+                    for state in pending:
+                        if not state["done"] and state["start"] is None:
+                            give_up(state, f"❌ Gate '{state['result']['gate']}' not started: all {workers} "
+                                           f"worker(s) held by timed-out gates\n", 0.0)
+                pending = [st for st in pending if not st["done"]]
+                deadlines = [st["start"] + timeout for st in pending if st["start"] is not None]
+                if pending:
+                    changed.wait(max(0.0, min(deadlines) - now) if deadlines else None)
+    finally:
+        sys.stdout, sys.stderr = real_stdout, real_stderr
+
+    return results
+
+
+def print_summary(results: List[Dict[str, Any]], wall: float) -> None:
+    for r in results:
+        print(f"\n=== {r['gate']} ({r['module']}.py) ===")
+        print(r.get("output", "").rstrip() or "(no output)")
+
+    print("\n=== Precheck summary ===")
+    icons = {"pass": "✅", "fail": "❌", "timeout": "⏱️ "}
+    for r in results:
+        cached = f"  (agent, {r['age_sec']:.0f}s old)" if "age_sec" in r else ""
+        print(f"{icons.get(r['status'], '?')} {r['gate']:<16} {r['status']:<8} {r['elapsed_sec']:.3f}s{cached}")
+    print(f"Total wall time: {wall:.3f}s")
+
+
+def write_summary(results: List[Dict[str, Any]], wall: float, path: Path = SUMMARY_PATH) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    summary = {
+        "env": os.getenv("APP_ENV", "dev"),
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "wall_sec": round(wall, 4),
+        "passed": all(r["status"] == "pass" for r in results),
+        "gates": [{k: v for k, v in r.items() if k != "output"} for r in results],
+    }
+    path.write_text(json.dumps(summary, indent=2), encoding="utf-8")
+
+
+def main() -> None:
+    gates = selected_gates()
+    timeout = float(os.getenv("PRECHECK_TIMEOUT", DEFAULT_TIMEOUT))
+    workers = int(os.getenv("PRECHECK_WORKERS", len(gates)))
+
+    start = time.perf_counter()
+    cached: Dict[str, Dict[str, Any]] = {}
+    agent = os.getenv("PRECHECK_AGENT")
+    if agent:
+        from precheck_agent import DEFAULT_MAX_AGE, cached_results
+        try:
+            cached = cached_results(agent, gates, float(os.getenv("PRECHECK_AGENT_MAX_AGE", DEFAULT_MAX_AGE)))
+            print(f"🛰️  {len(cached)}/{len(gates)} gate verdict(s) from precheck agent")
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Precheck agent unavailable ({e}); running all gates here")
+    local = iter(run_all([g for g in gates if g[0] not in cached], timeout, workers))
+    results = [cached[name] if name in cached else next(local) for name, _ in gates]
+    wall = time.perf_counter() - start
+
+    print_summary(results, wall)
+    write_summary(results, wall)
+
+    failed = [r["gate"] for r in results if r["status"] != "pass"]
+    if failed:
+        print(f"\n❌ Prechecks failed: {failed}")
+        sys.exit(1)
+    print("\n✅ All prechecks passed")
+
+
+if __name__ == "__main__":
+    with span("prechecks"):
+        main()
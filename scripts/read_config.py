@@ -7,28 +7,116 @@ Usage from other scripts:
     from read_config import get_env_config
     cfg = get_env_config()          # uses APP_ENV or 'dev'
     port = cfg["app_port"]
+
+Parsed configs are cached:
+- in-process, keyed on (absolute path, mtime, size), so repeated calls from the
+  same interpreter (e.g. scripts/prechecks.py) parse the YAML once;
+- on disk, as a pickled snapshot next to the YAML (configs/.env.yaml.cache),
+  so a fresh interpreter skips the YAML parser when the file hasn't changed
+  (PyYAML itself is only imported when a parse is needed).
+Editing the YAML changes its mtime/size and invalidates both. Each call returns
+its own deep copy, so callers may modify what they get.
+Set CONFIG_CACHE=0 to always parse from YAML and never write the snapshot.
 """
 
 import os
 import sys
-import yaml
-from typing import Dict, Any
+import copy
+import pickle
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+from instrument import span
+from lazy import lazy_import
+
+yaml = lazy_import("yaml")
 
 DEFAULT_ENV = "dev"
 DEFAULT_CONFIG_PATH = "configs/env.yaml"
 
-def _load_config(config_path: str) -> Dict[str, Any]:
-    if not os.path.exists(config_path):
-        print(f"❌ Config not found: {config_path}", file=sys.stderr)
-        sys.exit(2)
+_SNAPSHOT_FORMAT = 1
+_cache: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+_cache_lock = threading.Lock()
+
+
+def _cache_enabled() -> bool:
+    return os.getenv("CONFIG_CACHE", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def snapshot_path(config_path: str) -> str:
+    head, tail = os.path.split(config_path)
+    return os.path.join(head, f".{tail}.cache")
+
+
+def _read_snapshot(config_path: str, key: Tuple[int, int]) -> Optional[Dict[str, Any]]:
+    # The snapshot lives next to the config and is only ever written by this
+    # module, so it is trusted to the same degree as the YAML itself.
+    try:
+        with open(snapshot_path(config_path), "rb") as f:
+            snap = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        return None
+    if not isinstance(snap, dict) or snap.get("format") != _SNAPSHOT_FORMAT or snap.get("key") != key:
+        return None
+    return snap.get("data")
+
+
+def _write_snapshot(config_path: str, key: Tuple[int, int], data: Dict[str, Any]) -> None:
+    path = snapshot_path(config_path)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            pickle.dump({"format": _SNAPSHOT_FORMAT, "key": key, "data": data}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError:
+        # Read-only checkout or similar: caching is best-effort
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+
+def _parse_yaml(config_path: str) -> Dict[str, Any]:
     with open(config_path, "r", encoding="utf-8") as f:
         try:
-            return yaml.safe_load(f) or {}
+            # libyaml-backed loader is several times faster; pure-Python fallback otherwise
+            return yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader)) or {}
         except yaml.YAMLError as ye:
             print("❌ YAML parse error:", file=sys.stderr)
             print(ye, file=sys.stderr)
             sys.exit(3)
 
+
+def _load_config(config_path: str) -> Dict[str, Any]:
+    try:
+        st = os.stat(config_path)
+    except FileNotFoundError:
+        print(f"❌ Config not found: {config_path}", file=sys.stderr)
+        sys.exit(2)
+    if not _cache_enabled():
+        return _parse_yaml(config_path)
+
+    abs_path = os.path.abspath(config_path)
+    key = (st.st_mtime_ns, st.st_size)
+    with _cache_lock:
+        hit = _cache.get(abs_path)
+        if hit and hit[0] == key:
+            return hit[1]
+
+        data = _read_snapshot(config_path, key)
+        if data is None:
+            data = _parse_yaml(config_path)
+            _write_snapshot(config_path, key, data)
+        _cache[abs_path] = (key, data)
+        return data
+
+
+def clear_cache() -> None:
+    """Drop the in-process cache (the on-disk snapshot is left alone)."""
+    with _cache_lock:
+        _cache.clear()
+
 def get_env_config(env: str | None = None, config_path: str | None = None) -> Dict[str, Any]:
     env = env or os.getenv("APP_ENV", DEFAULT_ENV)
     cfg_path = config_path or os.getenv("CONFIG_PATH", DEFAULT_CONFIG_PATH)
@@ -36,11 +124,21 @@ def get_env_config(env: str | None = None, config_path: str | None = None) -> Di
     if env not in all_cfg:
         print(f"❌ Environment '{env}' not found in {cfg_path}. Available: {list(all_cfg.keys())}", file=sys.stderr)
         sys.exit(4)
-    return all_cfg[env]
+    # Deep copy: the cached tree is shared by every caller in the process, and
+    # a caller editing a nested list or dict must not change it for the others
+    return copy.deepcopy(all_cfg[env])
 
-if __name__ == "__main__":
+def list_envs(config_path: str | None = None) -> List[str]:
+    """Names of all environments defined in the config file."""
+    return list(_load_config(config_path or os.getenv("CONFIG_PATH", DEFAULT_CONFIG_PATH)).keys())
+
+def main():
     # Debug print
     env = os.getenv("APP_ENV", DEFAULT_ENV)
     current = get_env_config(env)
     print(f"Active env: {env}")
     print(current)
+
+if __name__ == "__main__":
+    with span("read_config"):
+        main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Retained model releases and atomic switching between them.
+
+The history lives next to the version file (artifacts/.model_history.json
+beside artifacts/.model_version):
+  releases   last `keep` activated versions, oldest first:
+             {"version", "path", "digest", "activated_at"}
+  current    version the current-model symlink points at
+  rejected   versions rolled back from; model_refresh won't re-activate them
+             until they are switched to explicitly
+
+Every switch is constant time and never leaves the pointer missing: the
+symlink is replaced by renaming a freshly made link over it, and the version
+file by renaming a temp file over it (os.replace is atomic on POSIX). The
+artifacts themselves stay in model_local_dir, pinned against model_store
+retention, so rolling back never downloads anything.
+"""
+
+import os
+import json
+from pathlib import Path
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+HISTORY_NAME = ".model_history.json"
+DEFAULT_KEEP = 5
+
+
+def atomic_symlink(target: Path, link: Path) -> None:
+    """Point `link` at the absolute path of `target`, replacing any existing link in one rename."""
+    tmp = link.with_name(f".{link.name}.{os.getpid()}.tmp")
+    tmp.unlink(missing_ok=True)
+    tmp.symlink_to(target.resolve())
+    os.replace(tmp, link)
+
+
+def atomic_write_text(path: Path, text: str) -> None:
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+class ReleaseHistory:
+    def __init__(self, path: Path, keep: int = DEFAULT_KEEP):
+        self.path = Path(path)
+        self.keep = max(2, keep)  # current + one to roll back to
+        self.data = self._load()
+
+    @classmethod
+    def beside(cls, version_file: Path, keep: int = DEFAULT_KEEP) -> "ReleaseHistory":
+        return cls(Path(version_file).with_name(HISTORY_NAME), keep)
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            data = {}
+        data.setdefault("releases", [])
+        data.setdefault("current", None)
+        data.setdefault("rejected", [])
+        return data
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_text(self.path, json.dumps(self.data, indent=2))
+
+    @property
+    def current(self) -> Optional[str]:
+        return self.data["current"]
+
+    def get(self, version: str) -> Optional[Dict[str, Any]]:
+        return next((r for r in self.data["releases"] if r["version"] == version), None)
+
+    def versions(self) -> List[str]:
+        return [r["version"] for r in self.data["releases"]]
+
+    def is_rejected(self, version: str) -> bool:
+        return version in self.data["rejected"]
+
+    def record(self, version: str, path: Path, digest: Optional[str] = None) -> None:
+        """`version` was just activated: append it as the newest release and trim to `keep`."""
+        releases = [r for r in self.data["releases"] if r["version"] != version]
+        releases.append({"version": version, "path": str(Path(path).resolve()), "digest": digest,
+                         "activated_at": datetime.now(timezone.utc).isoformat()})
+        while len(releases) > self.keep:
+            releases.pop(0)
+        self.data["releases"] = releases
+        self.data["current"] = version
+        self.data["rejected"] = [v for v in self.data["rejected"] if v != version and self.get(v)]
+        self.save()
+
+    def previous(self) -> Optional[Dict[str, Any]]:
+        """Newest retained release older than the current one whose artifact still exists."""
+        releases = self.data["releases"]
+        versions = self.versions()
+        end = versions.index(self.current) if self.current in versions else len(releases)
+        for r in reversed(releases[:end]):
+            if not self.is_rejected(r["version"]) and Path(r["path"]).exists():
+                return r
+        return None
+
+    def switch(self, release: Dict[str, Any], link: Path, version_file: Path, reject_current: bool = False) -> None:
+        """Flip the symlink and version file to a retained release (no copy, no download)."""
+        atomic_symlink(Path(release["path"]), link)
+        atomic_write_text(version_file, release["version"])
+        if reject_current and self.current and self.current != release["version"]:
+            self.data["rejected"].append(self.current)
+        self.data["rejected"] = [v for v in self.data["rejected"] if v != release["version"]]
+        self.data["current"] = release["version"]
+        self.save()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local stand-in for the serving process's model admin API, used to exercise
+hot_reload.py without the real service.
+
+Endpoints:
+  GET  /predict                  answer with the active model (what clients see)
+  GET  /healthz
+  POST /admin/models/preload     {"path", "version"} → load + warm into the standby slot (async)
+  GET  /admin/models/standby     {"state": empty|loading|ready|failed, "version", ...}
+  POST /admin/models/activate    {"version"} → atomically make standby active
+  POST /admin/models/release     drop the previously active model
+  POST /admin/reload             legacy: load synchronously while holding the
+                                 serving lock, so /predict stalls meanwhile
+
+Models are loaded with model_io.load_model; artifacts that aren't pickles
+(e.g. the placeholder model_v1.pkl) are kept as raw bytes. Set
+STANDIN_LOAD_DELAY / STANDIN_WARMUP_DELAY (seconds) to simulate a heavy model.
+
+Usage:
+    python scripts/reload_standin.py serve [port]   # default port 8080
+    python scripts/reload_standin.py bench          # legacy vs swap stall window
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+import urllib.request
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+from model_io import load_model
+
+
+class ModelSlots:
+    def __init__(self, load_delay: float = 0.0, warmup_delay: float = 0.0):
+        self.lock = threading.Lock()  # guards the active pointer only
+        self.active: Optional[Dict[str, Any]] = None
+        self.previous: Optional[Dict[str, Any]] = None
+        self.standby: Dict[str, Any] = {"state": "empty"}
+        self.load_delay = load_delay
+        self.warmup_delay = warmup_delay
+
+    def _load(self, path: str, version: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            model, _ = load_model(Path(path))
+        except Exception:
+            model = Path(path).read_bytes()
+        time.sleep(self.load_delay)
+        predict = getattr(model, "predict", None)
+        if callable(predict):
+            try:
+                predict(None)
+            except Exception:
+                pass
+        time.sleep(self.warmup_delay)
+        return {"version": version, "path": path, "model": model,
+                "load_sec": round(time.perf_counter() - start, 4)}
+
+    def preload(self, path: str, version: str) -> bool:
+        if self.standby["state"] == "loading":
+            return False
+        self.standby = {"state": "loading", "version": version}
+
+        def work():
+            try:
+                slot = self._load(path, version)
+                self.standby = {"state": "ready", **slot}
+            except Exception as e:
+                self.standby = {"state": "failed", "version": version, "error": str(e)}
+
+        threading.Thread(target=work, daemon=True).start()
+        return True
+
+    def activate(self, version: str) -> Optional[str]:
+        standby = self.standby
+        if standby["state"] != "ready" or standby["version"] != version:
+            return None
+        with self.lock:
+            self.previous, self.active = self.active, standby
+        self.standby = {"state": "empty"}
+        return self.previous["version"] if self.previous else None
+
+    def release(self) -> Optional[str]:
+        old, self.previous = self.previous, None
+        return old["version"] if old else None
+
+    def legacy_reload(self, path: str, version: str) -> None:
+        with self.lock:
+            self.active = self._load(path, version)
+
+    def current(self) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            return self.active
+
+
+def make_handler(slots: ModelSlots):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _json(self, code: int, body: Dict[str, Any]) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _body(self) -> Dict[str, Any]:
+            n = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(n) or b"{}")
+
+        def _public(self, slot):
+            return {k: v for k, v in slot.items() if k != "model"}
+
+        def do_GET(self):
+            if self.path == "/healthz":
+                self._json(200, {"ok": True})
+            elif self.path == "/predict":
+                active = slots.current()
+                self._json(200, {"version": active["version"] if active else None})
+            elif self.path == "/admin/models/standby":
+                self._json(200, self._public(slots.standby))
+            else:
+                self._json(404, {"error": "not found"})
+
+        def do_POST(self):
+            body = self._body()
+            if self.path == "/admin/models/preload":
+                ok = slots.preload(body["path"], body["version"])
+                self._json(202 if ok else 409, self._public(slots.standby))
+            elif self.path == "/admin/models/activate":
+                if slots.standby.get("version") != body.get("version") or slots.standby["state"] != "ready":
+                    self._json(409, {"error": "standby not ready", **self._public(slots.standby)})
+                    return
+                previous = slots.activate(body["version"])
+                self._json(200, {"active": body["version"], "previous": previous})
+            elif self.path == "/admin/models/release":
+                self._json(200, {"released": slots.release()})
+            elif self.path == "/admin/reload":
+                path = body.get("path") or os.getenv("STANDIN_MODEL_PATH", "artifacts/current_model.pkl")
+                slots.legacy_reload(path, body.get("version") or Path(path).resolve().name)
+                self._json(200, {"active": slots.current()["version"]})
+            else:
+                self._json(404, {"error": "not found"})
+
+    return Handler
+
+
+def start_server(port: int = 0, **slot_kwargs) -> ThreadingHTTPServer:
+    """Start the stand-in on a background thread; port 0 picks a free port."""
+    slots = ModelSlots(**slot_kwargs)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(slots))
+    server.daemon_threads = True
+    server.slots = slots  # type: ignore[attr-defined]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def measure_stall(base: str, action) -> Dict[str, float]:
+    """Run action() while hammering /predict; report the worst request latency seen."""
+    worst, count = 0.0, 0
+    stop = threading.Event()
+
+    def hammer():
+        nonlocal worst, count
+        while not stop.is_set():
+            t = time.perf_counter()
+            urllib.request.urlopen(base + "/predict", timeout=30).read()
+            worst = max(worst, time.perf_counter() - t)
+            count += 1
+
+    th = threading.Thread(target=hammer, daemon=True)
+    th.start()
+    time.sleep(0.1)
+    start = time.perf_counter()
+    action()
+    elapsed = time.perf_counter() - start
+    time.sleep(0.1)
+    stop.set()
+    th.join()
+    return {"reload_sec": round(elapsed, 4), "max_request_ms": round(worst * 1000, 2), "requests": count}
+
+
+def bench() -> None:
+    import tempfile
+    import hot_reload
+
+    server = start_server(load_delay=float(os.getenv("STANDIN_LOAD_DELAY", "1.0")),
+                          warmup_delay=float(os.getenv("STANDIN_WARMUP_DELAY", "0.2")))
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    with tempfile.TemporaryDirectory() as tmp:
+        model = Path(tmp) / "model_bench.pkl"
+        model.write_bytes(b"x" * 1024)
+        legacy = measure_stall(base, lambda: hot_reload.legacy_reload(
+            base + "/admin/reload", {}, json_body={"path": str(model)}))
+        swap = measure_stall(base, lambda: hot_reload.swap_model(
+            base, str(model), "model_bench.pkl", {}, ready_timeout=60))
+    server.shutdown()
+    print(json.dumps({"legacy": legacy, "swap": swap}, indent=2))
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    if args[:1] == ["bench"]:
+        bench()
+    elif args[:1] in (["serve"], []):
+        port = int(args[1]) if len(args) > 1 else 8080
+        server = start_server(port, load_delay=float(os.getenv("STANDIN_LOAD_DELAY", "0")),
+                              warmup_delay=float(os.getenv("STANDIN_WARMUP_DELAY", "0")))
+        print(f"✅ Stand-in serving on http://127.0.0.1:{server.server_address[1]}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
+    else:
+        print(__doc__)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Index of generated reports, kept in <report_dir>/report_index.sqlite.
+
+generate_report.py records each report as it writes it. Lookups then never
+list or stat report_dir, which matters once it holds tens of thousands of
+files on network storage:
+  - latest / last N for an env are indexed queries (email_report.py)
+  - retention runs at write time and deletes each env's reports beyond the
+    newest `report_keep` (0 = unlimited) or older than `report_max_age_days`
+    (0 = unlimited); the newest report of an env is always kept
+  - <report_dir>/index.html is re-rendered from the index, not from the
+    reports, listing the last `report_dashboard_rows` reports per env with
+    links, model file and smoke test status
+Record, retention and dashboard run in one write transaction, so parallel
+generate_report workers (REPORT_ENVS) don't lose each other's rows.
+
+The first time the index is opened, reports already in report_dir are
+imported with a single directory scan; `rebuild` repeats that scan (e.g.
+after reports were copied in or deleted by hand). Report names carry their
+env (model_report_<ts>_<env>.html); older names without one are imported
+with no env, listed on the dashboard but never touched by retention.
+
+Usage:
+    python scripts/report_index.py list [n]   # last n reports of APP_ENV (default 10)
+    python scripts/report_index.py rebuild    # re-scan report_dir into the index
+    python scripts/report_index.py prune      # apply retention to every env now
+"""
+
+import os
+import re
+import sys
+import html
+from pathlib import Path
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+from read_config import get_env_config, list_envs
+from instrument import span
+from lazy import lazy_import
+from releases import atomic_write_text
+
+sqlite3 = lazy_import("sqlite3")
+
+INDEX_NAME = "report_index.sqlite"
+DASHBOARD_NAME = "index.html"
+TS_FORMAT = "%Y%m%d_%H%M%S"
+DEFAULT_DASHBOARD_ROWS = 50
+REPORT_NAME = re.compile(r"model_report_(?P<ts>\d{8}_\d{6})(?:_(?P<env>.+))?\.html$")
+
+SCHEMA_VERSION = 2
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS reports (
+           name       TEXT PRIMARY KEY,
+           env        TEXT,
+           created_at TEXT NOT NULL,
+           size       INTEGER,
+           model_file TEXT,
+           smoketest  TEXT
+       )""",
+    "CREATE INDEX IF NOT EXISTS reports_by_env ON reports (env, created_at)",
+]
+
+DASHBOARD_TEMPLATE = """<!doctype html>
+<html>
+<head>
+  <meta charset="utf-8">
+  <title>Model Reports</title>
+  <style>
+    body {{ font-family: Arial, sans-serif; margin: 1.5rem; }}
+    .meta {{ color: #666; margin-bottom: 1rem; }}
+    table {{ border-collapse: collapse; margin-bottom: 1.5rem; }}
+    td, th {{ border: 1px solid #ddd; padding: 0.25rem 0.6rem; text-align: left; }}
+  </style>
+</head>
+<body>
+  <h1>Model Reports</h1>
+  <div class="meta">Updated at: <b>{updated}Z</b></div>
+{sections}
+</body>
+</html>
+"""
+
+
+def _display_ts(ts: str) -> str:
+    try:
+        return datetime.strptime(ts, TS_FORMAT).strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:  # hand-named file that only looks like a timestamp
+        return ts
+
+
+class ReportIndex:
+    def __init__(self, report_dir: Path):
+        self.report_dir = Path(report_dir)
+        self.path = self.report_dir / INDEX_NAME
+        self.dashboard_path = self.report_dir / DASHBOARD_NAME
+        self.report_dir.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        if self._version() < SCHEMA_VERSION:
+            self._bootstrap()
+
+    def _version(self) -> int:
+        return self.db.execute("PRAGMA user_version").fetchone()[0]
+
+    def _bootstrap(self) -> None:
+        # Once per index: a concurrent opener waits on the write lock, then sees the version
+        with self.transaction():
+            version = self._version()
+            if version >= SCHEMA_VERSION:
+                return
+            if version == 1:  # env was NOT NULL: keep the rows, relax the column
+                self.db.execute("ALTER TABLE reports RENAME TO reports_v1")
+                self.db.execute("DROP INDEX IF EXISTS reports_by_env")
+            for stmt in _SCHEMA:
+                self.db.execute(stmt)
+            if version == 1:
+                self.db.execute("INSERT INTO reports SELECT * FROM reports_v1")
+                self.db.execute("DROP TABLE reports_v1")
+            self._sync()
+            self.db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self) -> None:
+        self.db.close()
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Write transaction; other writers wait (up to 30 s) rather than interleave."""
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        self.db.execute("COMMIT")
+
+    # ---------- lookups ----------
+    def path_of(self, name: str) -> Path:
+        return self.report_dir / name
+
+    def last(self, env: Optional[str] = None, n: int = 1, unassigned: bool = False) -> List[Dict[str, Any]]:
+        """Newest n reports of env (None → any env; unassigned → those with no env), newest first."""
+        if unassigned:
+            where, params = "WHERE env IS NULL", ()
+        elif env is None:
+            where, params = "", ()
+        else:
+            where, params = "WHERE env = ?", (env,)
+        rows = self.db.execute(f"SELECT * FROM reports {where} ORDER BY created_at DESC, name DESC LIMIT ?",
+                               (*params, n))
+        return [dict(r) for r in rows]
+
+    def latest(self, env: Optional[str] = None) -> Optional[Path]:
+        rows = self.last(env, 1)
+        return self.path_of(rows[0]["name"]) if rows else None
+
+    def envs(self) -> List[Dict[str, Any]]:
+        """Per env: name, retained report count and newest timestamp."""
+        rows = self.db.execute("SELECT env, COUNT(*) AS reports, MAX(created_at) AS newest "
+                               "FROM reports GROUP BY env ORDER BY env")
+        return [dict(r) for r in rows]
+
+    # ---------- writes ----------
+    def record(self, env: str, path: Path, model_info: Optional[Dict[str, Any]] = None) -> None:
+        path = Path(path)
+        m = REPORT_NAME.match(path.name)
+        created_at = m.group("ts") if m else datetime.utcnow().strftime(TS_FORMAT)
+        info = model_info or {}
+        model_file = info.get("model_file")
+        self.db.execute("INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?, ?, ?)",
+                        (path.name, env, created_at, path.stat().st_size,
+                         Path(model_file).name if model_file else None, info.get("smoketest")))
+
+    def prune(self, env: str, keep: int = 0, max_age_days: float = 0) -> int:
+        """Delete env's reports beyond the newest `keep` or older than `max_age_days`; the newest stays."""
+        doomed = set()
+        if keep:
+            doomed |= {r[0] for r in self.db.execute(
+                "SELECT name FROM reports WHERE env = ? ORDER BY created_at DESC, name DESC LIMIT -1 OFFSET ?",
+                (env, int(keep)))}
+        if max_age_days:
+            cutoff = (datetime.utcnow() - timedelta(days=float(max_age_days))).strftime(TS_FORMAT)
+            doomed |= {r[0] for r in self.db.execute(
+                "SELECT name FROM reports WHERE env = ? AND created_at < ?", (env, cutoff))}
+        doomed -= {r["name"] for r in self.last(env, 1)}
+        for name in doomed:
+            self.path_of(name).unlink(missing_ok=True)
+        self.db.executemany("DELETE FROM reports WHERE name = ?", [(n,) for n in doomed])
+        return len(doomed)
+
+    def rebuild(self) -> int:
+        """Re-sync with report_dir in one scan: import unknown reports, drop rows whose file is gone."""
+        with self.transaction():
+            return self._sync()
+
+    def _sync(self) -> int:
+        # Scans under the write lock, so a concurrent prune can't leave rows for deleted files.
+        # A name without an env suffix gets no env rather than a guess, which keeps it out of retention.
+        found = {}
+        with os.scandir(self.report_dir) as it:
+            for entry in it:
+                m = REPORT_NAME.match(entry.name)
+                if m and entry.is_file():
+                    found[entry.name] = (m.group("env"), m.group("ts"), entry.stat().st_size)
+        known = {r[0] for r in self.db.execute("SELECT name FROM reports")}
+        self.db.executemany("DELETE FROM reports WHERE name = ?", [(n,) for n in known - found.keys()])
+        self.db.executemany("INSERT INTO reports (name, env, created_at, size) VALUES (?, ?, ?, ?)",
+                            [(n, *found[n]) for n in found.keys() - known])
+        return len(found.keys() - known)
+
+    def write_dashboard(self, rows: int = DEFAULT_DASHBOARD_ROWS) -> Path:
+        """Render index.html from the index alone (no report is opened)."""
+        sections = []
+        for e in self.envs():
+            unassigned = e["env"] is None
+            entries = self.last(e["env"], rows, unassigned=unassigned)
+            latest = html.escape(entries[0]["name"])
+            title = "No env in file name (kept, not pruned)" if unassigned else html.escape(e["env"])
+            lines = [f'  <h2>{title}</h2>',
+                     f'  <div class="meta">Latest: <a href="{latest}">{latest}</a> | '
+                     f'{e["reports"]} report(s) retained</div>',
+                     "  <table>",
+                     "    <tr><th>Generated (UTC)</th><th>Report</th><th>Model</th>"
+                     "<th>Smoke test</th><th>Size (KB)</th></tr>"]
+            for r in entries:
+                name = html.escape(r["name"])
+                lines.append(f'    <tr><td>{_display_ts(r["created_at"])}</td><td><a href="{name}">{name}</a></td>'
+                             f'<td>{html.escape(r["model_file"] or "")}</td>'
+                             f'<td>{html.escape(r["smoketest"] or "")}</td>'
+                             f'<td>{(r["size"] or 0) / 1024:.0f}</td></tr>')
+            if e["reports"] > len(entries) and not unassigned:
+                lines.append(f'    <tr><td colspan="5">… {e["reports"] - len(entries)} older; '
+                             f'APP_ENV={html.escape(e["env"])} python scripts/report_index.py list {e["reports"]}</td></tr>')
+            lines.append("  </table>")
+            sections.append("\n".join(lines))
+        atomic_write_text(self.dashboard_path, DASHBOARD_TEMPLATE.format(
+            updated=datetime.utcnow().isoformat(timespec="seconds"), sections="\n".join(sections)))
+        return self.dashboard_path
+
+
+def retention(cfg: Dict[str, Any]) -> Dict[str, float]:
+    return {"keep": int(cfg.get("report_keep") or 0), "max_age_days": float(cfg.get("report_max_age_days") or 0)}
+
+
+def publish(cfg: Dict[str, Any], env: str, path: Path, model_info: Optional[Dict[str, Any]] = None) -> int:
+    """Record a freshly written report, apply env's retention and refresh the dashboard; returns reports pruned."""
+    index = ReportIndex(Path(cfg.get("report_dir", "reports")))
+    try:
+        with index.transaction():
+            index.record(env, path, model_info)
+            pruned = index.prune(env, **retention(cfg))
+            index.write_dashboard(int(cfg.get("report_dashboard_rows", DEFAULT_DASHBOARD_ROWS)))
+        return pruned
+    finally:
+        index.close()
+
+
+def main():
+    cfg = get_env_config()
+    env = os.getenv("APP_ENV", "dev")
+    index = ReportIndex(Path(cfg.get("report_dir", "reports")))
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "list"
+    rows = int(cfg.get("report_dashboard_rows", DEFAULT_DASHBOARD_ROWS))
+    if cmd == "list":
+        n = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+        for r in index.last(env, n):
+            print(f"{_display_ts(r['created_at'])}  {index.path_of(r['name'])}  "
+                  f"{r['model_file'] or '-'}  {r['smoketest'] or '-'}")
+    elif cmd == "rebuild":
+        added = index.rebuild()
+        index.write_dashboard(rows)
+        print(f"🗂️  Indexed {added} new report(s); dashboard: {index.dashboard_path}")
+    elif cmd == "prune":
+        defined = set(list_envs())
+        with index.transaction():
+            pruned = sum(index.prune(e["env"], **retention(get_env_config(e["env"]) if e["env"] in defined else cfg))
+                         for e in index.envs() if e["env"] is not None)
+            index.write_dashboard(rows)
+        print(f"🧹 Removed {pruned} report(s) past retention")
+    else:
+        print(f"❌ Unknown command {cmd!r}; use list, rebuild or prune")
+        sys.exit(2)
+    index.close()
+
+
+if __name__ == "__main__":
+    with span("report_index"):
+        main()
@@ -2,16 +2,70 @@
 # -*- coding: utf-8 -*-
 
 """
-Simulated rollback script.
-In a real pipeline, this would:
-- Restore previous release/artifact
-- Revert configuration changes
-- Restart service back to last known good state
+Roll the current model back to the previous retained release.
+
+model_refresh.py keeps the last `model_store_keep` activated versions on disk
+and in the release history (artifacts/.model_history.json, see releases.py).
+Rolling back is a pointer flip: the 'model_current_symlink' and
+'model_version_file' are atomically replaced to point at the previous
+version's artifact — nothing is copied or downloaded. The version rolled
+back from is marked rejected so the next refresh doesn't re-activate it.
+The flip holds model_refresh's refresh_lock, so it never interleaves with
+a refresh switching the same environment.
+
+Environment:
+  ROLLBACK_TO   switch to this retained version instead of the previous one
+                (also how a rejected version is brought back)
+
+Run hot_reload.py afterwards to make the serving process pick it up.
+
+Exit codes:
+  0 → switched
+  2 → nothing to roll back to (no history, or the artifact is gone)
 """
 
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+from read_config import get_env_config
+from instrument import span
+from model_refresh import open_history, refresh_lock, version_file_path
+
+
+def roll_back(cfg: Dict[str, Any], link: Path, vfile: Path) -> None:
+    history = open_history(cfg, vfile)
+    current = history.current
+
+    wanted = os.getenv("ROLLBACK_TO")
+    target = history.get(wanted) if wanted else history.previous()
+    if target is None:
+        what = f"version {wanted} is not retained" if wanted else "no earlier retained release"
+        print(f"❌ Cannot roll back from {current}: {what}. Retained: {history.versions()}")
+        sys.exit(2)
+    if not Path(target["path"]).exists():
+        print(f"❌ Artifact for {target['version']} is gone: {target['path']}")
+        sys.exit(2)
+
+    print(f"🔄 Rolling back {current} → {target['version']}")
+    start = time.perf_counter()
+    history.switch(target, link, vfile, reject_current=not wanted)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(f"✅ Now serving {target['version']} from {target['path']} (flip took {elapsed_ms:.2f} ms)")
+    if not wanted and current:
+        print(f"⏸️  {current} is marked rejected; model_refresh will not re-activate it.")
+
+
 def main():
-    print("🔄 Rolling back deployment (simulated).")
-    print("⬅️  Restoring previous version and configuration... (simulated)")
+    cfg = get_env_config()
+    link = Path(cfg.get("model_current_symlink", "artifacts/current_model.pkl"))
+    vfile = version_file_path(cfg)
+    with refresh_lock(cfg, vfile, link):
+        roll_back(cfg, link, vfile)
+
 
 if __name__ == "__main__":
-    main()
+    with span("rollback"):
+        main()
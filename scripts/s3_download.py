@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Resumable, verified S3 download engine used by model_refresh.py.
+
+How a download works:
+- HEAD the object to learn its size, ETag and user metadata.
+- Split it into fixed-size ranges and fetch them concurrently with ranged
+  GET requests, writing each range at its offset in '<dest>.part'. Every
+  GET carries If-Match with the HEAD's ETag, so an object replaced
+  mid-download fails fast (412) instead of mixing two versions' bytes.
+- Progress is tracked in '<dest>.part.json' (ETag, size, chunk size and the
+  finished chunk indices). If a previous run was interrupted and the object
+  is unchanged, only the missing ranges are fetched.
+- SHA-256 (and MD5 for single-part ETags) is computed while downloading,
+  by hashing the contiguous prefix of finished chunks as it grows.
+- The digest is checked against the object's 'sha256' user metadata
+  (x-amz-meta-sha256), its ChecksumSHA256 and/or its plain MD5 ETag. On
+  success the part file is fsynced and renamed onto 'dest' atomically; on
+  mismatch it is deleted and DownloadError is raised.
+- Client and transport errors (botocore ClientError, connect/read timeouts,
+  dropped connections) from HEAD, GET or reading a body surface as
+  DownloadError too; ranges not started yet are skipped, and finished
+  chunks stay on disk for the next attempt.
+
+Works with any client exposing head_object/get_object like boto3's, e.g. the
+in-process stand-in in fake_s3.py. s3_client() hands out one shared boto3
+client per process (building one costs tens of milliseconds and a fresh
+connection pool), sized for the configured number of download workers.
+"""
+
+import os
+import json
+import base64
+import hashlib
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Optional, Set
+
+DEFAULT_CHUNK_SIZE = 64 * 1024 * 1024
+DEFAULT_WORKERS = 8
+READ_BLOCK = 1024 * 1024
+SHA256_METADATA_KEY = "sha256"
+
+_client = None
+_client_lock = threading.Lock()
+
+
+class DownloadError(Exception):
+    """Raised when an object cannot be downloaded or fails verification."""
+
+
+def s3_client(max_workers: int = DEFAULT_WORKERS):
+    """
+    The process-wide boto3 S3 client, created on first use. boto3 clients are
+    thread-safe; the pool holds enough connections for `max_workers` ranged
+    GETs in flight (a later, larger request cannot grow an existing pool).
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            import boto3
+            from botocore.config import Config
+            _client = boto3.client("s3", config=Config(max_pool_connections=max(10, max_workers)))
+        return _client
+
+
+def reset_s3_client() -> None:
+    """Drop the shared client (tests, or after credentials change)."""
+    global _client
+    with _client_lock:
+        _client = None
+
+
+def head_object(s3, bucket: str, key: str) -> Dict[str, Any]:
+    """HEAD s3://bucket/key; any client or transport error becomes DownloadError."""
+    try:
+        return s3.head_object(Bucket=bucket, Key=key)
+    except Exception as e:
+        raise DownloadError(f"HEAD s3://{bucket}/{key} failed: {e}") from e
+
+
+def part_paths(dest: Path):
+    return dest.with_name(dest.name + ".part"), dest.with_name(dest.name + ".part.json")
+
+
+def expected_digests(head: Dict[str, Any], use_metadata: bool = True) -> Dict[str, str]:
+    """
+    Collect whatever checksums the object publishes, as lowercase hex.
+    use_metadata=False ignores x-amz-meta-sha256 (a .delta object carries
+    its target's hash there, not its own).
+    """
+    out = {}
+    meta = {k.lower(): v for k, v in (head.get("Metadata") or {}).items()}
+    if use_metadata and meta.get(SHA256_METADATA_KEY):
+        out["sha256"] = meta[SHA256_METADATA_KEY].strip().lower()
+    checksum = head.get("ChecksumSHA256")
+    # Composite checksums of multipart uploads look like '<b64>-<parts>'
+    if checksum and "-" not in checksum and "sha256" not in out:
+        out["sha256"] = base64.b64decode(checksum).hex()
+    etag = (head.get("ETag") or "").strip('"')
+    # A plain 32-hex ETag is the MD5 of the body (not true for multipart/KMS)
+    if len(etag) == 32 and "-" not in etag:
+        out["md5"] = etag.lower()
+    return out
+
+
+def _load_state(state_path: Path, head: Dict[str, Any], chunk_size: int) -> Set[int]:
+    try:
+        state = json.loads(state_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return set()
+    if (state.get("etag") != head.get("ETag")
+            or state.get("size") != head["ContentLength"]
+            or state.get("chunk_size") != chunk_size):
+        return set()
+    return set(state.get("done", []))
+
+
+def _save_state(state_path: Path, head: Dict[str, Any], chunk_size: int, done: Set[int]) -> None:
+    tmp = state_path.with_name(state_path.name + ".tmp")
+    tmp.write_text(json.dumps({
+        "etag": head.get("ETag"),
+        "size": head["ContentLength"],
+        "chunk_size": chunk_size,
+        "done": sorted(done),
+    }), encoding="utf-8")
+    os.replace(tmp, state_path)
+
+
+def _fetch_range(s3, bucket: str, key: str, etag: Optional[str], fd: int, start: int, end: int) -> int:
+    kwargs = {"IfMatch": etag} if etag else {}
+    try:
+        resp = s3.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{end}", **kwargs)
+    except Exception as e:
+        raise DownloadError(f"GET s3://{bucket}/{key} bytes {start}-{end} failed: {e}") from e
+    body = resp["Body"]
+    offset = start
+    try:
+        while True:
+            try:
+                block = body.read(READ_BLOCK)
+            except Exception as e:  # urllib3 read timeouts / resets are not OSErrors
+                raise DownloadError(f"reading s3://{bucket}/{key} failed at byte {offset}: {e}") from e
+            if not block:
+                break
+            os.pwrite(fd, block, offset)
+            offset += len(block)
+    finally:
+        body.close()
+    if offset != end + 1:
+        raise DownloadError(f"short read for bytes {start}-{end}: got {offset - start} bytes")
+    return offset - start
+
+
+def download_object(s3, bucket: str, key: str, dest: Path,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    max_workers: int = DEFAULT_WORKERS,
+                    expected_sha256: Optional[str] = None,
+                    use_metadata: bool = True) -> str:
+    """
+    Download s3://bucket/key to dest and return its SHA-256 hex digest.
+    dest only ever appears fully written and verified.
+    """
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    part, state_path = part_paths(dest)
+
+    head = head_object(s3, bucket, key)
+    size = int(head["ContentLength"])
+    expected = expected_digests(head, use_metadata)
+    if expected_sha256:
+        expected["sha256"] = expected_sha256.lower()
+
+    nchunks = -(-size // chunk_size)
+    done = _load_state(state_path, head, chunk_size) if part.exists() else set()
+    if done:
+        print(f"↩️  Resuming {key}: {len(done)}/{nchunks} chunks already on disk")
+
+    sha256 = hashlib.sha256()
+    md5 = hashlib.md5() if "md5" in expected else None
+    hashed = 0  # chunks [0, hashed) have been fed to the hashers
+
+    fd = os.open(part, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        os.ftruncate(fd, size)
+
+        def hash_ready_prefix():
+            nonlocal hashed
+            while hashed < nchunks and hashed in done:
+                start = hashed * chunk_size
+                remaining = min(chunk_size, size - start)
+                while remaining:
+                    block = os.pread(fd, min(READ_BLOCK, remaining), start)
+                    if not block:
+                        raise DownloadError(f"part file truncated at byte {start}")
+                    sha256.update(block)
+                    if md5:
+                        md5.update(block)
+                    start += len(block)
+                    remaining -= len(block)
+                hashed += 1
+
+        hash_ready_prefix()
+        todo = [i for i in range(nchunks) if i not in done]
+        errors = []  # the first failed range's error, which is the one to report
+
+        def fetch(i: int) -> int:
+            # After one range fails, don't start others that are bound to fail
+            # too (e.g. the object changed); the next run resumes from here
+            if errors:
+                raise errors[0]
+            try:
+                return _fetch_range(s3, bucket, key, head.get("ETag"), fd,
+                                    i * chunk_size, min(size, (i + 1) * chunk_size) - 1)
+            except BaseException as e:
+                errors.append(e)
+                raise
+
+        if todo:
+            with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+                futures = {pool.submit(fetch, i): i for i in todo}
+                # Bookkeeping and hashing stay on this thread; workers only write bytes
+                for fut in as_completed(futures):
+                    if fut.exception():
+                        raise errors[0]
+                    done.add(futures[fut])
+                    _save_state(state_path, head, chunk_size, done)
+                    hash_ready_prefix()
+        hash_ready_prefix()
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+    digest = sha256.hexdigest()
+    mismatch = []
+    if "sha256" in expected and expected["sha256"] != digest:
+        mismatch.append(f"sha256 {digest} != {expected['sha256']}")
+    if md5 and expected["md5"] != md5.hexdigest():
+        mismatch.append(f"md5 {md5.hexdigest()} != {expected['md5']}")
+    if mismatch:
+        part.unlink(missing_ok=True)
+        state_path.unlink(missing_ok=True)
+        raise DownloadError(f"integrity check failed for s3://{bucket}/{key}: {'; '.join(mismatch)}")
+    if not expected:
+        print(f"⚠️  s3://{bucket}/{key} publishes no checksum; verified size only.")
+
+    os.replace(part, dest)
+    state_path.unlink(missing_ok=True)
+    return digest
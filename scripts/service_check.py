@@ -1,20 +1,127 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+"""
+Verify required services are running, using one psutil pass over the process table.
 
-import subprocess  #used to run external commands (here, ps -ef)
+Services come from `services` in configs/env.yaml; each entry has a `name`
+and one matcher (default: exact process name equal to `name`):
+  process: python                      exact process name (or argv[0] basename)
+  cmdline: "gunicorn .*app:server"     regex searched in the joined command line
+  pidfile: /run/worker.pid             PID read from a file, must be alive
+  cgroup:  system.slice/nginx.service  any PID in that cgroup (v2, /sys/fs/cgroup)
+Optional `min_count` (default 1) requires several matching processes.
+Without `services`, the legacy `service_name` key is checked by exact name.
+
+For each service the matched PIDs are reported with CPU (average % since
+start) and RSS.
+
+Exit codes:
+  0 → all services running
+  1 → at least one service NOT running
+"""
+
+import os
+import re
 import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import psutil
+
 from read_config import get_env_config
+from instrument import span
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+_ATTRS = ["pid", "name", "cmdline", "create_time", "cpu_times", "memory_info"]
+
+
+def service_specs(cfg: Dict[str, Any]) -> List[Dict[str, Any]]:
+    specs = cfg.get("services")
+    if not specs:
+        specs = [{"name": str(cfg.get("service_name", "python"))}]
+    return [dict(s) if isinstance(s, dict) else {"name": str(s)} for s in specs]
+
+
+def scan_processes() -> Dict[int, Dict[str, Any]]:
+    """Snapshot of every process (pid → attributes) in a single pass."""
+    procs = {}
+    for p in psutil.process_iter(_ATTRS, ad_value=None):
+        procs[p.info["pid"]] = p.info
+    return procs
+
+
+def _pids_from_pidfile(path: str) -> List[int]:
+    try:
+        return [int(Path(path).read_text().split()[0])]
+    except (OSError, ValueError, IndexError):
+        return []
+
+
+def _pids_from_cgroup(cgroup: str) -> List[int]:
+    procs_file = CGROUP_ROOT / cgroup.strip("/") / "cgroup.procs"
+    try:
+        return [int(x) for x in procs_file.read_text().split()]
+    except (OSError, ValueError):
+        return []
+
+
+def match_service(spec: Dict[str, Any], procs: Dict[int, Dict[str, Any]]) -> List[int]:
+    if "pidfile" in spec:
+        return [pid for pid in _pids_from_pidfile(spec["pidfile"]) if pid in procs]
+    if "cgroup" in spec:
+        return [pid for pid in _pids_from_cgroup(spec["cgroup"]) if pid in procs]
+    if "cmdline" in spec:
+        rx = re.compile(spec["cmdline"])
+        return [pid for pid, info in procs.items()
+                if info["cmdline"] and rx.search(" ".join(info["cmdline"]))]
+    name = spec.get("process", spec["name"])
+    return [pid for pid, info in procs.items()
+            if info["name"] == name
+            or (info["cmdline"] and os.path.basename(info["cmdline"][0]) == name)]
+
+
+def process_usage(info: Dict[str, Any], now: float) -> Dict[str, Any]:
+    cpu, mem, started = info.get("cpu_times"), info.get("memory_info"), info.get("create_time")
+    usage: Dict[str, Any] = {"pid": info["pid"]}
+    if cpu is not None and started:
+        usage["cpu_pct_avg"] = round((cpu.user + cpu.system) / max(now - started, 1e-6) * 100, 1)
+    if mem is not None:
+        usage["rss_mb"] = round(mem.rss / 1e6, 1)
+    return usage
+
+
+def check_services(specs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    procs = scan_processes()
+    now = time.time()
+    results = []
+    for spec in specs:
+        pids = match_service(spec, procs)
+        results.append({
+            "name": spec["name"],
+            "running": len(pids) >= int(spec.get("min_count", 1)),
+            "processes": [process_usage(procs[pid], now) for pid in pids],
+        })
+    return results
+
 
 def main():
     cfg = get_env_config()
-    process_name = str(cfg.get("service_name", "python"))
+    results = check_services(service_specs(cfg))
 
-    result = subprocess.run(["ps", "-ef"], capture_output=True, text=True)   #executes the Unix command ps -ef, which prints all running processes with details
-    if process_name in result.stdout:
-        print(f"✅ Process '{process_name}' is running")
-    else:
-        print(f"❌ Process '{process_name}' NOT running")
+    failed = []
+    for r in results:
+        if r["running"]:
+            top = sorted(r["processes"], key=lambda u: u.get("rss_mb", 0), reverse=True)[:3]
+            detail = ", ".join(f"pid {u['pid']} cpu {u.get('cpu_pct_avg', '?')}% rss {u.get('rss_mb', '?')} MB"
+                               for u in top)
+            print(f"✅ Process '{r['name']}' is running ({len(r['processes'])} match(es): {detail})")
+        else:
+            print(f"❌ Process '{r['name']}' NOT running")
+            failed.append(r["name"])
+    if failed:
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
+    with span("service_check"):
+        main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Minimal local SMTP server for exercising email_report.py without a relay.
+
+Speaks enough SMTP for smtplib: EHLO/HELO, AUTH PLAIN (any credentials),
+MAIL, RCPT, DATA, RSET, NOOP, QUIT. No STARTTLS, so run the client with
+SMTP_STARTTLS=0. Messages larger than `max_size` are rejected with 552 like
+a size-limited relay. Received messages are kept in `server.messages` as
+dicts (peer session id, sender, recipients, raw bytes) and, when `out_dir`
+is given, written there as .eml files.
+
+Usage:
+    python scripts/smtp_standin.py [port] [out_dir] [max_size_bytes]   # default 2525, no dir
+"""
+
+import sys
+import threading
+import socketserver
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def _reply(self, line: str) -> None:
+        self.wfile.write((line + "\r\n").encode("ascii"))
+
+    def handle(self) -> None:
+        srv: "SMTPStandin" = self.server  # type: ignore[assignment]
+        srv.sessions += 1
+        session = srv.sessions
+        sender, rcpts = None, []
+        self._reply("220 standin ESMTP")
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            line = raw.decode("utf-8", "replace").rstrip("\r\n")
+            cmd = line[:4].upper()
+            if cmd == "EHLO":
+                self._reply("250-standin")
+                self._reply(f"250-SIZE {srv.max_size or 0}")
+                self._reply("250 AUTH PLAIN")
+            elif cmd == "HELO":
+                self._reply("250 standin")
+            elif cmd == "AUTH":
+                self._reply("235 2.7.0 Authentication successful")
+            elif cmd == "MAIL":
+                sender, rcpts = line[10:].strip().strip("<>").split(">")[0], []
+                self._reply("250 OK")
+            elif cmd == "RCPT":
+                rcpts.append(line[8:].strip().strip("<>"))
+                self._reply("250 OK")
+            elif cmd == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                chunks = []
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data in (b".\r\n", b".\n"):
+                        break
+                    chunks.append(data[1:] if data.startswith(b"..") else data)
+                body = b"".join(chunks)
+                if srv.max_size and len(body) > srv.max_size:
+                    self._reply("552 5.3.4 Message size exceeds fixed limit")
+                else:
+                    srv.store({"session": session, "from": sender, "to": rcpts, "data": body})
+                    self._reply("250 OK queued")
+                sender, rcpts = None, []
+            elif cmd == "RSET":
+                sender, rcpts = None, []
+                self._reply("250 OK")
+            elif cmd == "NOOP":
+                self._reply("250 OK")
+            elif cmd == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+class SMTPStandin(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port: int = 0, out_dir: Optional[Path] = None, max_size: int = 0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.messages: List[Dict[str, Any]] = []
+        self.sessions = 0
+        self.out_dir = Path(out_dir) if out_dir else None
+        self.max_size = max_size
+        self._lock = threading.Lock()
+
+    def store(self, msg: Dict[str, Any]) -> None:
+        with self._lock:
+            self.messages.append(msg)
+            if self.out_dir:
+                self.out_dir.mkdir(parents=True, exist_ok=True)
+                (self.out_dir / f"{len(self.messages):05d}.eml").write_bytes(msg["data"])
+
+
+def start_server(port: int = 0, out_dir: Optional[Path] = None, max_size: int = 0) -> SMTPStandin:
+    """Start on a background thread; port 0 picks a free port (see server.server_address)."""
+    server = SMTPStandin(port, out_dir, max_size)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 2525
+    out_dir = Path(sys.argv[2]) if len(sys.argv) > 2 else None
+    max_size = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    server = start_server(port, out_dir, max_size)
+    print(f"✅ SMTP stand-in on 127.0.0.1:{server.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
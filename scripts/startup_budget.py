@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Import-time budget for the pipeline scripts (python -X importtime).
+
+For every script with a traced entry point (`with span(...)`), imports it in
+a fresh interpreter STARTUP_RUNS times (default 7) and takes the fastest
+cumulative import time of the module itself, so interpreter startup and
+site-packages hooks are not counted. A script fails the check when:
+  - it takes longer than its budget (BUDGETS_MS, else STARTUP_BUDGET_MS,
+    default 30 ms), or
+  - importing it pulls in a heavy library (HEAVY) that should only be loaded,
+    lazily, on the code path that needs it (see lazy.py).
+
+Usage:
+    python scripts/startup_budget.py [script ...] [--top N]
+
+Exit codes:
+  0 → every script within budget
+  1 → at least one script over budget or importing a heavy library eagerly
+"""
+
+import os
+import re
+import sys
+import argparse
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+# Best of DEFAULT_RUNS absorbs scheduler noise on shared CI runners, so the
+# budgets stay tight enough to catch one eager heavy import.
+DEFAULT_BUDGET_MS = 30.0
+DEFAULT_RUNS = 7
+
+# Scripts whose every path needs a slower dependency
+BUDGETS_MS = {
+    "port_guard": 60.0,     # asyncio: all probes are async
+    "service_check": 50.0,  # psutil: the process table is the whole check
+}
+
+HEAVY = {"pandas", "numpy", "matplotlib", "boto3", "botocore", "requests",
+         "jinja2", "yaml", "smtplib", "asyncio", "pyarrow"}
+
+# Allowed eager heavy imports, per script
+ALLOW_HEAVY = {
+    "port_guard": {"asyncio"},
+}
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+_ENTRY = re.compile(r'^if __name__ == "__main__":\n\s+with span\(', re.M)
+
+
+def entry_scripts() -> List[str]:
+    """Scripts run by the workflows: those that wrap main() in a span."""
+    return sorted(p.stem for p in SCRIPTS_DIR.glob("*.py")
+                  if _ENTRY.search(p.read_text(encoding="utf-8")) and p.stem != Path(__file__).stem)
+
+
+def import_profile(module: str) -> List[Tuple[str, int, int, int]]:
+    """(module, self µs, cumulative µs, depth) for every import `import module` triggers."""
+    env = dict(os.environ, PYTHONPATH=str(SCRIPTS_DIR))
+    r = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                       capture_output=True, text=True, cwd=SCRIPTS_DIR, env=env)
+    if r.returncode != 0:
+        raise RuntimeError(r.stderr.strip().splitlines()[-1] if r.stderr.strip() else f"exit {r.returncode}")
+    rows = []
+    for line in r.stderr.splitlines():
+        m = _LINE.match(line)
+        if m:
+            rows.append((m.group(4), int(m.group(1)), int(m.group(2)), len(m.group(3)) // 2))
+    return rows
+
+
+def subtree(rows: List[Tuple[str, int, int, int]], module: str) -> Tuple[int, List[Tuple[str, int, int, int]]]:
+    """Cumulative µs of `module` and the imports it triggered (importtime lists children before parents)."""
+    for i, (name, _, cum, depth) in enumerate(rows):
+        if name == module and depth == 0:
+            start = i
+            while start > 0 and rows[start - 1][3] > 0:
+                start -= 1
+            return cum, rows[start:i]
+    return 0, []
+
+
+def measure(module: str, runs: int) -> Dict[str, Any]:
+    best = None
+    for _ in range(runs):
+        total, rows = subtree(import_profile(module), module)
+        if best is None or total < best[0]:
+            best = (total, rows)
+    total, rows = best
+    # Direct children of the script: where its own import time goes
+    children = sorted(((cum, name) for name, _, cum, depth in rows if depth == 1), reverse=True)
+    loaded = {name.split(".")[0] for name, *_ in rows}
+    return {"module": module, "ms": total / 1000, "children": children, "heavy": sorted(loaded & HEAVY)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("scripts", nargs="*", help="module names (default: every traced entry script)")
+    ap.add_argument("--top", type=int, default=3, help="slowest imports to show per script")
+    args = ap.parse_args()
+
+    runs = int(os.getenv("STARTUP_RUNS", DEFAULT_RUNS))
+    default_budget = float(os.getenv("STARTUP_BUDGET_MS", DEFAULT_BUDGET_MS))
+    failed = []
+    print(f"⏱️  Import-time budget (best of {runs} runs)")
+    for module in args.scripts or entry_scripts():
+        try:
+            res = measure(module, runs)
+        except RuntimeError as e:
+            print(f"  ❌ {module}: import failed: {e}")
+            failed.append(module)
+            continue
+        budget = BUDGETS_MS.get(module, default_budget)
+        eager = [h for h in res["heavy"] if h not in ALLOW_HEAVY.get(module, set())]
+        ok = res["ms"] <= budget and not eager
+        top = ", ".join(f"{name} {cum / 1000:.1f}" for cum, name in res["children"][:args.top])
+        print(f"  {'✅' if ok else '❌'} {module:<20}{res['ms']:>7.1f} ms / {budget:.0f} ms   [{top}]")
+        if eager:
+            print(f"     ↳ imports {', '.join(eager)} at import time; load it lazily on the path that needs it")
+        if not ok:
+            failed.append(module)
+
+    if failed:
+        print(f"❌ Over startup budget: {', '.join(failed)}")
+        sys.exit(1)
+    print("✅ All scripts within startup budget.")
+
+
+if __name__ == "__main__":
+    main()
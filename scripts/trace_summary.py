@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Summarize the span trace written by instrument.py: where the minutes go.
+
+Reads TRACE_FILE (default logs/trace.jsonl, plus its rotated .1, .2, ...;
+several files or globs may be given, e.g. traces downloaded from many CI
+runs) and prints:
+  - per-run totals (wall time of the top-level script spans),
+  - the slowest gates (spans named gate:*) across runs: count, p50, p95, max,
+    and the change of the latest run versus the median of the earlier ones,
+  - the slowest spans overall, by total wall time.
+
+Usage:
+    python scripts/trace_summary.py [trace.jsonl ...] [--top N] [--chrome out.json]
+
+--chrome also writes a Chrome trace (chrome://tracing / Perfetto) with one
+complete event per span.
+"""
+
+import glob
+import json
+import argparse
+from pathlib import Path
+from statistics import median
+from typing import Any, Dict, List
+
+from instrument import trace_files, trace_path
+
+
+def load_spans(paths: List[str]) -> List[Dict[str, Any]]:
+    spans = []
+    for pattern in paths:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            spans.append(json.loads(line))
+                        except ValueError:
+                            continue  # torn line from a crashed writer
+            except OSError:
+                print(f"⚠️  cannot read {path}")
+    return sorted(spans, key=lambda s: s.get("start", 0))
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def by_name(spans: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for s in spans:
+        groups.setdefault(s["name"], []).append(s)
+    return groups
+
+
+def gate_table(spans: List[Dict[str, Any]], top: int) -> List[Dict[str, Any]]:
+    rows = []
+    for name, group in by_name([s for s in spans if s["name"].startswith("gate:")]).items():
+        walls = [s["wall_s"] for s in group]
+        earlier = walls[:-1]
+        trend = (walls[-1] / median(earlier) - 1) * 100 if earlier and median(earlier) > 0 else None
+        rows.append({"name": name, "count": len(walls), "p50": percentile(walls, 50),
+                     "p95": percentile(walls, 95), "max": max(walls), "last": walls[-1], "trend_pct": trend,
+                     "failures": sum(1 for s in group if s.get("status") != "ok")})
+    return sorted(rows, key=lambda r: r["p95"], reverse=True)[:top]
+
+
+def run_totals(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    runs: Dict[str, Dict[str, Any]] = {}
+    for s in spans:
+        if s.get("parent") is not None or s["name"].startswith("gate:"):
+            continue
+        r = runs.setdefault(s["run_id"], {"run_id": s["run_id"], "start": s["start"], "wall_s": 0.0, "scripts": 0})
+        r["wall_s"] += s["wall_s"]
+        r["scripts"] += 1
+    return sorted(runs.values(), key=lambda r: r["start"])
+
+
+def chrome_trace(spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+    t0 = min((s["start"] for s in spans), default=0)
+    events = []
+    for s in spans:
+        args = {k: s.get(k) for k in ("cpu_s", "peak_rss_mb", "io_read_bytes", "io_write_bytes",
+                                      "net_sent_bytes", "net_recv_bytes", "status", "run_id")}
+        args.update(s.get("attrs") or {})
+        events.append({"name": s["name"], "ph": "X", "ts": round((s["start"] - t0) * 1e6),
+                       "dur": round(s["wall_s"] * 1e6), "pid": s["pid"], "tid": s.get("thread") or s["pid"],
+                       "args": args})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("traces", nargs="*", default=[str(p) for p in trace_files()] or [str(trace_path())])
+    ap.add_argument("--top", type=int, default=10)
+    ap.add_argument("--chrome", help="also write a Chrome trace JSON here")
+    args = ap.parse_args()
+
+    spans = load_spans(args.traces)
+    if not spans:
+        print("ℹ️  No spans recorded yet.")
+        return
+
+    runs = run_totals(spans)
+    print(f"📊 {len(spans)} spans over {len(runs)} run(s)")
+    for r in runs[-args.top:]:
+        print(f"  run {r['run_id']}: {r['wall_s']:.2f}s across {r['scripts']} script(s)")
+
+    gates = gate_table(spans, args.top)
+    if gates:
+        print("\n🐢 Slowest gates (by p95 wall time)")
+        print(f"  {'gate':<24}{'runs':>5}{'p50 s':>9}{'p95 s':>9}{'max s':>9}{'last s':>9}  trend  fails")
+        for g in gates:
+            trend = f"{g['trend_pct']:+.0f}%" if g["trend_pct"] is not None else "n/a"
+            flag = " ⚠️" if g["trend_pct"] is not None and g["trend_pct"] > 50 else ""
+            print(f"  {g['name'][5:]:<24}{g['count']:>5}{g['p50']:>9.3f}{g['p95']:>9.3f}{g['max']:>9.3f}"
+                  f"{g['last']:>9.3f}  {trend:>5}  {g['failures']:>5}{flag}")
+
+    totals = sorted(((sum(s["wall_s"] for s in g), name, len(g)) for name, g in by_name(spans).items()),
+                    reverse=True)[:args.top]
+    print("\n⏱️  Spans by total wall time")
+    for total, name, n in totals:
+        print(f"  {name:<32}{total:>10.2f}s  ({n}×)")
+
+    if args.chrome:
+        Path(args.chrome).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.chrome).write_text(json.dumps(chrome_trace(spans)), encoding="utf-8")
+        print(f"\n✅ Chrome trace written: {args.chrome}")
+
+
+if __name__ == "__main__":
+    main()
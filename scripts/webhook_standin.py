@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local stand-in for Slack/Teams/generic incoming webhooks, used to exercise
+notify.py without posting to a real channel.
+
+Every POST body is recorded in `server.posts` (path, JSON body, connection id)
+so callers can check digests and connection reuse. Like the real services it
+rate limits: more than `rate_per_sec` posts within a second get
+429 with Retry-After. STANDIN_FAIL_PATH makes one path always answer 500.
+
+Usage:
+    python scripts/webhook_standin.py [port] [rate_per_sec]   # default 8099, 1/s
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so clients can reuse connections
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _answer(self, code: int, headers: Dict[str, str] | None = None) -> None:
+        body = b"ok" if code < 400 else b"error"
+        self.send_response(code)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        srv: "WebhookStandin" = self.server  # type: ignore[assignment]
+        raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path == srv.fail_path:
+            self._answer(500)
+            return
+        with srv.lock:
+            now = time.monotonic()
+            srv.recent = [t for t in srv.recent if now - t < 1.0]
+            if srv.rate_per_sec and len(srv.recent) >= srv.rate_per_sec:
+                srv.throttled += 1
+                limited = True
+            else:
+                srv.recent.append(now)
+                srv.posts.append({"path": self.path, "body": json.loads(raw or b"null"),
+                                  "conn": id(self.connection)})
+                limited = False
+        if limited:
+            self._answer(429, {"Retry-After": "1"})
+        else:
+            self._answer(200)
+
+
+class WebhookStandin(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, rate_per_sec: int = 1, fail_path: str = ""):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.rate_per_sec = rate_per_sec
+        self.fail_path = fail_path
+        self.posts: List[Dict[str, Any]] = []
+        self.recent: List[float] = []
+        self.throttled = 0
+        self.lock = threading.Lock()
+
+
+def start_server(port: int = 0, rate_per_sec: int = 1, fail_path: str = "") -> WebhookStandin:
+    """Start on a background thread; port 0 picks a free port (see server.server_address)."""
+    server = WebhookStandin(port, rate_per_sec, fail_path)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8099
+    rate = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    server = start_server(port, rate, os.getenv("STANDIN_FAIL_PATH", ""))
+    print(f"✅ Webhook stand-in on http://127.0.0.1:{server.server_address[1]}/<any path>")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"{len(server.posts)} post(s), {server.throttled} throttled")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Shared fixtures for the unit tests. Scripts are imported straight from
+scripts/, as they import each other; spans are not written.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "scripts"))
+
+
+@pytest.fixture(autouse=True)
+def no_trace(monkeypatch):
+    monkeypatch.setenv("TRACE", "0")
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    """
+    Run in an empty checkout under tmp_path. Returns configure(**overrides),
+    which writes configs/env.yaml as the shipped one with every env
+    overridden, and returns dev's config.
+    """
+    import yaml
+    import read_config
+
+    base = yaml.safe_load((ROOT / "configs" / "env.yaml").read_text(encoding="utf-8"))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("APP_ENV", "dev")
+    monkeypatch.setenv("CONFIG_CACHE", "0")
+    monkeypatch.delenv("CONFIG_PATH", raising=False)
+    monkeypatch.delenv("ARTIFACT_CACHE_DIR", raising=False)
+    read_config.clear_cache()
+
+    def configure(**overrides):
+        cfg = {env: dict(values) for env, values in base.items()}
+        for values in cfg.values():
+            values.update(overrides)
+        path = tmp_path / "configs" / "env.yaml"
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(yaml.safe_dump(cfg, sort_keys=False), encoding="utf-8")
+        return cfg["dev"]
+
+    return configure
+
+
+@pytest.fixture
+def s3(tmp_path, monkeypatch):
+    """A FakeS3Client that s3_download.s3_client() hands out, with AWS env set."""
+    import s3_download
+    from fake_s3 import FakeS3Client
+
+    client = FakeS3Client(tmp_path / "fake-s3")
+    monkeypatch.setattr(s3_download, "s3_client", lambda *a, **k: client)
+    for var in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_DEFAULT_REGION"):
+        monkeypatch.setenv(var, "test")
+    return client
@@ -0,0 +1,136 @@
+"""artifact_cache.py single-flight fills and LRU eviction, and model_refresh's fallback when the cache fails."""
+
+import time
+import hashlib
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import artifact_cache
+import model_refresh
+from artifact_cache import ArtifactCache, CacheError
+
+KEY = "s3://b/models/m.pkl@etag1"
+
+
+def filler(data, calls=None, delay=0.0):
+    def fill(part):
+        if calls is not None:
+            calls.append(part)
+        time.sleep(delay)
+        part.write_bytes(data)
+        return hashlib.sha256(data).hexdigest()
+    return fill
+
+
+def miss(part):
+    raise AssertionError("cache miss")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Strictly increasing last_used stamps, so LRU order never ties."""
+    ticks = iter(range(1, 10**6))
+    monkeypatch.setattr(artifact_cache, "time", SimpleNamespace(time=lambda: float(next(ticks))))
+
+
+def test_concurrent_misses_fill_once(tmp_path):
+    data, calls, results = b"model bytes" * 1000, [], []
+    barrier = threading.Barrier(6)
+
+    def worker(i):
+        cache = ArtifactCache(tmp_path / "cache")  # one instance per "process"
+        barrier.wait()
+        results.append(cache.fetch(KEY, filler(data, calls, delay=0.2), tmp_path / f"ws{i}" / "m.pkl"))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert sorted(hit for _, hit in results) == [False] + [True] * 5
+    assert {d for d, _ in results} == {hashlib.sha256(data).hexdigest()}
+    assert all((tmp_path / f"ws{i}" / "m.pkl").read_bytes() == data for i in range(6))
+
+
+def test_hit_links_out_without_filling(tmp_path):
+    cache = ArtifactCache(tmp_path / "cache")
+    cache.fetch(KEY, filler(b"abc"), tmp_path / "first")
+
+    digest, hit = cache.fetch(KEY, miss, tmp_path / "second")
+    assert hit and (tmp_path / "second").read_bytes() == b"abc"
+    assert cache.stats()["hits"] == 1
+
+
+def test_lru_eviction_keeps_recently_used(tmp_path, clock):
+    cache = ArtifactCache(tmp_path / "cache", max_bytes=250)
+    for name in ("a", "b"):
+        cache.fetch(f"s3://b/{name}@1", filler(name.encode() * 100), tmp_path / name)
+    cache.fetch("s3://b/a@1", miss, tmp_path / "a2")  # hit: a is now newer than b
+    cache.fetch("s3://b/c@1", filler(b"c" * 100), tmp_path / "c")
+
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"]) == (2, 200)
+    with pytest.raises(AssertionError):
+        cache.fetch("s3://b/b@1", miss, tmp_path / "b2")
+    assert (tmp_path / "b").read_bytes() == b"b" * 100  # linked-out copies survive eviction
+
+
+def test_shared_object_is_kept_while_another_key_uses_it(tmp_path, clock):
+    cache = ArtifactCache(tmp_path / "cache", max_bytes=150)
+    cache.fetch("s3://b/m@1", filler(b"x" * 100), tmp_path / "one")
+    cache.fetch("s3://b/m-copy@1", filler(b"x" * 100), tmp_path / "two")  # same bytes, new key
+    assert cache.stats() == {"entries": 2, "objects": 1, "bytes": 100, "hits": 0}
+
+
+def test_evicted_right_after_fill_raises_cache_error(tmp_path, monkeypatch):
+    cache = ArtifactCache(tmp_path / "cache", max_bytes=1)
+    insert = cache._insert
+
+    def insert_then_prune(*args):
+        insert(*args)
+        cache.prune()  # another process trimming the cache in between
+
+    monkeypatch.setattr(cache, "_insert", insert_then_prune)
+    with pytest.raises(CacheError):
+        cache.fetch(KEY, filler(b"x" * 10), tmp_path / "out")
+    assert not (tmp_path / "out").exists()
+
+
+@pytest.fixture
+def s3_refresh(workspace, s3):
+    data = b"weights" * 5000
+    s3.put_object(Bucket="b", Key="models/model_v2.pkl", Body=data)
+
+    def run(cache_dir=None):
+        overrides = {} if cache_dir is None else {"artifact_cache_dir": str(cache_dir)}
+        workspace(model_source="s3", model_s3_bucket="b", model_s3_prefix="models/", **overrides)
+        result = model_refresh.refresh_env("dev")
+        assert result["status"] == "updated" and result["version"] == "model_v2.pkl"
+        assert open("artifacts/current_model.pkl", "rb").read() == data
+
+    return run
+
+
+def test_refresh_downloads_directly_when_cache_dir_is_unusable(s3_refresh, tmp_path, capsys):
+    blocker = tmp_path / "not-a-dir"
+    blocker.write_text("")
+    s3_refresh(blocker / "cache")
+    assert "Shared artifact cache unavailable" in capsys.readouterr().out
+
+
+def test_refresh_downloads_directly_when_cache_fetch_fails(s3_refresh, tmp_path, monkeypatch, capsys):
+    def evicted(self, key, fill, dest):
+        raise CacheError(f"{key} was evicted right after it was cached")
+
+    monkeypatch.setattr(ArtifactCache, "fetch", evicted)
+    s3_refresh(tmp_path / "cache")
+    assert "Shared artifact cache failed" in capsys.readouterr().out
+
+
+def test_shipped_config_leaves_the_cache_off(s3_refresh, monkeypatch):
+    monkeypatch.setattr(ArtifactCache, "__init__", miss)
+    s3_refresh()
@@ -0,0 +1,118 @@
+"""deploy.py rollout behaviour against a local fleet of deploy_standin.py targets."""
+
+import pytest
+
+import deploy
+from deploy import HTTPTarget, plan_batches, rollout
+from deploy_standin import start_fleet, stop_fleet
+
+CFG = {"deploy_health_probes": 3, "deploy_max_parallel": 8, "deploy_soak_sec": 0}
+
+
+@pytest.fixture(scope="module")
+def servers():
+    fleet = start_fleet(6, deploy_delay=0.01, latency_ms=0.5, bad_release="r-bad", bad_error_rate=1.0)
+    yield fleet
+    stop_fleet(fleet)
+
+
+@pytest.fixture
+def fleet(servers):
+    """The shared stand-in fleet, reset to a fresh, never-deployed state."""
+    for s in servers:
+        s.release, s.deploys = None, []
+    return servers
+
+
+def targets_for(urls, cls=HTTPTarget, cfg=CFG):
+    return [cls(url, cfg) for url in urls]
+
+
+def dead_url():
+    (srv,) = start_fleet(1)
+    url = srv.url
+    stop_fleet([srv])
+    return url
+
+
+@pytest.mark.parametrize("n, kwargs, expected", [
+    (0, {}, []),
+    (1, {}, [(0, 1)]),
+    (10, {}, [(0, 1), (1, 3), (3, 7), (7, 10)]),
+    (10, {"canary": 2, "max_batch": 3}, [(0, 2), (2, 5), (5, 8), (8, 10)]),
+    (4, {"growth": 1, "max_batch": 1}, [(0, 1), (1, 2), (2, 3), (3, 4)]),
+])
+def test_plan_batches(n, kwargs, expected):
+    assert plan_batches(n, **kwargs) == expected
+
+
+def test_plan_batches_covers_every_target_once():
+    for n in range(1, 200):
+        batches = plan_batches(n, canary=3, growth=1.5, max_batch=16)
+        assert batches[0][0] == 0 and batches[-1][1] == n
+        assert all(a[1] == b[0] for a, b in zip(batches, batches[1:]))
+
+
+def test_healthy_release_reaches_every_target(fleet):
+    summary = rollout(targets_for(s.url for s in fleet), "r1", CFG)
+    assert summary["status"] == "ok"
+    assert [b["size"] for b in summary["batches"]] == [1, 2, 3]
+    assert all(s.release == "r1" for s in fleet)
+
+
+def test_regression_halts_at_canary_and_rolls_back(fleet):
+    rollout(targets_for(s.url for s in fleet), "r1", CFG)
+    summary = rollout(targets_for(s.url for s in fleet), "r-bad", CFG)
+    assert summary["status"] == "halted" and summary["halted_at"] == 0
+    assert "error rate" in summary["reason"]
+    assert summary["rolled_back"] == [fleet[0].url]
+    assert all(s.release == "r1" for s in fleet)
+    assert [s.deploys for s in fleet[1:]] == [["r1"]] * 5  # later waves never touched
+
+
+def test_deploy_failure_halts_and_rolls_back(fleet):
+    rollout(targets_for(s.url for s in fleet), "r1", CFG)
+    dead = dead_url()
+    urls = [fleet[0].url, dead, fleet[1].url, fleet[2].url]
+    summary = rollout(targets_for(urls), "r2", CFG)
+    assert summary["status"] == "halted" and summary["halted_at"] == 1
+    assert "deploy(s) failed" in summary["reason"] and dead in summary["batches"][1]["failed"]
+    assert sorted(summary["rolled_back"]) == sorted([fleet[0].url, fleet[1].url])
+    assert [s.release for s in fleet[:3]] == ["r1", "r1", "r1"]
+    assert fleet[2].deploys == ["r1"]
+
+
+class RaisingProbe(HTTPTarget):
+    """A pluggable target whose health check blows up once the new release is live."""
+
+    def probe(self):
+        if self.release() == "r2":
+            raise RuntimeError("probe crashed")
+        return super().probe()
+
+
+class RaisingRelease(HTTPTarget):
+    def release(self):
+        raise RuntimeError("release lookup crashed")
+
+
+def test_raising_probe_counts_as_unhealthy(fleet):
+    rollout(targets_for(s.url for s in fleet), "r1", CFG)
+    summary = rollout(targets_for((s.url for s in fleet), RaisingProbe), "r2", CFG)
+    assert summary["status"] == "halted" and summary["halted_at"] == 0
+    assert summary["batches"][0]["after"]["error_rate"] == 1.0
+    assert summary["rolled_back"] == [fleet[0].url] and fleet[0].release == "r1"
+
+
+def test_raising_release_is_not_restorable(fleet):
+    cfg = dict(CFG, deploy_max_error_rate=0.0)
+    summary = rollout(targets_for((s.url for s in fleet[:2]), RaisingRelease, cfg), "r-bad", cfg)
+    assert summary["status"] == "halted"
+    assert summary["rolled_back"] == [] and summary["rollback_failed"] == {}
+    assert fleet[0].release == "r-bad"
+
+
+def test_rollout_summary_written(tmp_path, fleet):
+    summary = rollout(targets_for(s.url for s in fleet[:1]), "r1", CFG)
+    deploy.write_summary(summary, tmp_path / "deploy_summary.json")
+    assert (tmp_path / "deploy_summary.json").read_text(encoding="utf-8").count('"release": "r1"') == 1
@@ -0,0 +1,19 @@
+"""generate_report.py picks up only its own env's smoke test summary."""
+
+import json
+from pathlib import Path
+
+import generate_report
+
+
+def test_report_shows_only_its_own_envs_smoke_test(workspace):
+    workspace()
+    reports = Path("reports")
+    reports.mkdir()
+    (reports / "smoketest_summary.dev.json").write_text(
+        json.dumps({"env": "dev", "model_file": "model_dev.pkl"}), encoding="utf-8")
+
+    dev = generate_report.render_report("dev").read_text(encoding="utf-8")
+    prod = generate_report.render_report("prod").read_text(encoding="utf-8")
+    assert "model_dev.pkl" in dev
+    assert "model_dev.pkl" not in prod
@@ -0,0 +1,106 @@
+"""hot_reload.py's standby swap against reload_standin.py, including how long clients stall."""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import hot_reload
+from deploy_standin import start_fleet, stop_fleet
+from reload_standin import measure_stall, start_server
+
+LOAD_SEC = 0.4
+
+
+@pytest.fixture
+def standin():
+    server = start_server(load_delay=LOAD_SEC, warmup_delay=0.1)
+    yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def model(tmp_path):
+    path = tmp_path / "model_v2.pkl"
+    path.write_bytes(b"x" * 1024)
+    return path
+
+
+def test_swap_flips_without_stalling_requests(standin, model):
+    server, base = standin
+    timings = {}
+    stall = measure_stall(base, lambda: timings.update(
+        hot_reload.swap_model(base, str(model), model.name, {}, ready_timeout=30)))
+    assert server.slots.current()["version"] == model.name
+    assert timings["preload_sec"] >= LOAD_SEC
+    assert timings["flip_sec"] < 0.05
+    # Clients keep being served by the old model while the new one loads
+    assert stall["max_request_ms"] < LOAD_SEC * 1000 / 2
+    assert stall["requests"] > 10
+
+
+def test_legacy_reload_stalls_for_the_whole_load(standin, model):
+    server, base = standin
+    stall = measure_stall(base, lambda: hot_reload.legacy_reload(
+        base + "/admin/reload", {}, json_body={"path": str(model)}))
+    assert server.slots.current()["version"] == model.name
+    assert stall["max_request_ms"] >= LOAD_SEC * 1000 * 0.9
+
+
+def test_failed_release_after_flip_only_warns(standin, model, capsys):
+    server, base = standin
+
+    def broken_release():
+        raise RuntimeError("release crashed")
+
+    server.slots.release = broken_release
+    timings = hot_reload.swap_model(base, str(model), model.name, {}, ready_timeout=30)
+    assert timings["previous"] is None
+    assert server.slots.current()["version"] == model.name
+    assert "releasing the previous model failed" in capsys.readouterr().out
+
+
+def test_server_without_standby_api_is_reported():
+    (srv,) = start_fleet(1)  # answers 404 for everything under /admin/models/
+    try:
+        with pytest.raises(hot_reload.StandbyUnsupported):
+            hot_reload.swap_model(srv.url, "/tmp/m.pkl", "m.pkl", {}, ready_timeout=1)
+    finally:
+        stop_fleet([srv])
+
+
+class _FlakyStandby(BaseHTTPRequestHandler):
+    """Accepts the preload, then answers the standby poll with an HTML 502 page."""
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, code, body, ctype):
+        data = body.encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self._send(202, json.dumps({"state": "loading"}), "application/json")
+
+    def do_GET(self):
+        self._send(502, "<html>Bad Gateway</html>", "text/html")
+
+
+def test_non_json_standby_errors_time_out_cleanly():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FlakyStandby)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with pytest.raises(hot_reload.ReloadError, match="unavailable.*502"):
+            hot_reload.swap_model(f"http://127.0.0.1:{server.server_address[1]}",
+                                  "/tmp/m.pkl", "m.pkl", {}, ready_timeout=0.3)
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,56 @@
+"""lazy.py: deferred imports, and eager ones once threads are involved."""
+
+import sys
+import threading
+from types import ModuleType
+
+import pytest
+
+import lazy
+
+
+@pytest.fixture
+def make_module(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(str(tmp_path))
+    names = []
+
+    def make_module(name):
+        (tmp_path / f"{name}.py").write_text("import builtins\nbuiltins.lazy_runs = getattr(builtins, 'lazy_runs', 0) + 1\n"
+                                             "VALUE = 42\n", encoding="utf-8")
+        names.append(name)
+        return name
+
+    yield make_module
+    import builtins
+    builtins.__dict__.pop("lazy_runs", None)
+    for name in names:
+        sys.modules.pop(name, None)
+        lazy._pending.pop(name, None)
+
+
+def test_module_body_runs_on_first_use_or_load_pending(make_module, monkeypatch):
+    import builtins
+    monkeypatch.setattr(threading, "active_count", lambda: 1)  # servers left by other tests don't count
+    builtins.lazy_runs = 0
+    a = lazy.lazy_import(make_module("lazy_probe_a"))
+    b = lazy.lazy_import(make_module("lazy_probe_b"))
+    assert builtins.lazy_runs == 0
+    assert a.VALUE == 42 and builtins.lazy_runs == 1
+
+    lazy.load_pending()
+    assert builtins.lazy_runs == 2 and type(b) is ModuleType  # b is a plain, fully loaded module now
+    assert lazy._pending == {}
+
+
+def test_imports_eagerly_while_other_threads_run(make_module):
+    import builtins
+    builtins.lazy_runs = 0
+    stop = threading.Event()
+    th = threading.Thread(target=stop.wait, daemon=True)
+    th.start()
+    try:
+        mod = lazy.lazy_import(make_module("lazy_probe_c"))
+    finally:
+        stop.set()
+        th.join()
+    assert builtins.lazy_runs == 1 and type(mod) is ModuleType
@@ -0,0 +1,79 @@
+"""maintenance.py DAG: fingerprint skips, failure propagation and steps that can never run."""
+
+from pathlib import Path
+
+import pytest
+
+import maintenance
+
+
+@pytest.fixture
+def make_step(workspace):
+    workspace()
+    Path("steps").mkdir()
+
+    def make_step(name, needs=(), inputs=(), rc=0):
+        """A step whose script logs its run, writes out/<name> and exits with rc."""
+        script = Path("steps") / f"{name}.py"
+        script.write_text(
+            "import pathlib, sys\n"
+            f"with open('runs.log', 'a') as f: f.write('{name}\\n')\n"
+            "pathlib.Path('out').mkdir(exist_ok=True)\n"
+            f"pathlib.Path('out/{name}').write_text('done')\n"
+            f"sys.exit({rc})\n", encoding="utf-8")
+        return {"name": name, "script": str(script), "needs": list(needs),
+                "inputs": None if inputs is None else list(inputs), "outputs": [f"out/{name}"]}
+
+    return make_step
+
+
+def runs():
+    log = Path("runs.log")
+    runs = log.read_text(encoding="utf-8").split() if log.exists() else []
+    log.unlink(missing_ok=True)
+    return sorted(runs)
+
+
+def test_unchanged_inputs_skip_and_a_change_reruns_downstream(make_step):
+    Path("data.txt").write_text("v1", encoding="utf-8")
+    steps = [make_step("fetch", inputs=None),  # no declared inputs: always runs
+             make_step("build", needs=["fetch"], inputs=["data.txt"]),
+             make_step("publish", needs=["build"], inputs=["out/build"])]
+
+    assert set(maintenance.run_dag(steps, "dev").values()) == {"ok"}
+    assert runs() == ["build", "fetch", "publish"]
+
+    assert maintenance.run_dag(steps, "dev") == {"fetch": "ok", "build": "skipped", "publish": "skipped"}
+    assert runs() == ["fetch"]
+    assert maintenance.run_dag(steps, "prod")["build"] == "ok"  # state is per env
+    runs()
+
+    Path("data.txt").write_text("v2", encoding="utf-8")
+    assert maintenance.run_dag(steps, "dev")["build"] == "ok"
+    assert runs() == ["build", "fetch"]  # build rewrote the same bytes: publish stays skipped
+
+    Path("out/build").unlink()  # a missing output forces a rerun
+    assert maintenance.run_dag(steps, "dev")["build"] == "ok"
+    assert maintenance.run_dag(steps, "dev", force=True) == {"fetch": "ok", "build": "ok", "publish": "ok"}
+
+
+def test_a_failure_blocks_only_its_dependents_and_is_retried(make_step):
+    steps = [make_step("a", inputs=[]),
+             make_step("b", needs=["a"], inputs=[], rc=3),
+             make_step("c", needs=["b"], inputs=[]),
+             make_step("d", needs=["a"], inputs=[])]
+    assert maintenance.run_dag(steps, "dev") == {"a": "ok", "b": "failed", "c": "blocked", "d": "ok"}
+    assert runs() == ["a", "b", "d"]
+
+    # Nothing changed, but b has no successful run on record
+    assert maintenance.run_dag(steps, "dev") == {"a": "skipped", "b": "failed", "c": "blocked", "d": "skipped"}
+    assert runs() == ["b"]
+
+
+def test_cycles_and_unknown_needs_are_blocked_not_hung(make_step):
+    steps = [make_step("a", inputs=[]),
+             make_step("b", needs=["c"], inputs=[]),
+             make_step("c", needs=["b"], inputs=[]),
+             make_step("d", needs=["missing"], inputs=[])]
+    assert maintenance.run_dag(steps, "dev") == {"a": "ok", "b": "blocked", "c": "blocked", "d": "blocked"}
+    assert runs() == ["a"]
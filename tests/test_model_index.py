@@ -0,0 +1,114 @@
+"""model_index.py incremental manifest, publish-order check, and pointer fallbacks against fake_s3."""
+
+import os
+import json
+
+import pytest
+
+import model_index
+
+BUCKET, PREFIX = "b", "models/"
+
+
+@pytest.fixture
+def cfg(tmp_path):
+    return {"model_index_path": str(tmp_path / "index.json"), "model_index_max_age_hours": 24}
+
+
+@pytest.fixture
+def listings(s3, monkeypatch):
+    """StartAfter of every list_objects_v2 call ("" for a full listing)."""
+    seen = []
+    real = s3.list_objects_v2
+
+    def list_objects_v2(**kw):
+        if not kw.get("ContinuationToken"):
+            seen.append(kw.get("StartAfter", ""))
+        return real(**kw)
+
+    monkeypatch.setattr(s3, "list_objects_v2", list_objects_v2)
+    return seen
+
+
+def put(s3, name, mtime):
+    s3.put_object(Bucket=BUCKET, Key=PREFIX + name, Body=name.encode())
+    os.utime(s3._path(BUCKET, PREFIX + name), (mtime, mtime))
+
+
+def latest(s3, cfg, strategy="manifest"):
+    found = model_index.find_latest(s3, BUCKET, PREFIX, {**cfg, "model_s3_index": strategy})
+    return found and found["Key"].removeprefix(PREFIX)
+
+
+def test_manifest_lists_only_keys_after_the_cursor(s3, cfg, listings):
+    for i, name in enumerate(["m_01.pkl", "m_02.pkl", "m_03.json"]):
+        put(s3, name, 1000 + i)
+    assert latest(s3, cfg) == "m_02.pkl"
+    put(s3, "m_04.pkl", 2000)
+    assert latest(s3, cfg) == "m_04.pkl"
+    assert latest(s3, cfg) == "m_04.pkl"
+    assert listings == ["", PREFIX + "m_02.pkl", PREFIX + "m_04.pkl"]
+    manifest = json.loads(open(cfg["model_index_path"]).read())
+    assert [e["key"] for e in manifest["objects"]] == [PREFIX + k for k in ("m_01.pkl", "m_02.pkl", "m_04.pkl")]
+
+
+def test_keys_out_of_publish_order_warn_and_list_once_per_run(s3, cfg, listings, capsys):
+    put(s3, "model_v9.pkl", 1000)
+    put(s3, "model_v10.pkl", 2000)  # newest, but sorts first
+    assert latest(s3, cfg) == "model_v10.pkl"
+    assert listings == [""]  # the rebuild's own listing answered
+    assert "don't sort in publish order" in capsys.readouterr().out
+
+    assert latest(s3, cfg) == "model_v10.pkl"
+    assert listings == ["", PREFIX + "model_v9.pkl", ""]  # cursor check + one full scan
+    assert os.path.exists(cfg["model_index_path"])  # kept: no rebuild every run
+
+
+def test_out_of_order_key_published_later_is_caught_at_the_next_rebuild(s3, cfg, capsys):
+    put(s3, "model_v8.pkl", 1000)
+    put(s3, "model_v9.pkl", 2000)
+    assert latest(s3, cfg) == "model_v9.pkl"
+    put(s3, "model_v10.pkl", 3000)
+    cfg["model_index_max_age_hours"] = 0
+    assert latest(s3, cfg) == "model_v10.pkl"
+    assert "don't sort in publish order" in capsys.readouterr().out
+
+
+def test_deleted_latest_rebuilds_the_index(s3, cfg, listings):
+    put(s3, "m_01.pkl", 1000)
+    put(s3, "m_02.pkl", 2000)
+    assert latest(s3, cfg) == "m_02.pkl"
+    os.unlink(s3._path(BUCKET, PREFIX + "m_02.pkl"))
+    assert latest(s3, cfg) == "m_01.pkl"
+    assert listings == ["", PREFIX + "m_02.pkl", ""]
+    assert latest(s3, cfg) == "m_01.pkl"
+
+
+def test_stale_or_foreign_manifest_is_rebuilt(s3, cfg, listings):
+    put(s3, "m_01.pkl", 1000)
+    latest(s3, cfg)
+    model_index.find_latest(s3, BUCKET, "other/", {**cfg, "model_s3_index": "manifest"})
+    assert listings == ["", ""]
+
+
+def test_pointer_answers_without_listing(s3, cfg, listings):
+    put(s3, "m_01.pkl", 1000)
+    put(s3, "m_02.pkl", 2000)
+    s3.put_object(Bucket=BUCKET, Key=PREFIX + "latest.json", Body=json.dumps({"key": PREFIX + "m_01.pkl"}))
+    assert latest(s3, cfg, "pointer") == "m_01.pkl"
+    assert listings == []
+
+
+@pytest.mark.parametrize("pointer", [None, b"not json", json.dumps({"key": PREFIX + "gone.pkl"}).encode()])
+def test_pointer_falls_back_to_manifest(s3, cfg, listings, pointer):
+    put(s3, "m_01.pkl", 1000)
+    put(s3, "m_02.pkl", 2000)
+    if pointer is not None:
+        s3.put_object(Bucket=BUCKET, Key=PREFIX + "latest.json", Body=pointer)
+    assert latest(s3, cfg, "pointer") == "m_02.pkl"
+    assert listings == [""]
+
+
+def test_unknown_strategy(s3, cfg):
+    with pytest.raises(ValueError):
+        latest(s3, cfg, "bogus")
@@ -0,0 +1,61 @@
+"""model_smoketest.py per-env summaries and baselines, and peak RSS scoped to the model load."""
+
+import json
+import os
+import pickle
+from pathlib import Path
+
+import pytest
+
+import model_smoketest
+
+
+@pytest.fixture
+def model(workspace):
+    # A plain pickle, so loading really allocates (mapped pickle5 buffers would not)
+    path = Path("artifacts/models/model_v1.pkl").resolve()
+    path.parent.mkdir(parents=True)
+    path.write_bytes(pickle.dumps(bytearray(64 * 2**20)))
+    for link in ("artifacts/current_model.pkl", "artifacts/prod/current_model.pkl"):
+        Path(link).parent.mkdir(parents=True, exist_ok=True)
+        os.symlink(path, link)
+    workspace(smoketest_mode="load")
+    return path
+
+
+def run(env, monkeypatch):
+    monkeypatch.setenv("APP_ENV", env)
+    model_smoketest.main()
+    return json.loads(Path(f"reports/smoketest_summary.{env}.json").read_text(encoding="utf-8"))
+
+
+@pytest.mark.skipif(not model_smoketest.reset_peak_rss(), reason="needs /proc/self/clear_refs")
+def test_peak_rss_is_the_loads_not_this_process(model):
+    ballast = bytearray(512 * 2**20)
+    ballast[::4096] = b"x" * len(ballast[::4096])  # fault it in: the process peak is now > 512 MB
+    del ballast
+    metrics = model_smoketest.measure_load(model, {})
+    assert metrics["model_type"] == "bytearray"
+    assert 64 <= metrics["rss_growth_mb"] and metrics["peak_rss_mb"] < 512
+
+
+def test_each_env_keeps_its_own_summary_and_baseline(model, monkeypatch):
+    dev = run("dev", monkeypatch)
+    assert dev["env"] == "dev" and dev["baseline"] is None
+
+    # A legacy shared summary from another env is not a baseline for this one
+    Path("reports/smoketest_summary.json").write_text(json.dumps(dev), encoding="utf-8")
+    assert model_smoketest.read_summary(Path("reports"), "prod") is None
+
+    v2 = model.with_name("model_v2.pkl")
+    v2.write_bytes(model.read_bytes())
+    Path("artifacts/prod/current_model.pkl").unlink()
+    os.symlink(v2, "artifacts/prod/current_model.pkl")
+    prod = run("prod", monkeypatch)
+    assert prod["env"] == "prod" and prod["baseline"] is None  # not dev's v1
+
+    Path("artifacts/current_model.pkl").unlink()
+    os.symlink(v2, "artifacts/current_model.pkl")
+    dev2 = run("dev", monkeypatch)
+    assert dev2["baseline"]["model_file"] == str(model)
+    assert model_smoketest.read_summary(Path("reports"), "prod")["timestamp"] == prod["timestamp"]
@@ -0,0 +1,110 @@
+"""model_store.py content-addressed adopt/link and retention."""
+
+import os
+import hashlib
+
+import pytest
+
+from model_store import ModelStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ModelStore(tmp_path / "store")
+
+
+@pytest.fixture
+def models(tmp_path):
+    d = tmp_path / "models"
+    d.mkdir()
+    return d
+
+
+def publish(store, models, version, data, n):
+    """Add data as `version` (the n-th one, for a stable added_at order) and link it into models/."""
+    incoming = models.parent / "incoming"
+    incoming.write_bytes(data)
+    digest = store.add_file(incoming, etag=f'"etag-{version}"')
+    store.link(digest, models / version, version)
+    store.index["refs"][version]["added_at"] = f"2026-01-01T00:00:{n:02d}+00:00"
+    return digest
+
+
+def objects(store):
+    return sorted(p.name for p in store.objects.glob("*/*"))
+
+
+def test_link_is_a_read_only_hard_link_and_same_bytes_are_stored_once(store, models):
+    d1 = publish(store, models, "model_v1.pkl", b"weights", 1)
+    d2 = publish(store, models, "model_v2.pkl", b"weights", 2)  # republished under a new name
+    assert d1 == d2 == hashlib.sha256(b"weights").hexdigest()
+    assert objects(store) == [d1]
+    assert os.path.samefile(models / "model_v1.pkl", store.object_path(d1))
+    assert os.path.samefile(models / "model_v2.pkl", store.object_path(d1))
+    assert store.object_path(d1).stat().st_mode & 0o222 == 0
+    assert store.digest_for(etag='"etag-v1"') is None
+    assert store.digest_for(etag='"etag-model_v1.pkl"') == d1
+
+
+def test_gc_keeps_newest_and_pinned_and_drops_the_rest(store, models):
+    digests = [publish(store, models, f"model_v{i}.pkl", f"v{i}".encode() * 100, i) for i in range(1, 6)]
+    stats = store.gc(keep=2, pinned=["model_v1.pkl"])  # v1: still in the release history
+
+    assert sorted(store.index["refs"]) == ["model_v1.pkl", "model_v4.pkl", "model_v5.pkl"]
+    assert objects(store) == sorted([digests[0], digests[3], digests[4]])
+    assert sorted(p.name for p in models.iterdir()) == ["model_v1.pkl", "model_v4.pkl", "model_v5.pkl"]
+    assert stats == {"refs": 2, "objects": 2, "bytes": 400}
+    assert sorted(store.index["etags"]) == ['"etag-model_v1.pkl"', '"etag-model_v4.pkl"', '"etag-model_v5.pkl"']
+
+
+def test_gc_keeps_an_object_another_ref_still_links(store, models):
+    shared = publish(store, models, "model_v1.pkl", b"same", 1)
+    publish(store, models, "model_v2.pkl", b"other", 2)
+    publish(store, models, "model_v3.pkl", b"same", 3)
+    store.gc(keep=2)
+    assert "model_v1.pkl" not in store.index["refs"] and not (models / "model_v1.pkl").exists()
+    assert store.has(shared) and (models / "model_v3.pkl").read_bytes() == b"same"
+
+
+def test_gc_removes_orphan_objects(store, models):
+    publish(store, models, "model_v1.pkl", b"kept", 1)
+    orphan = store.object_path("ab" + "0" * 62)
+    orphan.parent.mkdir(parents=True, exist_ok=True)
+    orphan.write_bytes(b"left behind by an interrupted refresh")
+    assert store.gc(keep=5)["objects"] == 1
+    assert not orphan.exists() and objects(store) == [hashlib.sha256(b"kept").hexdigest()]
+
+
+def test_max_bytes_drops_oldest_unpinned(store, models):
+    for i in range(1, 4):
+        publish(store, models, f"model_v{i}.pkl", bytes([i]) * 100, i)
+    store.gc(keep=5, max_bytes=150, pinned=["model_v1.pkl"])
+    assert sorted(store.index["refs"]) == ["model_v1.pkl"]
+    assert store.usage_bytes() == 100
+
+
+def test_adopted_files_are_recorded_but_never_touched(store, models):
+    user_file = models / "model_local.pkl"
+    user_file.write_bytes(b"user's model")
+    user_file.chmod(0o644)
+    before = user_file.stat()
+
+    digest = store.adopt(user_file)
+    assert store.adopt(user_file) == digest  # unchanged stamp: not re-hashed or re-recorded
+    store.index["refs"]["model_local.pkl"]["added_at"] = "2026-01-01T00:00:01+00:00"
+    publish(store, models, "model_v2.pkl", b"new", 2)
+    store.gc(keep=1)
+
+    assert "model_local.pkl" not in store.index["refs"]
+    after = user_file.stat()
+    assert user_file.read_bytes() == b"user's model"
+    assert (after.st_ino, after.st_mode, after.st_nlink) == (before.st_ino, before.st_mode, before.st_nlink)
+    assert not store.has(digest)
+
+
+def test_index_survives_reopen(store, models, tmp_path):
+    digest = publish(store, models, "model_v1.pkl", b"x", 1)
+    store.save()
+    again = ModelStore(tmp_path / "store")
+    assert again.index["refs"]["model_v1.pkl"]["digest"] == digest
+    assert again.digest_for(sha256=digest) == digest
@@ -0,0 +1,118 @@
+"""notify.py digests, retries and rate limits against a local webhook_standin.py server."""
+
+import json
+import time
+
+import pytest
+
+from notify import read_spool, run_dispatcher, spool_alert, target_id
+from webhook_standin import start_server
+
+
+@pytest.fixture
+def server():
+    srv = start_server(rate_per_sec=0)
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+@pytest.fixture
+def spool(tmp_path, monkeypatch):
+    monkeypatch.setenv("ALERT_MAX_RETRIES", "5")
+    return tmp_path / "spool"
+
+
+def target(server, path="/hook", fmt="slack", **kw):
+    return {"url": f"http://127.0.0.1:{server.server_address[1]}{path}", "format": fmt,
+            "rate_per_sec": 100.0, "burst": 100, **kw}
+
+
+def alert(text, env="dev"):
+    return {"env": env, "text": text, "ts": time.time()}
+
+
+def test_burst_goes_out_as_one_digest(server, spool):
+    t = target(server)
+    for text in ("disk full", "disk full", "port busy"):
+        spool_alert(spool, alert(text), [t])
+    assert run_dispatcher(spool, [t], window=0) is True
+    (post,) = server.posts
+    assert post["body"]["text"].splitlines() == ["🚨 3 alerts", "• [dev] disk full (×2)", "• [dev] port busy"]
+    assert read_spool(spool) == []
+
+
+def test_lone_alert_is_sent_without_waiting_for_the_window(server, spool):
+    t = target(server)
+    spool_alert(spool, alert("only one"), [t])
+    start = time.monotonic()
+    assert run_dispatcher(spool, [t], window=30) is True
+    assert time.monotonic() - start < 5
+    assert [p["body"] for p in server.posts] == [{"text": "only one"}]
+
+
+def test_429_is_retried_after_retry_after(server, spool, monkeypatch):
+    monkeypatch.setenv("ALERT_MAX_LINES", "1")
+    server.rate_per_sec = 1
+    t = target(server, fmt="generic")
+    for i in range(3):
+        spool_alert(spool, alert(f"a{i}"), [t])
+    assert run_dispatcher(spool, [t], window=0) is True
+    assert server.throttled >= 1
+    assert [p["body"]["alerts"][0]["text"] for p in server.posts] == ["a0", "a1", "a2"]
+
+
+def test_token_bucket_paces_posts_per_target(server, spool, monkeypatch):
+    monkeypatch.setenv("ALERT_MAX_LINES", "1")
+    t = target(server, fmt="generic", rate_per_sec=5.0, burst=1)
+    for i in range(4):
+        spool_alert(spool, alert(f"a{i}"), [t])
+    start = time.monotonic()
+    assert run_dispatcher(spool, [t], window=0) is True
+    assert time.monotonic() - start >= 0.55  # 3 waits of 1/5 s after the first token
+    assert len(server.posts) == 4 and server.throttled == 0
+
+
+def test_failed_target_is_kept_and_resent_next_run(server, spool, monkeypatch):
+    monkeypatch.setenv("ALERT_MAX_RETRIES", "0")
+    server.fail_path = "/down"
+    ok, down = target(server, "/ok"), target(server, "/down")
+    spool_alert(spool, alert("deploy failed"), [ok, down])
+
+    assert run_dispatcher(spool, [ok, down], window=0) is False
+    ((path, kept),) = read_spool(spool)
+    assert kept["targets"] == [target_id(down)] and kept["attempts"] == 1
+    raw = path.read_text(encoding="utf-8")
+    assert "127.0.0.1" not in raw and "http" not in raw  # webhook URLs are secrets
+    assert spool.stat().st_mode & 0o777 == 0o700 and path.stat().st_mode & 0o777 == 0o600
+
+    server.fail_path = ""
+    assert run_dispatcher(spool, [ok, down], window=0) is True
+    assert [p["path"] for p in server.posts] == ["/ok", "/down"]
+    assert read_spool(spool) == []
+
+
+def test_alert_for_unconfigured_target_waits_for_a_dispatcher_that_has_it(server, spool):
+    mine, other = target(server, "/mine"), target(server, "/other")
+    spool_alert(spool, alert("for other"), [other])
+    spool_alert(spool, alert("for me"), [mine])
+
+    assert run_dispatcher(spool, [mine], window=0) is True
+    assert [p["body"] for p in server.posts] == [{"text": "for me"}]
+    ((_, kept),) = read_spool(spool)
+    assert kept["text"] == "for other"
+
+    assert run_dispatcher(spool, [other], window=0) is True
+    assert (server.posts[-1]["path"], server.posts[-1]["body"]) == ("/other", {"text": "for other"})
+
+
+def test_max_attempts_drops_the_alert(server, spool, monkeypatch):
+    monkeypatch.setenv("ALERT_MAX_RETRIES", "0")
+    monkeypatch.setenv("ALERT_MAX_ATTEMPTS", "2")
+    server.fail_path = "/down"
+    down = target(server, "/down")
+    spool_alert(spool, alert("never delivered"), [down])
+    assert run_dispatcher(spool, [down], window=0) is False
+    assert json.loads(read_spool(spool)[0][0].read_text())["attempts"] == 1
+    assert run_dispatcher(spool, [down], window=0) is False
+    assert read_spool(spool) == []
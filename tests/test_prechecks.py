@@ -0,0 +1,67 @@
+"""prechecks.run_all: per-gate timeouts from gate start, bounded concurrency and captured output."""
+
+import sys
+import textwrap
+
+import pytest
+
+from prechecks import run_all
+
+
+@pytest.fixture
+def gate_modules(tmp_path, monkeypatch):
+    """Write tiny gate modules whose main() logs its start, sleeps, then fails or passes."""
+    monkeypatch.syspath_prepend(str(tmp_path))
+    log = tmp_path / "started.log"
+
+    def make(name, sleep, code=0, body=""):
+        (tmp_path / f"{name}.py").write_text(textwrap.dedent(f"""
+            import sys, time, threading
+            def main():
+                with open({str(log)!r}, "a") as f:
+                    f.write("{name}\\n")
+                {body}
+                time.sleep({sleep})
+                print("{name} done")
+                if {code}:
+                    sys.exit({code})
+        """), encoding="utf-8")
+        sys.modules.pop(name, None)
+        return name, name
+
+    make.started = lambda: log.read_text().split() if log.exists() else []
+    return make
+
+
+def test_queued_gates_get_their_full_timeout(gate_modules):
+    gates = [gate_modules(f"slow_gate_{i}", 0.3) for i in range(3)]
+    results = run_all(gates, timeout=0.5, workers=1)  # 0.9 s in total, 0.3 s each
+    assert [r["status"] for r in results] == ["pass"] * 3
+
+
+def test_timed_out_gate_keeps_its_slot_and_the_rest_use_the_others(gate_modules):
+    gates = [gate_modules("hung_gate", 1), gate_modules("quick_gate", 0.05), gate_modules("bad_gate", 0, code=3)]
+    results = run_all(gates, timeout=0.3, workers=2)
+    assert [r["status"] for r in results] == ["timeout", "pass", "fail"]
+    assert results[1]["output"] == "quick_gate done\n"
+    assert results[2]["exit_code"] == 3
+
+
+def test_gates_queued_behind_hung_gates_are_not_started(gate_modules):
+    gates = [gate_modules("stuck_gate", 1), gate_modules("never_gate", 0)]
+    results = run_all(gates, timeout=0.2, workers=1)
+    assert [r["status"] for r in results] == ["timeout", "timeout"]
+    assert "not started" in results[1]["output"]
+    assert gate_modules.started() == ["stuck_gate"]  # never more than `workers` gates running
+
+
+def test_output_of_threads_a_gate_starts_is_captured(gate_modules, capsys):
+    body = 't = threading.Thread(target=print, args=("from a helper thread",)); t.start(); t.join()'
+    results = run_all([gate_modules("threaded_gate", 0, body=body)], timeout=1, workers=1)
+    assert results[0]["output"] == "from a helper thread\nthreaded_gate done\n"
+    assert capsys.readouterr().out == ""
+
+
+def test_unloadable_gate_fails_without_blocking_others(gate_modules):
+    results = run_all([("missing", "no_such_gate_module"), gate_modules("ok_gate", 0)], timeout=1, workers=2)
+    assert [r["status"] for r in results] == ["fail", "pass"]
@@ -0,0 +1,74 @@
+"""report_index.py schema migration and per-env retention."""
+
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from report_index import SCHEMA_VERSION, TS_FORMAT, ReportIndex
+
+
+def write_report(report_dir, ts, env=None):
+    name = f"model_report_{ts}_{env}.html" if env else f"model_report_{ts}.html"
+    path = report_dir / name
+    path.write_text(f"<html>{name}</html>", encoding="utf-8")
+    return path
+
+
+def ts(days_ago=0, n=0):
+    return (datetime.utcnow() - timedelta(days=days_ago) + timedelta(seconds=n)).strftime(TS_FORMAT)
+
+
+@pytest.fixture
+def report_dir(tmp_path):
+    d = tmp_path / "reports"
+    d.mkdir()
+    return d
+
+
+def test_v1_index_is_migrated_keeping_its_rows(report_dir):
+    kept = write_report(report_dir, "20260101_000000", "dev")
+    db = sqlite3.connect(report_dir / "report_index.sqlite")
+    db.executescript("""
+        CREATE TABLE reports (
+            name TEXT PRIMARY KEY, env TEXT NOT NULL, created_at TEXT NOT NULL,
+            size INTEGER, model_file TEXT, smoketest TEXT);
+        CREATE INDEX reports_by_env ON reports (env, created_at);
+        PRAGMA user_version = 1;
+    """)
+    db.execute("INSERT INTO reports VALUES (?, 'dev', '20260101_000000', 1, 'model_v1.pkl', 'passed')",
+               (kept.name,))
+    db.commit()
+    db.close()
+    legacy = write_report(report_dir, "20250101_000000")  # no env: v1 could not hold it
+
+    index = ReportIndex(report_dir)
+    try:
+        assert index._version() == SCHEMA_VERSION
+        row = index.last("dev")[0]
+        assert (row["name"], row["model_file"], row["smoketest"]) == (kept.name, "model_v1.pkl", "passed")
+        assert [r["name"] for r in index.last(unassigned=True)] == [legacy.name]
+        tables = {r[0] for r in index.db.execute("SELECT name FROM sqlite_master")}
+        assert "reports_v1" not in tables and "reports_by_env" in tables
+    finally:
+        index.close()
+
+
+def test_retention_is_per_env_and_keeps_the_newest(report_dir):
+    index = ReportIndex(report_dir)
+    try:
+        dev = [write_report(report_dir, ts(days_ago=10 - i), "dev") for i in range(5)]
+        prod = [write_report(report_dir, ts(days_ago=30, n=i), "prod") for i in range(2)]
+        legacy = write_report(report_dir, ts(days_ago=99))
+        index.rebuild()
+
+        assert index.prune("dev", keep=3) == 2
+        assert [p.exists() for p in dev] == [False, False, True, True, True]
+        assert index.prune("dev", max_age_days=7.5) == 1  # the 8-day-old one
+        assert [r["name"] for r in index.last("dev", 10)] == [dev[4].name, dev[3].name]
+
+        assert index.prune("prod", max_age_days=7) == 1  # all too old, but the newest stays
+        assert [r["name"] for r in index.last("prod", 10)] == [prod[1].name] and prod[1].exists()
+        assert legacy.exists() and index.last(unassigned=True)[0]["name"] == legacy.name
+    finally:
+        index.close()
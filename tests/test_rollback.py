@@ -0,0 +1,97 @@
+"""Release history, atomic pointer flips and rollback.py, driven through model_refresh (local source)."""
+
+import os
+from pathlib import Path
+
+import pytest
+
+import model_refresh
+import rollback
+from releases import ReleaseHistory, atomic_symlink
+
+LINK, VFILE = Path("artifacts/current_model.pkl"), Path("artifacts/.model_version")
+
+
+@pytest.fixture
+def publish(workspace):
+    workspace(model_source="local", model_store_keep=3)
+    models = Path("artifacts/models")
+    models.mkdir(parents=True)
+    count = [0]
+
+    def publish(version):
+        count[0] += 1
+        path = models / version
+        path.write_bytes(version.encode())
+        os.utime(path, (1000 + count[0], 1000 + count[0]))  # newest mtime wins
+        return model_refresh.refresh_env("dev")
+
+    return publish
+
+
+def current():
+    return VFILE.read_text(encoding="utf-8").strip(), LINK.resolve().name
+
+
+def test_roll_forward_then_back_and_hold_the_rejected_version(publish, monkeypatch):
+    for v in ("model_v1.pkl", "model_v2.pkl", "model_v3.pkl"):
+        assert publish(v)["status"] == "updated"
+    assert current() == ("model_v3.pkl", "model_v3.pkl")
+
+    rollback.main()
+    assert current() == ("model_v2.pkl", "model_v2.pkl")
+    assert model_refresh.refresh_env("dev")["status"] == "held"  # v3 is rejected
+    assert current() == ("model_v2.pkl", "model_v2.pkl")
+
+    rollback.main()
+    assert current() == ("model_v1.pkl", "model_v1.pkl")
+
+    monkeypatch.setenv("ROLLBACK_TO", "model_v3.pkl")  # explicit switch un-rejects it
+    rollback.main()
+    assert current() == ("model_v3.pkl", "model_v3.pkl")
+    assert model_refresh.refresh_env("dev")["status"] == "up-to-date"
+
+
+def test_rolling_back_past_the_start_of_history_fails_cleanly(publish, capsys):
+    publish("model_v1.pkl")
+    publish("model_v2.pkl")
+    rollback.main()
+    with pytest.raises(SystemExit) as exc:
+        rollback.main()
+    assert exc.value.code == 2
+    assert "no earlier retained release" in capsys.readouterr().out
+    assert current() == ("model_v1.pkl", "model_v1.pkl")  # pointers untouched
+
+
+def test_unknown_or_missing_target_fails_cleanly(publish, monkeypatch):
+    publish("model_v1.pkl")
+    publish("model_v2.pkl")
+    monkeypatch.setenv("ROLLBACK_TO", "model_v9.pkl")
+    with pytest.raises(SystemExit) as exc:
+        rollback.main()
+    assert exc.value.code == 2
+
+    Path("artifacts/models/model_v1.pkl").unlink()
+    monkeypatch.setenv("ROLLBACK_TO", "model_v1.pkl")
+    with pytest.raises(SystemExit) as exc:
+        rollback.main()
+    assert exc.value.code == 2
+    assert current() == ("model_v2.pkl", "model_v2.pkl")
+
+
+def test_history_keeps_the_newest_releases(tmp_path):
+    history = ReleaseHistory(tmp_path / ".model_history.json", keep=2)
+    for v in ("a", "b", "c", "b"):
+        history.record(v, tmp_path / v)
+    assert history.versions() == ["c", "b"] and history.current == "b"
+    assert ReleaseHistory(tmp_path / ".model_history.json", keep=2).versions() == ["c", "b"]
+
+
+def test_atomic_symlink_replaces_the_link_in_one_rename(tmp_path):
+    a, b, link = tmp_path / "a", tmp_path / "b", tmp_path / "current"
+    a.write_text("a")
+    b.write_text("b")
+    atomic_symlink(a, link)
+    atomic_symlink(b, link)
+    assert link.is_symlink() and link.read_text() == "b"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a", "b", "current"]  # no temp link left
@@ -0,0 +1,120 @@
+"""s3_download.py ranged resume and verification against fake_s3."""
+
+import hashlib
+import os
+
+import pytest
+
+from s3_download import DownloadError, download_object, part_paths
+
+BUCKET, KEY = "b", "models/m.pkl"
+CHUNK = 1024
+
+
+class Flaky:
+    """Wraps a FakeS3Client; `hook(n, kwargs)` runs before the n-th ranged GET."""
+
+    def __init__(self, s3, hook):
+        self.s3, self.hook, self.gets = s3, hook, []
+
+    def head_object(self, **kw):
+        return self.s3.head_object(**kw)
+
+    def get_object(self, **kw):
+        self.gets.append(kw["Range"])
+        self.hook(len(self.gets), kw)
+        return self.s3.get_object(**kw)
+
+
+def put(s3, data, sha256=True):
+    meta = {"sha256": hashlib.sha256(data).hexdigest()} if sha256 else {}
+    s3.put_object(Bucket=BUCKET, Key=KEY, Body=data, Metadata=meta)
+
+
+def fetch(s3, dest):
+    return download_object(s3, BUCKET, KEY, dest, chunk_size=CHUNK, max_workers=1)
+
+
+def fail_on(n):
+    def hook(i, kw):
+        if i == n:
+            raise ConnectionResetError("connection reset by peer")
+    return hook
+
+
+@pytest.fixture
+def dest(tmp_path):
+    return tmp_path / "out" / "m.pkl"
+
+
+def test_resume_fetches_only_missing_ranges(s3, dest):
+    data = os.urandom(10 * CHUNK + 17)
+    put(s3, data)
+    with pytest.raises(DownloadError):
+        fetch(Flaky(s3, fail_on(4)), dest)
+    part, state = part_paths(dest)
+    assert part.exists() and state.exists() and not dest.exists()
+
+    resumed = Flaky(s3, lambda i, kw: None)
+    assert fetch(resumed, dest) == hashlib.sha256(data).hexdigest()
+    assert dest.read_bytes() == data
+    assert len(resumed.gets) == 11 - 3  # chunks 0-2 were already on disk
+    assert not part.exists() and not state.exists()
+
+
+def test_checksum_mismatch_discards_the_part_and_next_run_refetches(s3, dest):
+    data = os.urandom(4 * CHUNK)
+    put(s3, data)
+    with pytest.raises(DownloadError):
+        fetch(Flaky(s3, fail_on(4)), dest)
+    part, state = part_paths(dest)
+    with open(part, "r+b") as f:  # bit rot in a chunk recorded as done
+        f.write(b"\0" * 16)
+
+    with pytest.raises(DownloadError, match="integrity check failed"):
+        fetch(s3, dest)
+    assert not part.exists() and not state.exists() and not dest.exists()
+
+    again = Flaky(s3, lambda i, kw: None)
+    assert fetch(again, dest) == hashlib.sha256(data).hexdigest()
+    assert len(again.gets) == 4
+
+
+def test_md5_etag_alone_catches_corruption(s3, dest):
+    put(s3, os.urandom(3 * CHUNK), sha256=False)
+    with pytest.raises(DownloadError):
+        fetch(Flaky(s3, fail_on(3)), dest)
+    with open(part_paths(dest)[0], "r+b") as f:
+        f.write(b"\0")
+    with pytest.raises(DownloadError, match="md5"):
+        fetch(s3, dest)
+
+
+def test_object_replaced_between_runs_restarts_from_scratch(s3, dest):
+    put(s3, os.urandom(6 * CHUNK))
+    with pytest.raises(DownloadError):
+        fetch(Flaky(s3, fail_on(4)), dest)
+
+    new = os.urandom(6 * CHUNK)
+    put(s3, new)  # new ETag: the saved progress no longer applies
+    fresh = Flaky(s3, lambda i, kw: None)
+    assert fetch(fresh, dest) == hashlib.sha256(new).hexdigest()
+    assert len(fresh.gets) == 6 and dest.read_bytes() == new
+
+
+def test_object_replaced_mid_download_fails_fast(s3, dest):
+    old, new = os.urandom(6 * CHUNK), os.urandom(6 * CHUNK)
+    put(s3, old, sha256=False)
+
+    def replace_after_first(i, kw):
+        assert kw["IfMatch"]  # every ranged GET is pinned to the HEAD's ETag
+        if i == 2:
+            put(s3, new, sha256=False)
+
+    flaky = Flaky(s3, replace_after_first)
+    with pytest.raises(DownloadError, match="PreconditionFailed"):
+        fetch(flaky, dest)
+    assert len(flaky.gets) == 2 and not dest.exists()  # remaining ranges were skipped
+
+    assert fetch(s3, dest) == hashlib.sha256(new).hexdigest()
+    assert dest.read_bytes() == new